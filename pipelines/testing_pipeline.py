@@ -3,7 +3,7 @@ import logging
 from typing import List
 
 from steps.embed_data import embedding_query
-from steps.search_embedding import search_embedding
+from steps.search_embedding import lexical_search, search_embedding
 from steps.response import response
 
 @pipeline
@@ -13,8 +13,9 @@ def test_database_pipeline(query: str, include_tables: List[str]):
     Args:
         query (str): The query to the file.
     """
-    query_embedding = embedding_query(query=query)
-    query_embedding_search = search_embedding(query_embedding=query_embedding)
+    lexical = lexical_search(query=query, include_tables=include_tables)
+    query_embedding = embedding_query(query=query, lexical=lexical)
+    query_embedding_search = search_embedding(query_embedding=query_embedding, lexical=lexical)
     res = response(matching_chunks=query_embedding_search, include_tables=include_tables, query=query)
     logging.info(f"Response: {res}")
     return res
\ No newline at end of file
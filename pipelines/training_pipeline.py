@@ -1,14 +1,20 @@
+from typing import Optional
+
 from zenml import pipeline
 from steps.databaseConnect import connectTheDatabase
 from steps.process_data import process_data
 from steps.embed_data import embed_data
+from steps.lexical_index import build_lexical_index
 
 @pipeline(enable_cache=True)
 def train_database_pipeline(
     password: str,
     database_name: str,
     host: str,
-    user: str
+    user: str,
+    max_workers: int = 1,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None
 ):
     """Database training pipeline.
     
@@ -17,6 +23,9 @@ def train_database_pipeline(
         database_name (str): The name of the database.
         host (str): The host of the database.
         user (str): The user for the database connection.
+        max_workers (int): Number of tables to generate metadata for concurrently.
+        requests_per_minute (Optional[int]): Gemini request quota, None for no limit.
+        tokens_per_minute (Optional[int]): Gemini token quota, None for no limit.
     """
     data = connectTheDatabase(
         password=password, 
@@ -24,6 +33,12 @@ def train_database_pipeline(
         host=host, 
         user=user
     )
-    output = process_data(data=data)
+    output = process_data(
+        data=data,
+        max_workers=max_workers,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute
+    )
     embedding = embed_data(data=output)
+    lexical_index = build_lexical_index(data=output)
     
\ No newline at end of file
@@ -1,31 +1,58 @@
 import streamlit as st
-import pymysql
-from pipelines.testing_pipeline import test_database_pipeline
 from pipelines.training_pipeline import train_database_pipeline
 from src.data_response import GeminiResponse
-import pandas as pd
+from src.connection_pool import get_pool, release_owner_connections
+from src.query_engine import get_query_engine
+from src.query_guard import QueryCancelled, QueryGuard, RunningQuery
+from src.result_cache import get_result_cache, is_cacheable, table_versions
+from src.schema_preview import get_schema_preview_cache
+from src.sql_execution import DISPLAY_ROW_LIMIT, run_query
+import logging
+import os
+import uuid
+import weakref
+
+# Set RESULT_CACHE=0 to always run queries against MySQL
+RESULT_CACHE = os.getenv("RESULT_CACHE", "1").lower() not in ("0", "false", "no")
 
 # --- Database Connection Functions ---
 
+class SessionHandle:
+    """
+    Lives in session_state for as long as the session; when Streamlit drops
+    the session, its finalizer hands back the session's abandoned checkouts.
+    """
+
+    def __init__(self, session_id):
+        weakref.finalize(self, release_owner_connections, session_id)
+
+def release_session_connections():
+    """
+    Cancel this session's running query and discard connections it still holds
+    """
+    running = st.session_state.pop("running_query", None)
+    if running is not None:
+        running["query"].cancel()
+    released = release_owner_connections(st.session_state.session_id)
+    if released:
+        logging.info(f"Released {released} connections abandoned by session {st.session_state.session_id}")
+
 def authenticate_mysql(host, user, password, port):
     """
     Authenticate with MySQL server and get available databases
     """
+    # Connections checked out under the previous credentials are not coming back
+    release_session_connections()
     try:
-        connection = pymysql.connect(
-            host=host,
-            user=user,
-            password=password,
-            port=int(port)
-        )
+        # Server-level pool shared by every session using these credentials
+        pool = get_pool(host, port, user, password)
         
         # Get list of databases
-        with connection.cursor() as cursor:
+        with pool.connection(owner=st.session_state.session_id) as connection, connection.cursor() as cursor:
             cursor.execute("SHOW DATABASES")
             databases = [db[0] for db in cursor.fetchall()]
         
-        # Store connection and databases in session state
-        st.session_state.connection = connection
+        # Store databases in session state; connections stay in the pool
         st.session_state.authenticated = True
         st.session_state.databases = databases
         
@@ -40,10 +67,6 @@ def connect_to_database(host, user, password, port, database):
     Connect to a specific database
     """
     try:
-        # Close previous connection
-        if 'db_connection' in st.session_state:
-            st.session_state.db_connection.close()
-        
         # Clear previous database information if changing databases
         if 'current_db' in st.session_state:
             if st.session_state.current_db != database:
@@ -52,17 +75,13 @@ def connect_to_database(host, user, password, port, database):
                 if 'selected_tables' in st.session_state:
                     del st.session_state.selected_tables
         
-        # Connect to the selected database
-        db_connection = pymysql.connect(
-            host=host,
-            user=user,
-            password=password,
-            port=int(port),
-            database=database
-        )
+        # Check out once to verify access to the selected database
+        db_pool = get_pool(host, port, user, password, database)
+        with db_pool.connection(owner=st.session_state.session_id) as connection:
+            connection.ping(reconnect=False)
         
-        # Store the database connection
-        st.session_state.db_connection = db_connection
+        # Store the database's pool; each operation checks out a connection
+        st.session_state.db_pool = db_pool
         st.session_state.current_db = database
         
         st.sidebar.success(f"Connected to database: {database}")
@@ -70,6 +89,22 @@ def connect_to_database(host, user, password, port, database):
     except Exception as e:
         st.sidebar.error(f"Failed to connect to database: {str(e)}")
 
+def session_db_connection():
+    """
+    Check out a pooled connection to the current database for this session
+    """
+    return st.session_state.db_pool.connection(owner=st.session_state.session_id)
+
+def display_pool_metrics():
+    """
+    Show the usage of this session's connection pool in the sidebar
+    """
+    pool = st.session_state.get("db_pool")
+    if pool is not None:
+        with st.sidebar.expander("Connection Pool", expanded=False):
+            st.write(f"**{pool.user}@{pool.host}:{pool.port}/{pool.database or ''}**")
+            st.json(pool.stats())
+
 # --- Training & Table Functions ---
 
 def train_model(password, database, host, user):
@@ -88,7 +123,7 @@ def train_model(password, database, host, user):
             st.sidebar.success("Model training completed successfully!")
             
             # Get table names after successful model training
-            with st.session_state.db_connection.cursor() as cursor:
+            with session_db_connection() as connection, connection.cursor() as cursor:
                 cursor.execute("SHOW TABLES")
                 st.session_state.tables = [table[0] for table in cursor.fetchall()]
             
@@ -124,54 +159,102 @@ def display_table_schemas():
         st.subheader("Selected Tables:")
         st.write(", ".join(st.session_state.selected_tables))
     
+        # Previews are cached per database and only re-read for tables whose schema or data changed
+        previews = get_schema_preview_cache().previews(
+            result_scope(),
+            st.session_state.db_pool.database,
+            st.session_state.selected_tables,
+            session_db_connection
+        )
+        
         # Show schema for each selected table
-        for table in st.session_state.selected_tables:
-            with st.session_state.db_connection.cursor() as cursor:
-                cursor.execute(f"DESCRIBE {table}")
-                schema = cursor.fetchall()
+        for table, preview in previews.items():
+            if preview is None:
+                st.warning(f"Table {table} no longer exists.")
+                continue
             
             with st.expander(f"{table} Schema", expanded=False):
-                schema_df = pd.DataFrame(schema, columns=["Field", "Type", "Null", "Key", "Default", "Extra"])
-                st.table(schema_df)
+                st.table(preview.schema)
             
             # Show a preview of the data
-            with st.session_state.db_connection.cursor() as cursor:
-                cursor.execute(f"SELECT * FROM {table} LIMIT 5")
-                data = cursor.fetchall()
-                if data:
-                    col_names = [desc[0] for desc in cursor.description]
-                    with st.expander(f"{table} Data Preview", expanded=False):
-                        preview_df = pd.DataFrame(data, columns=col_names)
-                        st.dataframe(preview_df)
+            if preview.data is not None:
+                with st.expander(f"{table} Data Preview", expanded=False):
+                    st.dataframe(preview.data)
 
 # --- Query Processing Functions ---
 
 def process_query(user_query, tables_selctecd, include_relationships=True):
     """
     Process the user's natural language query
+
+    Returns an iterator over the response text as it is generated, or None
+    if the tables could not be retrieved.
     """
-    # Add context about selected tables to the query
-    if 'selected_tables' in st.session_state and st.session_state.selected_tables:
-        context_query = f"Working with tables: {', '.join(st.session_state.selected_tables)}. {user_query}"
-    else:
-        context_query = user_query
-    
+    # Route and embed the question as asked; the selected tables reach the
+    # prompt through include_tables, so naming them here would only make the
+    # lexical router treat every question as a mention of them
     with st.spinner("Processing your query..."):
         try:
-            # Run the pipeline with the enhanced query
-            result = test_database_pipeline(query=context_query, include_tables=tables_selctecd)                             
-            # After running the pipeline
-            try:
-                with open("data/chunk/response.txt", "r") as f:
-                    response_text = f.read()
-                return response_text
-            except Exception as file_error:
-                st.error(f"Could not read response file: {str(file_error)}")
-                return None
+            # Answer in-process; the ZenML test pipeline is kept for audited runs.
+            # The response is streamed directly and kept in this session's state only.
+            return get_query_engine().stream_answer(
+                user_query,
+                include_tables=tables_selctecd,
+                session_id=st.session_state.session_id
+            )
         except Exception as e:
             st.error(f"Error processing query: {str(e)}")
             return None
 
+def display_streaming_response(response_stream):
+    """
+    Display a response incrementally as the model generates it
+
+    The SQL code is extracted once its closing fence arrives, and the
+    Execute button is shown at that point, before the rest of the
+    explanation has streamed in.
+    """
+    st.subheader("SQL Query Assistant Response")
+    explanation_placeholder = st.empty()
+    code_placeholder = st.empty()
+    trailing_placeholder = None
+    sql_code = None
+    response_text = ""
+    
+    # A new response must not inherit the previous response's execution
+    st.session_state.sql_executed = False
+    
+    try:
+        for piece in response_stream:
+            response_text += piece
+            # Keep what has arrived so far, so a rerun (e.g. Execute clicked
+            # while the explanation is still streaming) still shows it
+            st.session_state.current_response_text = response_text
+            
+            if "```sql" not in response_text:
+                explanation_placeholder.write(response_text)
+                continue
+            
+            explanation, rest = response_text.split("```sql", 1)
+            explanation_placeholder.write(explanation)
+            if sql_code is None:
+                if "```" not in rest:
+                    # Show the SQL as it is written
+                    code_placeholder.code(rest.strip(), language="sql")
+                    continue
+                sql_code = rest.split("```")[0].strip()
+                st.session_state.current_sql_code = sql_code
+                code_placeholder.code(sql_code, language="sql")
+                # Clicking reruns the script, which executes the query via display_response
+                st.button("Execute SQL Query", key="execute_sql_button")
+                trailing_placeholder = st.empty()
+            
+            # Show any additional explanation
+            if len(rest.split("```")) > 1:
+                trailing_placeholder.write(rest.split("```")[1])
+    except Exception as e:
+        st.error(f"Error generating response: {str(e)}")
+
 def display_response(response_text):
     """
     Display the response in a structured way
@@ -214,68 +297,136 @@ def display_response(response_text):
     else:
         st.write(response_text)
 
+def wait_for_query(running_query):
+    """
+    Wait for a running query, offering to cancel it
+    """
+    status = st.empty()
+    if st.button("Cancel query", key="cancel_query_button"):
+        running_query.cancel()
+    while not running_query.wait(0.25):
+        status.info(f"Query running for {running_query.elapsed():.0f}s...")
+    status.empty()
+    del st.session_state.running_query
+    return running_query.result()
+
+def result_scope():
+    """
+    Result cache scope of the current database: results are shared between
+    sessions logged in as the same MySQL user, never across users
+    """
+    pool = st.session_state.db_pool
+    return f"{pool.user}@{pool.host}:{pool.port}/{pool.database}"
+
+def probe_table_versions():
+    """
+    Read the change markers of the current database's tables
+    """
+    with session_db_connection() as connection:
+        return table_versions(connection, st.session_state.db_pool.database)
+
+def finish_query(sql_code, running_query, warnings, versions=None):
+    """
+    Wait for a running query, store its results and keep the result cache current.
+    Results are cached against the table versions read before the query started
+    """
+    result = wait_for_query(running_query)
+    if RESULT_CACHE:
+        max_rows = int(st.session_state.get("max_display_rows", DISPLAY_ROW_LIMIT))
+        if result.is_select:
+            if versions is not None:
+                get_result_cache().store(result_scope(), sql_code, max_rows, result, versions, warnings=warnings)
+        else:
+            get_result_cache().invalidate(result_scope(), sql_code)
+    store_query_result(sql_code, result, warnings)
+
+def store_query_result(sql_code, result, warnings, cached=False):
+    """
+    Store the results of an executed query in session state
+    """
+    st.session_state.current_sql = sql_code
+    st.session_state.sql_results = {
+        "is_select": result.is_select,
+        "dataframe": result.dataframe,
+        "sql": sql_code,
+        "row_count": result.row_count,
+        "has_more": result.has_more,
+        "col_names": result.col_names,
+        "warnings": warnings,
+        "cached": cached
+    }
+
+def run_guarded_query(sql_code, max_rows):
+    """
+    Check a query with the cost guard, then run it in the background.
+    Returns False if the guard blocked it
+    """
+    # EXPLAIN the query, then bound it: LIMIT for unbounded SELECTs
+    # (one extra row tells whether more exist) and a server-side time limit
+    with st.spinner("Checking query..."):
+        guard = QueryGuard(reject_full_scans=not st.session_state.get("allow_full_scans", False))
+        with session_db_connection() as connection:
+            decision = guard.check(connection, sql_code, row_limit=max_rows + 1)
+    
+    for warning in decision.warnings:
+        st.warning(warning)
+    if not decision.allowed:
+        st.error(f"Query blocked: {decision.reason}")
+        return False
+
+    def run(connection):
+        # Rows are streamed from the server and fetching stops at the display cap
+        result = run_query(connection, decision.sql, max_rows=max_rows)
+        if not result.is_select:
+            connection.commit()
+        return result
+
+    # Changes made while the query runs must invalidate its cached result
+    versions = None
+    if RESULT_CACHE and is_cacheable(sql_code):
+        versions = get_result_cache().versions(result_scope(), probe_table_versions)
+
+    # Run in the background so the query can be cancelled while it runs
+    running_query = RunningQuery(st.session_state.db_pool, run, owner=st.session_state.session_id).start()
+    st.session_state.running_query = {
+        "sql": sql_code, "query": running_query, "warnings": decision.warnings, "versions": versions
+    }
+    finish_query(sql_code, running_query, decision.warnings, versions)
+    return True
+
 def execute_sql(sql_code):
     """
     Execute the generated SQL query and display results
     """
     try:
+        running = st.session_state.get('running_query')
+        if running is not None and running["sql"] == sql_code:
+            # This query is still running from an earlier run of the script
+            # (e.g. Cancel was clicked); keep waiting for it
+            finish_query(sql_code, running["query"], running["warnings"], running["versions"])
+        
         # First check if we already have results in session state to avoid re-executing
-        if 'sql_results' not in st.session_state or st.session_state.get('current_sql') != sql_code:
-            with st.spinner("Executing query..."):
-                # Check for empty or dangerous queries
-                if not sql_code or "DROP " in sql_code.upper() and not st.session_state.get("allow_dangerous", False):
-                    st.warning("Potentially dangerous query detected. Add a safety confirmation checkbox if you really need this.")
-                    return
-                    
-                # Execute the query
-                with st.session_state.db_connection.cursor() as cursor:
-                    cursor.execute(sql_code)
-                    
-                    # Better detection of query type
-                    query_type = sql_code.strip().upper()
-                    is_select = query_type.startswith("SELECT") or "SELECT" in query_type and not any(
-                        word in query_type for word in ["UPDATE", "INSERT", "DELETE", "DROP", "CREATE", "ALTER"]
-                    )
-                    
-                    # Store the execution state
-                    st.session_state.current_sql = sql_code
-                    
-                    if is_select:
-                        # Fetch results
-                        results = cursor.fetchall()
-                        if results:
-                            col_names = [desc[0] for desc in cursor.description]
-                            results_df = pd.DataFrame(results, columns=col_names)
-                            
-                            # Store in session state
-                            st.session_state.sql_results = {
-                                "is_select": True,
-                                "dataframe": results_df,
-                                "sql": sql_code,
-                                "row_count": len(results),
-                                "col_names": col_names
-                            }
-                        else:
-                            st.session_state.sql_results = {
-                                "is_select": True,
-                                "dataframe": None,
-                                "sql": sql_code,
-                                "row_count": 0
-                            }
-                    else:
-                        # For non-SELECT queries
-                        rowcount = cursor.rowcount
-                        st.session_state.db_connection.commit()
-                        st.session_state.sql_results = {
-                            "is_select": False,
-                            "dataframe": None,
-                            "sql": sql_code,
-                            "row_count": rowcount,
-                            "type": "modification"
-                        }
+        elif 'sql_results' not in st.session_state or st.session_state.get('current_sql') != sql_code:
+            # Check for empty or dangerous queries
+            if not sql_code or "DROP " in sql_code.upper() and not st.session_state.get("allow_dangerous", False):
+                st.warning("Potentially dangerous query detected. Add a safety confirmation checkbox if you really need this.")
+                return
+            
+            max_rows = int(st.session_state.get("max_display_rows", DISPLAY_ROW_LIMIT))
+            
+            # Results of identical SELECTs are shared across sessions until their tables change
+            cached = get_result_cache().lookup(result_scope(), sql_code, max_rows, probe_table_versions) if RESULT_CACHE else None
+            if cached is not None:
+                store_query_result(sql_code, cached.result, cached.warnings, cached=True)
+            elif not run_guarded_query(sql_code, max_rows):
+                return
         
         # Now display the results (either fresh or from session state)
         results_data = st.session_state.sql_results
+        for warning in results_data.get("warnings", []):
+            st.caption(f"⚠️ {warning}")
+        if results_data.get("cached"):
+            st.caption("Served from the shared result cache")
         
         if results_data["is_select"]:
             if results_data.get("dataframe") is not None:
@@ -283,14 +434,12 @@ def execute_sql(sql_code):
                 
                 # Display results in an expander
                 with st.expander("Query Results", expanded=True):
-                    st.success(f"Query executed successfully. {results_data['row_count']} rows returned.")
-                    
-                    # Handle large result sets
-                    if results_data['row_count'] > 1000:
-                        st.warning(f"Large result set ({results_data['row_count']} rows). Showing first 1000 rows.")
-                        st.dataframe(results_df.head(1000))
+                    # Handle large result sets: only the first rows were fetched
+                    if results_data.get("has_more"):
+                        st.warning(f"Large result set. Showing the first {results_data['row_count']} rows; more rows exist.")
                     else:
-                        st.dataframe(results_df)
+                        st.success(f"Query executed successfully. {results_data['row_count']} rows returned.")
+                    st.dataframe(results_df)
                 
             else:
                 st.info("Query executed successfully, but no results were returned.")
@@ -299,20 +448,21 @@ def execute_sql(sql_code):
             with st.expander("Query Results", expanded=True):
                 st.success(f"Query executed successfully. {results_data['row_count']} rows affected.")
                 
+    except QueryCancelled:
+        # Don't re-run the cancelled query on the next rerun of the script
+        st.session_state.sql_executed = False
+        st.warning("Query cancelled.")
     except Exception as exec_error:
         st.error(f"Error executing query: {str(exec_error)}")
         
+        if "maximum statement execution time exceeded" in str(exec_error).lower():
+            st.error("The query ran longer than the statement time limit and was stopped by the server.")
+        
         # Show detailed error information
         if "access denied" in str(exec_error).lower():
             st.error("You don't have permission to run this query. Contact your database administrator.")
         elif "syntax error" in str(exec_error).lower():
             st.error("The query contains a syntax error. Please check your SQL syntax.")
-            
-        # Rollback on error
-        try:
-            st.session_state.db_connection.rollback()
-        except:
-            st.error("Additionally, there was an issue rolling back the transaction.")
 
 # --- UI Layout Functions ---
 
@@ -349,6 +499,14 @@ def build_sidebar():
             if st.sidebar.button("Train Model"):
                 train_model(password, st.session_state.current_db, host, user_role)
     
+    # Queries whose EXPLAIN shows a full scan of a large table are blocked unless allowed
+    st.sidebar.checkbox("Allow full scans of large tables", key="allow_full_scans")
+    
+    # Result streaming stops at this many rows
+    st.sidebar.number_input("Maximum result rows", min_value=10, value=DISPLAY_ROW_LIMIT, step=100, key="max_display_rows")
+    
+    display_pool_metrics()
+    
     return user_role, password, host, port
 
 def build_main_content():
@@ -378,8 +536,9 @@ def build_main_content():
             # Submit button
             if st.button("Submit Query", key="submit_query_button"):
                 if user_query:
-                    response = process_query(user_query, tables_selected, include_relationships)
-                    display_response(response)
+                    response_stream = process_query(user_query, tables_selected, include_relationships)
+                    if response_stream is not None:
+                        display_streaming_response(response_stream)
                 else:
                     st.warning("Please enter a query before submitting.")
             
@@ -392,6 +551,11 @@ def build_main_content():
 
 def main():
     st.title("SQL Query Assistant")
+
+    # Identifies this browser session, e.g. in the optional response log
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+        st.session_state.session_handle = SessionHandle(st.session_state.session_id)
     
     # Build sidebar and get authentication info
     user_role, password, host, port = build_sidebar()
@@ -0,0 +1,193 @@
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Union
+
+import numpy as np
+
+from src.embedding_cache import normalize_text
+
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+class AnswerEntry(NamedTuple):
+    """One cached answer and everything it is keyed on."""
+    text_key: str
+    numbers: tuple
+    embedding: Optional[np.ndarray]
+    tables: frozenset
+    schema_version: str
+    answer: str
+    created: float
+
+
+class SemanticAnswerCache:
+    """
+    In-memory cache of generated answers that also matches paraphrases.
+
+    A question hits when it is textually identical (after normalization) to
+    a cached one, or when its embedding's cosine similarity to a cached
+    question's embedding is at least ``similarity_threshold``. In both cases
+    the answer must have been generated for the same set of tables and the
+    same schema version, so retraining a table invalidates every answer
+    that used it. Numbers in the question must match exactly, since "top 5"
+    and "top 10" embed almost identically but need different SQL.
+
+    Entries expire after ``ttl_seconds`` and the least recently used entry
+    is evicted beyond ``max_entries``.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600.0, similarity_threshold: float = 0.95):
+        """
+        Args:
+            max_entries (int): Maximum number of cached answers.
+            ttl_seconds (float): Lifetime of an answer.
+            similarity_threshold (float): Minimum cosine similarity for a semantic hit.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, AnswerEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidated = 0
+
+    @staticmethod
+    def _unit(embedding: Optional[List[float]]) -> Optional[np.ndarray]:
+        if embedding is None or len(embedding) == 0:
+            return None
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    def _drop_stale(self, now: float, tables: frozenset, schema_version: str) -> None:
+        """Removes expired entries and entries for an older version of ``tables``."""
+        for entry_id, entry in list(self._entries.items()):
+            if now - entry.created > self.ttl_seconds:
+                del self._entries[entry_id]
+                self.expired += 1
+            elif entry.tables == tables and entry.schema_version != schema_version:
+                del self._entries[entry_id]
+                self.invalidated += 1
+
+    def lookup(
+        self,
+        query: str,
+        tables: Iterable[str],
+        schema_version: str,
+        embedding: Union[None, List[float], Callable[[], Optional[List[float]]]] = None
+    ) -> Optional[str]:
+        """
+        Finds a cached answer for a question.
+
+        Args:
+            query (str): The user question.
+            tables (Iterable[str]): Tables whose metadata the answer would be generated from.
+            schema_version (str): Current schema version of those tables.
+            embedding: The question's embedding, or a function computing it;
+                the function is only called (outside the cache lock) when
+                there is no textual match and some cached answer could match
+                semantically. Without it only textually identical questions hit.
+
+        Returns:
+            Optional[str]: The cached answer, or None on a miss.
+        """
+        tables = frozenset(tables)
+        text_key = normalize_text(query)
+        numbers = tuple(_NUMBER.findall(text_key))
+
+        def candidates():
+            for entry_id, entry in self._entries.items():
+                if entry.tables == tables and entry.schema_version == schema_version:
+                    yield entry_id, entry
+
+        with self._lock:
+            self._drop_stale(time.time(), tables, schema_version)
+            semantic = False
+            for entry_id, entry in candidates():
+                if entry.text_key == text_key:
+                    self._entries.move_to_end(entry_id)
+                    self.exact_hits += 1
+                    return entry.answer
+                semantic |= entry.embedding is not None and entry.numbers == numbers
+
+        if callable(embedding):
+            embedding = embedding() if semantic else None
+        unit = self._unit(embedding) if semantic else None
+        with self._lock:
+            best_id, best_similarity = None, self.similarity_threshold
+            for entry_id, entry in candidates():
+                if unit is None or entry.embedding is None or entry.numbers != numbers:
+                    continue
+                similarity = float(np.dot(unit, entry.embedding))
+                if similarity >= best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.semantic_hits += 1
+            return self._entries[best_id].answer
+
+    def store(
+        self,
+        query: str,
+        tables: Iterable[str],
+        schema_version: str,
+        answer: str,
+        embedding: Optional[List[float]] = None
+    ) -> None:
+        """
+        Caches an answer.
+
+        Args:
+            query (str): The user question.
+            tables (Iterable[str]): Tables whose metadata the answer was generated from.
+            schema_version (str): Schema version of those tables.
+            answer (str): The generated answer.
+            embedding (Optional[List[float]]): The question's embedding.
+        """
+        text_key = normalize_text(query)
+        entry = AnswerEntry(
+            text_key=text_key,
+            numbers=tuple(_NUMBER.findall(text_key)),
+            embedding=self._unit(embedding),
+            tables=frozenset(tables),
+            schema_version=schema_version,
+            answer=answer,
+            created=time.time(),
+        )
+        with self._lock:
+            for entry_id, existing in list(self._entries.items()):
+                if existing.text_key == text_key and existing.tables == entry.tables:
+                    del self._entries[entry_id]
+            self._entries[uuid.uuid4().hex] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drops every cached answer."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns hit, miss and eviction counters and the overall hit rate.
+        """
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "expired": self.expired,
+                "invalidated": self.invalidated,
+                "entries": len(self._entries),
+            }
@@ -0,0 +1,312 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import pymysql
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+class _PooledConnection(NamedTuple):
+    connection: pymysql.connections.Connection
+    created: float
+
+
+class ConnectionPool:
+    """
+    Bounded pool of MySQL connections for one (host, port, user, database).
+
+    Connections are checked out for the duration of one operation and
+    returned afterwards, so browser sessions share a fixed number of server
+    connections instead of each holding its own. On checkout a connection
+    older than ``recycle_seconds`` is replaced, and an idle one is pinged
+    first (pre-ping) so dead connections are discarded rather than handed
+    out. Checkouts beyond ``max_size`` wait up to ``checkout_timeout``.
+    Returned connections are rolled back, so no transaction or snapshot
+    leaks from one session into another.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: str,
+        password: str,
+        database: Optional[str] = None,
+        max_size: int = 10,
+        recycle_seconds: float = 3600.0,
+        checkout_timeout: float = 10.0,
+        pre_ping: bool = True,
+        connect: Callable[..., pymysql.connections.Connection] = pymysql.connect
+    ):
+        """
+        Args:
+            host (str): MySQL host.
+            port (int): MySQL port.
+            user (str): MySQL user.
+            password (str): The user's password.
+            database (Optional[str]): Default database, or None for a server-level pool.
+            max_size (int): Maximum open connections, idle and checked out.
+            recycle_seconds (float): Age after which a connection is replaced.
+            checkout_timeout (float): Seconds to wait for a free connection.
+            pre_ping (bool): Ping idle connections before handing them out.
+            connect (Callable): Connection factory, pymysql.connect by default.
+        """
+        self.host = host
+        self.port = int(port)
+        self.user = user
+        self.database = database
+        self.max_size = max_size
+        self.recycle_seconds = recycle_seconds
+        self.checkout_timeout = checkout_timeout
+        self.pre_ping = pre_ping
+        self._connect_kwargs = {"host": host, "port": self.port, "user": user, "password": password}
+        if database:
+            self._connect_kwargs["database"] = database
+        self._connect = connect
+        self._idle: List[_PooledConnection] = []
+        self._in_use: Dict[int, Tuple[_PooledConnection, Optional[str]]] = {}
+        self._open = 0
+        self._available = threading.Condition(threading.Lock())
+        self.counters = defaultdict(int)
+        self.total_wait_seconds = 0.0
+
+    def _new_connection(self) -> _PooledConnection:
+        connection = self._connect(**self._connect_kwargs)
+        self.counters["created"] += 1
+        return _PooledConnection(connection, time.time())
+
+    @staticmethod
+    def _close(pooled: _PooledConnection) -> None:
+        try:
+            pooled.connection.close()
+        except Exception:
+            pass
+
+    def _usable(self, pooled: _PooledConnection) -> bool:
+        """Recycles old connections and pings idle ones."""
+        if time.time() - pooled.created > self.recycle_seconds:
+            self.counters["recycled"] += 1
+            return False
+        if self.pre_ping:
+            try:
+                pooled.connection.ping(reconnect=False)
+            except Exception:
+                self.counters["ping_failures"] += 1
+                return False
+        return True
+
+    def checkout(self, owner: Optional[str] = None, timeout: Optional[float] = None) -> pymysql.connections.Connection:
+        """
+        Takes a healthy connection from the pool, opening one if there is room.
+
+        Args:
+            owner (Optional[str]): The session checking out, e.g. a Streamlit session id.
+            timeout (Optional[float]): Overrides the pool's checkout timeout.
+
+        Returns:
+            pymysql.connections.Connection: The connection; hand it back with checkin().
+
+        Raises:
+            PoolTimeout: If the pool stays exhausted for the whole timeout.
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        with self._available:
+            while True:
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+                if self._open < self.max_size:
+                    # Reserve a slot; the connection is opened below
+                    self._open += 1
+                    pooled = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.counters["timeouts"] += 1
+                    raise PoolTimeout(f"No MySQL connection available within {timeout}s ({self.max_size} in use)")
+                self._available.wait(remaining)
+            self.total_wait_seconds += time.monotonic() - start
+
+        # Health checks and connecting happen outside the lock.
+        try:
+            if pooled is not None and not self._usable(pooled):
+                self._close(pooled)
+                pooled = None
+            if pooled is None:
+                pooled = self._new_connection()
+        except Exception:
+            with self._available:
+                self._open -= 1
+                self._available.notify()
+            raise
+
+        with self._available:
+            self._in_use[id(pooled.connection)] = (pooled, owner)
+            self.counters["checkouts"] += 1
+        return pooled.connection
+
+    def checkin(self, connection: pymysql.connections.Connection, discard: bool = False) -> None:
+        """
+        Returns a connection to the pool.
+
+        The connection is rolled back first; if that fails, the connection
+        was closed by its user, or ``discard`` is set, it is closed instead
+        of being reused.
+
+        Args:
+            connection (pymysql.connections.Connection): A connection from checkout().
+            discard (bool): Close the connection, e.g. after a connection-level error.
+        """
+        with self._available:
+            entry = self._in_use.pop(id(connection), None)
+        if entry is None:
+            logging.warning("Connection returned to a pool it does not belong to, closing it")
+            connection.close()
+            return
+        pooled = entry[0]
+        if not getattr(connection, "open", True):
+            # Closed by its user, e.g. to abandon an unread streaming result
+            discard = True
+        if not discard:
+            try:
+                connection.rollback()
+            except Exception:
+                discard = True
+        with self._available:
+            if discard:
+                self._close(pooled)
+                self._open -= 1
+                self.counters["discarded"] += 1
+            else:
+                self._idle.append(pooled)
+            self._available.notify()
+
+    def open_connection(self) -> pymysql.connections.Connection:
+        """
+        Opens a connection outside the pool's size limit, e.g. to KILL a
+        query while the pool is exhausted. The caller closes it.
+        """
+        return self._connect(**self._connect_kwargs)
+
+    @contextmanager
+    def connection(self, owner: Optional[str] = None, timeout: Optional[float] = None) -> Iterator[pymysql.connections.Connection]:
+        """
+        Checks out a connection for the duration of a ``with`` block.
+
+        Connection-level errors (lost connection, server gone away) discard
+        the connection; any other error rolls it back before it is reused.
+        """
+        connection = self.checkout(owner=owner, timeout=timeout)
+        discard = False
+        try:
+            yield connection
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.checkin(connection, discard=discard)
+
+    def release_owner(self, owner: str) -> int:
+        """
+        Discards every connection still checked out by ``owner``.
+
+        Returns:
+            int: The number of connections released.
+        """
+        with self._available:
+            held = [entry[0].connection for entry in self._in_use.values() if entry[1] == owner]
+        for connection in held:
+            self.checkin(connection, discard=True)
+        return len(held)
+
+    def close(self) -> None:
+        """Closes all idle connections."""
+        with self._available:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._available.notify_all()
+        for pooled in idle:
+            self._close(pooled)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns pool size, usage and event counters.
+        """
+        with self._available:
+            owners = defaultdict(int)
+            for _, owner in self._in_use.values():
+                owners[owner] += 1
+            checkouts = self.counters["checkouts"]
+            return {
+                "max_size": self.max_size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "sessions": len(owners),
+                "checkouts": checkouts,
+                "created": self.counters["created"],
+                "recycled": self.counters["recycled"],
+                "ping_failures": self.counters["ping_failures"],
+                "discarded": self.counters["discarded"],
+                "timeouts": self.counters["timeouts"],
+                "avg_wait_ms": 1000 * self.total_wait_seconds / checkouts if checkouts else 0.0,
+            }
+
+
+_pools_lock = threading.Lock()
+_pools: Dict[tuple, ConnectionPool] = {}
+
+
+def get_pool(host: str, port: int, user: str, password: str, database: Optional[str] = None, **pool_options) -> ConnectionPool:
+    """
+    Returns the process-wide pool for (host, port, user, database).
+
+    A digest of the password is part of the key, so a session can never
+    borrow connections that were authenticated with someone else's password.
+
+    Args:
+        host (str): MySQL host.
+        port (int): MySQL port.
+        user (str): MySQL user.
+        password (str): The user's password.
+        database (Optional[str]): Default database, or None for a server-level pool.
+        **pool_options: ConnectionPool settings, used when the pool is created.
+    """
+    credential = hashlib.sha256(password.encode("utf-8")).hexdigest()
+    key = (host, int(port), user, database, credential)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(host, port, user, password, database, **pool_options)
+            _pools[key] = pool
+        return pool
+
+
+def release_owner_connections(owner: str) -> int:
+    """
+    Discards the connections ``owner`` still has checked out, in every pool.
+
+    Returns:
+        int: The number of connections released.
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+    return sum(pool.release_owner(owner) for pool in pools)
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Returns the metrics of every pool, keyed by "user@host:port/database".
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {f"{pool.user}@{pool.host}:{pool.port}/{pool.database or ''}": pool.stats() for pool in pools}
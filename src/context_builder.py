@@ -0,0 +1,155 @@
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from src.instrumentation import span
+from src.metaDataGeneration import parse_table_metadata
+from src.metadata_store import get_metadata_store
+from src.rate_limiter import estimate_tokens
+
+# DESCRIBE "Key" values rendered as compact column flags.
+KEY_FLAGS = {"PRI": "PK", "UNI": "UQ", "MUL": "IDX"}
+DESCRIBE_FIELDS = ("Field", "Type", "Null", "Key", "Default", "Extra")
+
+
+class BuiltContext(NamedTuple):
+    """Prompt context for one question, with its token accounting."""
+    chunks: List[str]
+    tables: List[str]
+    dropped: List[str]
+    tokens: int
+    raw_tokens: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.raw_tokens - self.tokens)
+
+
+def _schema_columns(schema: Any) -> List[Dict[str, Any]]:
+    """Normalizes stored schema rows (DESCRIBE dicts or tuples) to dicts."""
+    columns = []
+    for row in schema or []:
+        if isinstance(row, dict):
+            columns.append(row)
+        elif isinstance(row, (list, tuple)):
+            columns.append(dict(zip(DESCRIBE_FIELDS, row)))
+    return columns
+
+
+def _first_sentence(text: str) -> str:
+    text = " ".join(str(text).split())
+    end = text.find(". ")
+    return text if end == -1 else text[:end + 1]
+
+
+def render_table(table: str, metadata: Any, schema: Any = None, column_descriptions: bool = False) -> str:
+    """
+    Renders one table in compact notation.
+
+    Columns and keys come from the stored schema when there is one, falling
+    back to the columns listed in the generated metadata:
+
+        orders(id int PK, customer_id int IDX, total decimal(10,2)) -- Customer orders.
+
+    Args:
+        table: The table name
+        metadata: The generated metadata (JSON text or dict)
+        schema: The DESCRIBE rows the metadata was generated from, if stored
+        column_descriptions: Append each column's generated description
+
+    Returns:
+        The rendered table, or the metadata text if it cannot be parsed
+    """
+    parsed = parse_table_metadata(table, metadata)
+    if "raw_text" in parsed and not parsed.get("columns"):
+        return str(parsed["raw_text"])
+
+    descriptions = {}
+    for column in parsed.get("columns") or []:
+        if isinstance(column, dict) and column.get("name"):
+            descriptions[str(column["name"])] = column
+
+    rendered = []
+    schema_columns = _schema_columns(schema)
+    if schema_columns:
+        for column in schema_columns:
+            name = str(column.get("Field", ""))
+            part = f"{name} {column.get('Type', '')}".strip()
+            flag = KEY_FLAGS.get(str(column.get("Key") or "").upper())
+            if flag:
+                part += f" {flag}"
+            if column_descriptions and descriptions.get(name, {}).get("description"):
+                part += f" [{_first_sentence(descriptions[name]['description'])}]"
+            rendered.append(part)
+    else:
+        for name, column in descriptions.items():
+            part = f"{name} {column.get('type', '')}".strip()
+            if column_descriptions and column.get("description"):
+                part += f" [{_first_sentence(column['description'])}]"
+            rendered.append(part)
+
+    line = f"{parsed.get('table_name') or table}({', '.join(rendered)})"
+    if parsed.get("schema_description"):
+        line += f" -- {_first_sentence(parsed['schema_description'])}"
+    return line
+
+
+class ContextBuilder:
+    """
+    Builds compact, token-budgeted prompt context from stored table metadata.
+
+    Each table is rendered on one line in ``table(col type KEY, ...)``
+    notation with a one-sentence description; the verbose per-column
+    descriptions and the ``embedding_text`` summary are left out. Tables are
+    added in priority order until the token budget is spent.
+    """
+
+    def __init__(self, max_tokens: int = 4000, column_descriptions: bool = False):
+        """
+        Args:
+            max_tokens: Token budget for the whole context
+            column_descriptions: Include a short description per column
+        """
+        self.max_tokens = max_tokens
+        self.column_descriptions = column_descriptions
+
+    def build(self, tables: List[str], required: Optional[List[str]] = None) -> BuiltContext:
+        """
+        Renders the context for a question.
+
+        Args:
+            tables: Retrieved tables, highest retrieval score first
+            required: Tables the user selected explicitly; they are added
+                before any retrieved table
+
+        Returns:
+            The rendered chunks with the included and dropped tables and the
+            context size against the raw metadata it replaces
+        """
+        with span("context.build", requested=len(tables) + len(required or [])) as current:
+            ordered = list(dict.fromkeys(list(required or []) + list(tables)))
+            records = get_metadata_store().get_records(ordered)
+
+            chunks, included, dropped = [], [], []
+            tokens = raw_tokens = 0
+            for table in ordered:
+                record = records.get(table)
+                if record is None:
+                    continue
+                raw_tokens += estimate_tokens(str(record["metadata"]))
+                chunk = render_table(table, record["metadata"], record["schema"], self.column_descriptions)
+                chunk_tokens = estimate_tokens(chunk)
+                # The top table is always kept: an empty context helps nobody.
+                if included and tokens + chunk_tokens > self.max_tokens:
+                    dropped.append(table)
+                    continue
+                chunks.append(chunk)
+                included.append(table)
+                tokens += chunk_tokens
+            current.set(tables=len(included), dropped=len(dropped), tokens=tokens)
+
+        context = BuiltContext(chunks=chunks, tables=included, dropped=dropped, tokens=tokens, raw_tokens=raw_tokens)
+        logging.info(
+            f"Context: {context.tokens} tokens for {len(included)} tables "
+            f"({context.tokens_saved} saved vs raw metadata), dropped over budget: {dropped}"
+        )
+        return context
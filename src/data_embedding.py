@@ -1,6 +1,13 @@
+import contextvars
+import hashlib
 import logging
+import threading
+import time
+import zlib
+from functools import lru_cache
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 import torch
 import numpy as np
 import faiss
@@ -8,18 +15,32 @@ from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_core.documents import Document
 import os
 import json
-import pickle
 from pathlib import Path
 from dotenv import load_dotenv
 
+from src.embedding_cache import EmbeddingCache, get_embedding_cache
+from src.instrumentation import count, span
+from src.lexical_index import tokenize
+from src.embedding_store import VECTORS_SUFFIX, atomic_write, changed_tables, write_embedding_store
+from src.vector_index import INDEX_SUFFIX, clear_index, update_index
+
 load_dotenv('.env')
 # Load environment variables 
 
+LOCAL_IDF_PATH = os.path.join("data", "embeddings", "local_embedding_idf.npy")
+
 class DataEmbedding(ABC):
     """
     Abstract class for data embedding strategies.
+
+    Strategies implement embed_data and embed_query; saving to the vector
+    store and FAISS index is shared.
     """
 
+    MODEL_ID = ""
+    index_type = "auto"
+    compression = "none"
+
     @abstractmethod
     def embed_data(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -46,29 +67,285 @@ class DataEmbedding(ABC):
         """
         pass
     
-    @abstractmethod
-    def save_embeddings(self, embedded_metadata: Dict[str, Any], filename: str) -> bool:
+    @property
+    def model_id(self) -> str:
+        """Identifies the embedding model and settings; stored vectors with another id are re-embedded."""
+        return self.MODEL_ID
+
+    @property
+    def vector_space(self) -> str:
+        """Identifies the embedding space; vectors of different spaces are not comparable."""
+        return self.model_id
+
+    def _text_to_embed(self, table_name: str, table_data: Any) -> Tuple[Any, str]:
+        """
+        Normalises one table's metadata and picks the text to embed for it.
+        
+        Args:
+            table_name: Name of the table
+            table_data: Metadata for the table, as a dict or a JSON string
+            
+        Returns:
+            Tuple of the (possibly parsed) metadata and the text to embed
+        """
+        # If table_data is a string (likely JSON string), parse it
+        if isinstance(table_data, str):
+            try:
+                table_data = json.loads(table_data)
+            except json.JSONDecodeError:
+                logging.warning(f"Could not parse JSON for table {table_name}")
+                # Create a basic dictionary for unparseable strings
+                table_data = {"raw_text": table_data, "table_name": table_name}
+        
+        # Get the text to embed - prioritize "embedding_text" if available
+        if isinstance(table_data, dict):
+            text_to_embed = table_data.get("embedding_text", "")
+            
+            # If no embedding_text, create one from other metadata
+            if not text_to_embed:
+                table_desc = table_data.get("schema_description", "")
+                table_name_from_data = table_data.get("table_name", table_name)
+                text_to_embed = f"Table {table_name_from_data}: {table_desc}"
+        else:
+            # Handle case where table_data is still not a dict
+            text_to_embed = str(table_data)
+        return table_data, text_to_embed
+
+    def _prepare(self, metadata: Dict[str, Any]) -> Dict[str, Tuple[Any, str]]:
+        """
+        Resolves the text to embed for every table.
+
+        Returns:
+            Table name mapped to its (possibly parsed) metadata and text,
+            for the tables that have something to embed
+        """
+        prepared = {}
+        for table_name, table_data in metadata.items():
+            table_data, text_to_embed = self._text_to_embed(table_name, table_data)
+            if text_to_embed and isinstance(text_to_embed, str):
+                prepared[table_name] = (table_data, text_to_embed)
+            else:
+                logging.warning(f"No valid text to embed for table {table_name}")
+        return prepared
+
+    def _attach(self, metadata: Dict[str, Any], prepared: Dict[str, Tuple[Any, str]], embeddings: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Adds the embeddings, tagged with the model id, to a copy of the metadata.
+
+        Tables without an embedding keep their original data.
         """
-        Abstract method to save embeddings to disk.
+        embedded_metadata = {}
+        for table_name, table_data in metadata.items():
+            if table_name not in prepared:
+                embedded_metadata[table_name] = table_data  # Keep original data
+                continue
+            table_data, _ = prepared[table_name]
+            embedding = embeddings.get(table_name)
+            if embedding is None:
+                logging.error(f"Error embedding table {table_name}")
+                embedded_metadata[table_name] = table_data  # Keep original data
+                continue
+
+            # Clone the table data to avoid modifying original
+            if isinstance(table_data, dict):
+                embedded_table = table_data.copy()
+            else:
+                embedded_table = {"raw_data": str(table_data)}
+
+            embedded_table["embedding"] = list(embedding)
+            embedded_table["embedding_model"] = self.model_id
+            embedded_metadata[table_name] = embedded_table
+        return embedded_metadata
+
+    def save_embeddings(
+        self,
+        embedded_metadata: Dict[str, Any],
+        filename: str,
+        updated_tables: Optional[List[str]] = None,
+        index_type: Optional[str] = None
+    ) -> bool:
+        """
+        Saves embedded metadata to a columnar store and updates the FAISS index for vector search.
+
+        Vectors go to ``<base>_vectors.npy`` as one contiguous float32 matrix
+        that readers can memory-map, and metadata to ``<base>_records.json``,
+        where ``<base>`` is ``filename`` without its extension. The FAISS index
+        is updated in place, so only new, altered and dropped tables touch it.
         
         Args:
             embedded_metadata: Dictionary containing embedded metadata
-            filename: Name of the file to save embeddings to
+            filename: Base path of the embedding artifacts (any extension is dropped)
+            updated_tables: Tables whose embedding changed since the last save;
+                None compares every vector against the saved store
+            index_type: Overrides the instance's index type for this save
             
         Returns:
             bool: True if successful, False otherwise
         """
-        pass
+        try:
+            # Create directory if it doesn't exist
+            directory = os.path.dirname(filename)
+            if directory:
+                Path(directory).mkdir(parents=True, exist_ok=True)
+            base = os.path.splitext(filename)[0]
+            if updated_tables is None:
+                updated_tables = changed_tables(base, embedded_metadata)
+                
+            # 1. Save vectors and metadata records
+            table_ids, embeddings_array = write_embedding_store(base, embedded_metadata)
+                
+            # 2. Update the FAISS index, keyed by stable table ids
+            if len(table_ids) > 0:
+                update_index(
+                    base, table_ids, embeddings_array, updated_tables,
+                    index_type or self.index_type, self.compression, model=self.vector_space
+                )
+                faiss_filename = base + INDEX_SUFFIX
+
+                logging.info(f"FAISS index holds {len(table_ids)} vectors and was saved to {faiss_filename}")
+            else:
+                logging.warning("No valid embeddings found to create FAISS index")
+                if clear_index(base):
+                    logging.info(f"Emptied the FAISS index at {base}{INDEX_SUFFIX}")
+                
+            logging.info(f"Embeddings saved to {base}{VECTORS_SUFFIX}")
+            return True
+        except Exception as e:
+            logging.error(f"Error saving embeddings to {filename}: {e}")
+            logging.exception(e)
+            return False
+
 
 class GoogleEmbedding(DataEmbedding):
     """
     Google embedding strategy.
     """
+
+    MODEL_ID = "models/embedding-001"
+    # Tables are embedded as documents by the bulk endpoint, as queries per table otherwise
+    TASK_TYPES = {True: "retrieval_document", False: "retrieval_query"}
+    # The batch embedding endpoint accepts at most 100 texts per request.
+    MAX_BATCH_SIZE = 100
     
-    def __init__(self):
-        """Initialize the embedding model."""
-        GOOGLE_API_KEY = os.getenv('GEMINI_API_KEY')   
-        self.model = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key= GOOGLE_API_KEY)
+    def __init__(
+        self,
+        batch_size: int = MAX_BATCH_SIZE,
+        max_workers: int = 4,
+        max_retries: int = 3,
+        batched: bool = True,
+        model: Optional[Any] = None,
+        cache: Optional[EmbeddingCache] = None,
+        index_type: str = "auto",
+        compression: str = "none"
+    ):
+        """
+        Initialize the embedding model.
+
+        Args:
+            batch_size: Texts per bulk embedding request, capped at the provider limit
+            max_workers: Number of batches embedded concurrently
+            max_retries: Attempts per item when a batch has to be retried item by item
+            batched: Use the bulk document endpoint instead of one call per table
+            model: Pre-built LangChain embeddings model, mainly for benchmarks
+            cache: Cache consulted by embed_query before calling the model
+            index_type: FAISS index built by save_embeddings: "flat", "ivf",
+                "hnsw", or "auto" to choose from the number of vectors
+            compression: Vector storage inside the index: "none" (float32),
+                "sq8", "fp16" or "pq"; the float32 store is always kept for re-ranking
+        """
+        if model is None:
+            GOOGLE_API_KEY = os.getenv('GEMINI_API_KEY')   
+            model = GoogleGenerativeAIEmbeddings(model=self.MODEL_ID, google_api_key= GOOGLE_API_KEY)
+        self.model = model
+        self.batch_size = max(1, min(batch_size, self.MAX_BATCH_SIZE))
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max(1, max_retries)
+        self.batched = batched
+        self.cache = cache
+        self.index_type = index_type
+        self.compression = compression
+
+    @property
+    def model_id(self) -> str:
+        return f"{self.MODEL_ID}/{self.TASK_TYPES[self.batched]}"
+
+    @property
+    def vector_space(self) -> str:
+        # Document and query embeddings of one model are searched against each other
+        return self.MODEL_ID
+
+    def _embed_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embeds one batch through the bulk document endpoint.
+
+        A failed bulk request (e.g. a rate limit) is retried as a whole with
+        exponential backoff. Only items the response leaves without an
+        embedding are then retried one by one, so a rate limit never turns
+        into a burst of single-item requests.
+        
+        Args:
+            texts: Texts to embed, at most ``batch_size`` of them
+            
+        Returns:
+            One embedding per text, or None for items that failed every retry
+        """
+        embeddings = None
+        for attempt in range(self.max_retries):
+            if attempt:
+                count("api_retries", provider="google", operation="embedding")
+                time.sleep(2 ** (attempt - 1) * 0.5)
+            try:
+                with span("embedding.batch", texts=len(texts)):
+                    embeddings = self.model.embed_documents(texts)
+                break
+            except Exception as e:
+                logging.warning(f"Batch of {len(texts)} texts failed (attempt {attempt + 1}/{self.max_retries}): {e}")
+        if embeddings is None:
+            logging.error(f"Batch of {len(texts)} texts failed every retry")
+            return [None] * len(texts)
+        if len(embeddings) != len(texts):
+            # Results cannot be matched to their texts
+            logging.warning(f"Batch returned {len(embeddings)} embeddings for {len(texts)} texts, retrying items")
+            embeddings = [None] * len(texts)
+
+        results = []
+        for text, embedding in zip(texts, embeddings):
+            if embedding is not None and len(embedding) > 0:
+                results.append(embedding)
+                continue
+            embedding = None
+            for attempt in range(self.max_retries):
+                # Every single-item request is a fallback from the bulk request
+                count("api_retries", provider="google", operation="embedding_item")
+                if attempt:
+                    time.sleep(2 ** (attempt - 1) * 0.5)
+                try:
+                    embedding = self.model.embed_documents([text])[0]
+                    break
+                except Exception as e:
+                    logging.warning(f"Embedding retry {attempt + 1}/{self.max_retries} failed: {e}")
+            results.append(embedding)
+        return results
+
+    def _embed_texts(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embeds texts in provider-sized batches with bounded parallelism.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            One embedding per text in input order, None where embedding failed
+        """
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1 or self.max_workers == 1:
+            results = [self._embed_batch(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                # Each batch runs in a copy of this context, so its spans nest under the caller's
+                futures = [executor.submit(contextvars.copy_context().run, self._embed_batch, batch) for batch in batches]
+                results = [future.result() for future in futures]
+        return [embedding for batch in results for embedding in batch]
 
     def embed_data(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -81,57 +358,24 @@ class GoogleEmbedding(DataEmbedding):
             Dictionary with the same structure but with embeddings added
         """
         try:
-            # Create a new dictionary to store results
-            embedded_metadata = {}
-            
-            # Process each table's metadata
-            for table_name, table_data in metadata.items():
-                logging.info(f"Embedding data for table: {table_name}")
-                
-                # If table_data is a string (likely JSON string), parse it
-                if isinstance(table_data, str):
-                    try:
-                        table_data = json.loads(table_data)
-                    except json.JSONDecodeError:
-                        logging.warning(f"Could not parse JSON for table {table_name}")
-                        # Create a basic dictionary for unparseable strings
-                        table_data = {"raw_text": table_data, "table_name": table_name}
-                
-                # Get the text to embed - prioritize "embedding_text" if available
-                if isinstance(table_data, dict):
-                    text_to_embed = table_data.get("embedding_text", "")
-                    
-                    # If no embedding_text, create one from other metadata
-                    if not text_to_embed:
-                        table_desc = table_data.get("schema_description", "")
-                        table_name_from_data = table_data.get("table_name", table_name)
-                        text_to_embed = f"Table {table_name_from_data}: {table_desc}"
-                else:
-                    # Handle case where table_data is still not a dict
-                    text_to_embed = str(table_data)
-                
-                # Generate embedding if we have text
-                if text_to_embed and isinstance(text_to_embed, str):
+            # Resolve the text to embed for every table first
+            prepared = self._prepare(metadata)
+
+            if self.batched:
+                logging.info(f"Embedding {len(prepared)} tables in batches of {self.batch_size}")
+                embeddings = self._embed_texts([text for _, text in prepared.values()])
+                embeddings = dict(zip(prepared, embeddings))
+            else:
+                embeddings = {}
+                for table_name, (_, text_to_embed) in prepared.items():
+                    logging.info(f"Embedding data for table: {table_name}")
                     try:
-                        embedding = self.model.embed_query(text_to_embed)
-                        
-                        # Clone the table data to avoid modifying original
-                        if isinstance(table_data, dict):
-                            embedded_table = table_data.copy()
-                        else:
-                            embedded_table = {"raw_data": str(table_data)}
-                            
-                        embedded_table["embedding"] = embedding
-                        embedded_metadata[table_name] = embedded_table
-                        
+                        embeddings[table_name] = self.model.embed_query(text_to_embed)
                     except Exception as e:
                         logging.error(f"Error embedding table {table_name}: {e}")
-                        embedded_metadata[table_name] = table_data  # Keep original data
-                else:
-                    logging.warning(f"No valid text to embed for table {table_name}")
-                    embedded_metadata[table_name] = table_data  # Keep original data
-                    
-            return embedded_metadata
+                        embeddings[table_name] = None
+
+            return self._attach(metadata, prepared, embeddings)
             
         except Exception as e:
             logging.error(f"Error in embedding process: {e}")
@@ -140,6 +384,9 @@ class GoogleEmbedding(DataEmbedding):
     def embed_query(self, query: str) -> List[float]:
         """
         Embeds a query string using Google's embedding model.
+
+        Repeated (or normalized-identical) queries are served from the cache
+        when one is configured.
         
         Args:
             query: The query string to embed
@@ -148,75 +395,287 @@ class GoogleEmbedding(DataEmbedding):
             List[float]: The embedding vector for the query
         """
         try:
+            if self.cache is not None:
+                embedding = self.cache.get(query, self.MODEL_ID)
+                count("cache_requests", cache="embedding", result="miss" if embedding is None else "hit")
+                if embedding is not None:
+                    return embedding
+
             # Embed the query
-            embedding = self.model.embed_query(query)
+            with span("embedding.query"):
+                embedding = self.model.embed_query(query)
+            if self.cache is not None:
+                # Misses return the same float32-rounded vector as later hits
+                embedding = self.cache.put(query, self.MODEL_ID, embedding)
             return embedding
         except Exception as e:
             logging.error(f"Error embedding query: {e}")
             raise e
-    
-    def save_embeddings(self, embedded_metadata: Dict[str, Any], filename: str) -> bool:
+
+
+class LocalEmbedding(DataEmbedding):
+    """
+    Local CPU embedding strategy: hashed n-gram TF-IDF with a sparse random projection.
+
+    Every term of a text (as split by the lexical index) and the character
+    n-grams of each term are hashed into ``2 ** hash_bits`` buckets and
+    weighted by sublinear term frequency times inverse document frequency.
+    Each bucket then adds its weight, with a random sign, to ``projections``
+    of the ``dimension`` output components, which approximately preserves
+    cosine similarity. Whole batches are encoded with a handful of numpy
+    operations; nothing is downloaded and nothing leaves the machine.
+
+    Document frequencies are fitted on the first corpus embedded and saved
+    to ``idf_path``. They stay frozen afterwards, so vectors from later
+    incremental runs remain comparable; delete the file and retrain to
+    refit them. The model id includes a digest of the fitted weights.
+    """
+
+    MODEL_PREFIX = "local-hashed-tfidf"
+
+    def __init__(
+        self,
+        dimension: int = 768,
+        hash_bits: int = 18,
+        ngram_range: Tuple[int, int] = (3, 5),
+        ngram_weight: float = 1.0,
+        projections: int = 4,
+        batch_size: int = 1024,
+        idf_path: Optional[str] = LOCAL_IDF_PATH,
+        seed: int = 0,
+        index_type: str = "auto",
+        compression: str = "none"
+    ):
         """
-        Saves embedded metadata to a pickle file and creates a FAISS index for vector search.
-        
         Args:
-            embedded_metadata: Dictionary containing embedded metadata
-            filename: Name of the file to save embeddings to
-            
+            dimension: Size of the output vectors
+            hash_bits: log2 of the number of feature buckets
+            ngram_range: Smallest and largest character n-gram per term
+            ngram_weight: Total weight of a term's character n-grams relative
+                to the term itself; 0 disables them
+            projections: Output components each bucket contributes to
+            batch_size: Texts encoded per vectorized batch
+            idf_path: Where the fitted document frequencies are kept, or None
+                to keep them in memory only
+            seed: Seed of the random projection
+            index_type: FAISS index built by save_embeddings
+            compression: Vector storage inside the index
+        """
+        self.dimension = dimension
+        self.n_buckets = 1 << hash_bits
+        self.ngram_range = ngram_range
+        self.ngram_weight = ngram_weight
+        self.batch_size = max(1, batch_size)
+        self.idf_path = idf_path
+        self.index_type = index_type
+        self.compression = compression
+        self.params = f"{dimension}-{hash_bits}-{ngram_range[0]}-{ngram_range[1]}-{ngram_weight}-{projections}-{seed}"
+        rng = np.random.default_rng(seed)
+        self._positions = rng.integers(0, dimension, size=(self.n_buckets, projections), dtype=np.int64)
+        self._signs = rng.choice(np.array([-1.0, 1.0], dtype=np.float32), size=(self.n_buckets, projections))
+        self._terms: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._idf: Optional[np.ndarray] = None
+        self._idf_digest = "untrained"
+        self._idf_state: Optional[tuple] = None
+        self._idf_lock = threading.Lock()
+        self._load_idf()
+
+    @property
+    def model_id(self) -> str:
+        return f"{self.MODEL_PREFIX}-{self.params}-{self._idf_digest}"
+
+    def _load_idf(self) -> None:
+        """(Re)loads the document frequencies when the saved file changed."""
+        if not self.idf_path:
+            return
+        try:
+            stat = os.stat(self.idf_path)
+        except FileNotFoundError:
+            return
+        state = (stat.st_mtime_ns, stat.st_size)
+        if state == self._idf_state:
+            return
+        with self._idf_lock:
+            if state == self._idf_state:
+                return
+            try:
+                idf = np.load(self.idf_path)
+            except Exception as e:
+                logging.warning(f"Could not load local embedding weights from {self.idf_path}: {e}")
+                return
+            if idf.shape != (self.n_buckets,):
+                logging.warning(f"Ignoring local embedding weights for {idf.shape[0]} buckets, expected {self.n_buckets}")
+                return
+            self._idf, self._idf_digest = idf, self._digest(idf)
+            self._idf_state = state
+
+    def _digest(self, idf: np.ndarray) -> str:
+        return hashlib.sha256(idf.tobytes()).hexdigest()[:12]
+
+    def _term_features(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the buckets and weights of a term and its character n-grams."""
+        features = self._terms.get(term)
+        if features is not None:
+            return features
+        grams = [term]
+        if self.ngram_weight > 0:
+            padded = f"<{term}>"
+            low, high = self.ngram_range
+            grams += [padded[i:i + n] for n in range(low, high + 1) for i in range(len(padded) - n + 1)]
+        buckets = np.array([zlib.crc32(gram.encode("utf-8")) for gram in grams], dtype=np.int64) & (self.n_buckets - 1)
+        weights = np.full(len(grams), self.ngram_weight / max(1, len(grams) - 1), dtype=np.float32)
+        weights[0] = 1.0
+        features = (buckets, weights)
+        if len(self._terms) < 1_000_000:
+            self._terms[term] = features
+        return features
+
+    def _term_frequencies(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Counts hashed features per text.
+
         Returns:
-            bool: True if successful, False otherwise
+            Parallel arrays of text index, bucket and sublinear term frequency,
+            one entry per distinct (text, bucket)
+        """
+        lengths, buckets, weights = [], [], []
+        for text in texts:
+            length = 0
+            for term in tokenize(text):
+                term_buckets, term_weights = self._term_features(term)
+                buckets.append(term_buckets)
+                weights.append(term_weights)
+                length += len(term_buckets)
+            lengths.append(length)
+        if not buckets:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0, dtype=np.float32)
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+        keys = rows * self.n_buckets + np.concatenate(buckets)
+        keys, inverse = np.unique(keys, return_inverse=True)
+        tf = np.log1p(np.bincount(inverse, weights=np.concatenate(weights)))
+        return keys // self.n_buckets, keys % self.n_buckets, tf.astype(np.float32)
+
+    def fit(self, texts: List[str]) -> None:
+        """
+        Fits the document frequencies on a corpus and saves them.
+        """
+        df = np.zeros(self.n_buckets, dtype=np.float64)
+        for start in range(0, len(texts), self.batch_size):
+            _, buckets, _ = self._term_frequencies(texts[start:start + self.batch_size])
+            df += np.bincount(buckets, minlength=self.n_buckets)
+        idf = (np.log((1 + len(texts)) / (1 + df)) + 1).astype(np.float32)
+        with self._idf_lock:
+            self._idf, self._idf_digest = idf, self._digest(idf)
+            if self.idf_path:
+                directory = os.path.dirname(self.idf_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+
+                def dump(path):
+                    with open(path, "wb") as f:
+                        np.save(f, idf)
+
+                atomic_write(self.idf_path, dump)
+                stat = os.stat(self.idf_path)
+                self._idf_state = (stat.st_mtime_ns, stat.st_size)
+        logging.info(f"Fitted local embedding weights on {len(texts)} texts")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeds texts in vectorized batches.
+
+        Returns:
+            float32 matrix with one L2-normalized row per text; texts without
+            any term get a zero row
+        """
+        idf = self._idf
+        output = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            rows, buckets, tf = self._term_frequencies(batch)
+            weights = tf * idf[buckets] if idf is not None else tf
+            # Scatter every bucket's weight onto its signed output components
+            targets = rows[:, None] * self.dimension + self._positions[buckets]
+            values = weights[:, None] * self._signs[buckets]
+            output[start:start + len(batch)] = np.bincount(
+                targets.ravel(), weights=values.ravel(), minlength=len(batch) * self.dimension
+            ).reshape(len(batch), self.dimension)
+        norms = np.linalg.norm(output, axis=1, keepdims=True)
+        np.divide(output, norms, out=output, where=norms > 0)
+        return output
+
+    def embed_data(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Embeds metadata on the local CPU, fitting the weights on first use.
+
+        Args:
+            metadata: Dictionary with table metadata where keys are table names
+
+        Returns:
+            Dictionary with the same structure but with embeddings added
         """
         try:
-            # Create directory if it doesn't exist
-            directory = os.path.dirname(filename)
-            if directory:
-                Path(directory).mkdir(parents=True, exist_ok=True)
-                
-            # 1. Save the complete metadata as pickle
-            with open(filename, 'wb') as f:
-                pickle.dump(embedded_metadata, f)
-                
-            # 2. Create FAISS index from embeddings
-            embeddings = []
-            table_ids = []  # Keep track of which embedding belongs to which table
-            
-            # Extract embeddings from metadata
-            for i, (table_name, table_data) in enumerate(embedded_metadata.items()):
-                if isinstance(table_data, dict) and "embedding" in table_data:
-                    embedding = table_data["embedding"]
-                    if isinstance(embedding, list) and len(embedding) > 0:
-                        embeddings.append(embedding)
-                        table_ids.append(table_name)
-            
-            if embeddings:
-                # Convert to numpy array
-                embeddings_array = np.array(embeddings, dtype=np.float32)
-                
-                # Get embedding dimension
-                dimension = embeddings_array.shape[1]
-                
-                # Create a FAISS index - using L2 distance (Euclidean)
-                index = faiss.IndexFlatL2(dimension)
-                
-                # Add vectors to the index
-                index.add(embeddings_array)
-                
-                # Save the FAISS index
-                faiss_filename = filename.replace('.pkl', '_faiss.index')
-                faiss.write_index(index, faiss_filename)
-                
-                # Save the mapping of indices to table names
-                mapping_filename = filename.replace('.pkl', '_mapping.json')
-                with open(mapping_filename, 'w') as f:
-                    json.dump(table_ids, f)
-                    
-                logging.info(f"FAISS index created with {len(embeddings)} vectors and saved to {faiss_filename}")
-            else:
-                logging.warning("No valid embeddings found to create FAISS index")
-                
-            logging.info(f"Embeddings saved to {filename}")
-            return True
+            prepared = self._prepare(metadata)
+            texts = [text for _, text in prepared.values()]
+            if self._idf is None and texts:
+                self.fit(texts)
+            with span("embedding.batch", texts=len(texts), backend="local"):
+                vectors = self.encode(texts)
+            return self._attach(metadata, prepared, dict(zip(prepared, vectors.tolist())))
         except Exception as e:
-            logging.error(f"Error saving embeddings to {filename}: {e}")
-            logging.exception(e)
-            return False
\ No newline at end of file
+            logging.error(f"Error in embedding process: {e}")
+            return metadata  # Return original metadata on error
+
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embeds a query string on the local CPU.
+
+        Weights refitted by a training run in another process are picked up
+        on the next query.
+
+        Args:
+            query: The query string to embed
+
+        Returns:
+            List[float]: The embedding vector for the query
+        """
+        self._load_idf()
+        with span("embedding.query", backend="local"):
+            return self.encode([query])[0].tolist()
+
+
+EMBEDDING_BACKENDS = ("google", "local")
+
+
+def create_embedder(backend: Optional[str] = None, **kwargs) -> DataEmbedding:
+    """
+    Builds the embedding strategy chosen by configuration.
+
+    Args:
+        backend: "google" or "local"; defaults to the EMBEDDING_BACKEND
+            environment variable, then "google"
+        **kwargs: Passed on to the strategy's constructor
+
+    Returns:
+        DataEmbedding: The embedding strategy
+    """
+    backend = (backend or os.getenv("EMBEDDING_BACKEND", "google")).strip().lower()
+    if backend == "local":
+        return LocalEmbedding(**kwargs)
+    if backend != "google":
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {EMBEDDING_BACKENDS}")
+    return GoogleEmbedding(**kwargs)
+
+
+@lru_cache(maxsize=1)
+def get_query_embedder() -> DataEmbedding:
+    """
+    Returns the process-wide query embedder of the configured backend.
+
+    The Google embedder is backed by the embedding cache; local embeddings
+    are cheaper to compute than to look up.
+    """
+    if os.getenv("EMBEDDING_BACKEND", "google").strip().lower() == "local":
+        return create_embedder("local")
+    return create_embedder("google", cache=get_embedding_cache())
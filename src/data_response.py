@@ -1,12 +1,48 @@
+import json
 import logging
 import os
+import time
+import uuid
+from typing import Iterator, Optional
 
 from abc import ABC, abstractmethod
 import google.generativeai as genai
 from dotenv import load_dotenv
+
+from src.gemini_keys import get_gemini_key_lock
+from src.instrumentation import record_llm_usage, span
 load_dotenv('.env')
 
 
+RESPONSE_LOG_DIR = os.path.join("data", "responses")
+
+def log_response(query: str, response: str, session_id: Optional[str] = None, directory: str = RESPONSE_LOG_DIR) -> Optional[str]:
+    """
+    Records a question and its answer in the optional response log.
+
+    Every record gets its own uniquely named file under a per-session
+    directory, so concurrent sessions never overwrite each other.
+
+    Args:
+        query: The user question
+        response: The generated answer
+        session_id: The session that asked, or None for runs outside the app
+        directory: Root directory of the log
+
+    Returns:
+        The path of the record, or None if it could not be written
+    """
+    try:
+        session_dir = os.path.join(directory, session_id or "pipeline")
+        os.makedirs(session_dir, exist_ok=True)
+        record_path = os.path.join(session_dir, f"{time.time_ns()}-{uuid.uuid4().hex[:8]}.json")
+        with open(record_path, "x") as f:
+            json.dump({"timestamp": time.time(), "session_id": session_id, "query": query, "response": response}, f)
+        return record_path
+    except Exception as e:
+        logging.error(f"Could not log response: {e}")
+        return None
+
 class Response(ABC):
     """
     Abstract class for response strategies.
@@ -19,20 +55,28 @@ class Response(ABC):
         """
         pass
 
+    def stream_response(self, matching_chunks, query) -> Iterator[str]:
+        """
+        Yields the response in pieces as it is generated.
+
+        Strategies without streaming support yield the full response once.
+        """
+        yield self.get_response(matching_chunks=matching_chunks, query=query)
+
 class GeminiResponse(Response):
     """
     Gemini response strategy.
     """
 
-    def get_response(self, matching_chunks, query) -> str:
-        """Get the response from the Gemini model."""
+    def _build_prompt(self, matching_chunks, query) -> str:
+        """Build the prompt from the table metadata chunks and the question."""
         # Prepare context from chunks
         logging.info("Preparing context for response...")
         context = ""
         for chunk in matching_chunks:
             context += f"{chunk}\n\n"
         
-        input_prompt = f"""
+        return f"""
         Context (table metadata information):
         {context}
         
@@ -40,10 +84,40 @@ class GeminiResponse(Response):
         
         Answer based only on the table information provided above:
         """
-        # Set the API key
-        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+
+    def _model(self):
+        return genai.GenerativeModel('gemini-1.5-flash')
+
+    def _key(self):
+        # The key is process-global; hold it for the whole call
+        return get_gemini_key_lock().use(os.getenv('GEMINI_API_KEY'))
+
+    def get_response(self, matching_chunks, query) -> str:
+        """Get the response from the Gemini model."""
+        input_prompt = self._build_prompt(matching_chunks, query)
         # Generate response
-        llm = genai.GenerativeModel('gemini-1.5-flash')
         logging.info("Generating response...")
-        response = llm.generate_content(input_prompt)
-        return response.text
\ No newline at end of file
+        with self._key(), span("gemini.generate", operation="response"):
+            response = self._model().generate_content(input_prompt)
+        record_llm_usage(response, "response")
+        return response.text
+
+    def stream_response(self, matching_chunks, query) -> Iterator[str]:
+        """Yield the response from the Gemini model as its tokens arrive."""
+        input_prompt = self._build_prompt(matching_chunks, query)
+        logging.info("Streaming response...")
+        chunk = None
+        with self._key(), span("gemini.generate", operation="response", stream=True) as current:
+            chunks = 0
+            for chunk in self._model().generate_content(input_prompt, stream=True):
+                chunks += 1
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. the final safety metadata)
+                    continue
+                if text:
+                    yield text
+            current.set(chunks=chunks)
+        # The last chunk carries the usage of the whole response
+        record_llm_usage(chunk, "response")
@@ -1,12 +1,98 @@
 import logging
+from itertools import groupby
+from typing import Dict, Iterator, List, Optional
+
 import pymysql
 
+# DESCRIBE-compatible projection of information_schema.COLUMNS so the bulk
+# path yields exactly the rows the per-table path produces.
+COLUMNS_QUERY = """
+    SELECT
+        TABLE_NAME AS table_name,
+        COLUMN_NAME AS `Field`,
+        COLUMN_TYPE AS `Type`,
+        IS_NULLABLE AS `Null`,
+        COLUMN_KEY AS `Key`,
+        COLUMN_DEFAULT AS `Default`,
+        EXTRA AS `Extra`
+    FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = %s{table_filter}
+    ORDER BY TABLE_NAME, ORDINAL_POSITION
+"""
+
+# Max tables per information_schema query when a table list is given.
+INTROSPECTION_BATCH_SIZE = 1000
+
+
+def _stream_columns(connection: pymysql.connections.Connection, database_name: str, tables: Optional[List[str]] = None, batch_size: int = INTROSPECTION_BATCH_SIZE) -> Iterator[dict]:
+    """Streams column rows from information_schema.COLUMNS.
+    Args:
+        connection (pymysql.connections.Connection): The database connection object.
+        database_name (str): The schema to introspect.
+        tables (Optional[List[str]]): Restrict the query to these tables, or None for all tables.
+        batch_size (int): Max tables per information_schema query.
+    Yields:
+        dict: One row per column, ordered by table name and ordinal position.
+    """
+    if tables is None:
+        batches = [None]
+    else:
+        batches = [tables[i:i + batch_size] for i in range(0, len(tables), batch_size)]
+
+    for batch in batches:
+        params = [database_name]
+        table_filter = ""
+        if batch is not None:
+            table_filter = f" AND TABLE_NAME IN ({', '.join(['%s'] * len(batch))})"
+            params.extend(batch)
+
+        # Unbuffered cursor: rows are read off the socket as we iterate
+        # instead of materialising the whole result set client-side.
+        cursor = connection.cursor(pymysql.cursors.SSDictCursor)
+        try:
+            cursor.execute(COLUMNS_QUERY.format(table_filter=table_filter), params)
+            for row in cursor:
+                yield row
+        finally:
+            cursor.close()
+
+
+def fetch_all_table_schemas(connection: pymysql.connections.Connection, database_name: str, tables: Optional[List[str]] = None, batch_size: int = INTROSPECTION_BATCH_SIZE) -> Dict[str, list]:
+    """Fetches the schema of every table in one pass over information_schema.
+    Only needs an open connection, not the credentials held by ``IngestData``.
+    Args:
+        connection (pymysql.connections.Connection): The database connection object.
+        database_name (str): The name of the database to introspect.
+        tables (Optional[List[str]]): Restrict the result to these tables, or None for all tables.
+        batch_size (int): Max tables per information_schema query.
+    Returns:
+        Dict[str, list]: Table name mapped to the same rows ``IngestData.fetch_table_schemas`` returns.
+    """
+    try:
+        if connection is None:
+            logging.error("No valid database connection.")
+            return None
+        schemas = {}
+        rows = _stream_columns(connection, database_name, tables, batch_size)
+        for table, columns in groupby(rows, key=lambda row: row["table_name"]):
+            schema = []
+            for column in columns:
+                column = dict(column)
+                del column["table_name"]
+                schema.append(column)
+            schemas[table] = schema
+        return schemas
+    except pymysql.MySQLError as e:
+        logging.error(f"Error fetching table schemas: {e}")
+        return None
+
 class IngestData:
-    def __init__(self, password:str, database_name:str, host:str, user:str):
+    def __init__(self, password:str, database_name:str, host:str, user:str, introspection_batch_size: int = INTROSPECTION_BATCH_SIZE):
         self.password = password
         self.database_name = database_name
         self.host = host
         self.user = user
+        self.introspection_batch_size = introspection_batch_size
     
     def connect_to_database(self) -> pymysql.connections.Connection:
         """Establishes a connection to the MySQL database.
@@ -66,4 +152,15 @@ class IngestData:
             return schema
         except pymysql.MySQLError as e:
             logging.error(f"Error fetching table data: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def fetch_all_table_schemas(self, connection: pymysql.connections.Connection, database_name: str, tables: Optional[List[str]] = None) -> Dict[str, list]:
+        """Fetches the schema of every table in one pass over information_schema.
+        Args:
+            connection (pymysql.connections.Connection): The database connection object.
+            database_name (str): The name of the database to introspect.
+            tables (Optional[List[str]]): Restrict the result to these tables, or None for all tables.
+        Returns:
+            Dict[str, list]: Table name mapped to the same rows ``fetch_table_schemas`` returns.
+        """
+        return fetch_all_table_schemas(connection, database_name, tables, self.introspection_batch_size)
@@ -0,0 +1,189 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+
+CACHE_PATH = os.path.join("data", "embeddings", "query_cache.sqlite")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes a query so trivially different phrasings share a cache entry.
+
+    Case is folded and runs of whitespace collapse to a single space.
+    """
+    return " ".join(text.casefold().split())
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache for embedding vectors.
+
+    An in-memory LRU sits in front of a size-bounded SQLite store, so repeated
+    texts are served without a network round trip and the disk tier survives
+    process restarts. Entries are keyed on the normalized text plus the
+    embedding model id.
+    """
+
+    def __init__(self, path: Optional[str] = CACHE_PATH, memory_entries: int = 1024, max_disk_bytes: int = 64 * 1024 * 1024):
+        """
+        Opens (or creates) the cache.
+
+        Args:
+            path (Optional[str]): SQLite file for the disk tier, or None for memory only.
+            memory_entries (int): Maximum vectors kept in the in-memory LRU.
+            max_disk_bytes (int): Approximate maximum size of stored vectors on disk.
+        """
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = None
+        self._disk_bytes = 0
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    "key TEXT PRIMARY KEY, vector BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed)")
+                self._db.commit()
+                self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+            except sqlite3.Error as e:
+                logging.warning(f"Embedding cache disk tier unavailable at {path}: {e}")
+                self._db = None
+
+    @staticmethod
+    def make_key(text: str, model_id: str) -> str:
+        """
+        Builds the cache key for a text embedded with a given model.
+        """
+        payload = f"{model_id}\n{normalize_text(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, text: str, model_id: str) -> Optional[List[float]]:
+        """
+        Looks up a cached embedding.
+
+        Args:
+            text (str): The text that was embedded.
+            model_id (str): The embedding model that produced the vector.
+
+        Returns:
+            Optional[List[float]]: A copy of the cached vector, or None on a miss.
+        """
+        key = self.make_key(text, model_id)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return list(vector)
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                    if row is not None:
+                        self._db.execute("UPDATE embeddings SET accessed = ? WHERE key = ?", (time.time(), key))
+                        self._db.commit()
+                        vector = np.frombuffer(row[0], dtype=np.float32).tolist()
+                        self._remember(key, vector)
+                        self.disk_hits += 1
+                        return list(vector)
+                except sqlite3.Error as e:
+                    logging.warning(f"Embedding cache read failed: {e}")
+
+            self.misses += 1
+            return None
+
+    def put(self, text: str, model_id: str, vector: List[float]) -> List[float]:
+        """
+        Stores an embedding in both tiers.
+
+        Args:
+            text (str): The text that was embedded.
+            model_id (str): The embedding model that produced the vector.
+            vector (List[float]): The embedding.
+
+        Returns:
+            List[float]: The vector as stored, rounded to float32, so callers
+            can return exactly what later hits will return.
+        """
+        key = self.make_key(text, model_id)
+        # Both tiers hold float32 values so a disk hit returns the same vector as a memory hit.
+        vector = np.asarray(vector, dtype=np.float32)
+        blob = vector.tobytes()
+        rounded = vector.tolist()
+        with self._lock:
+            self._remember(key, rounded)
+            if self._db is None:
+                return list(rounded)
+            try:
+                previous = self._db.execute("SELECT size FROM embeddings WHERE key = ?", (key,)).fetchone()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, size, accessed) VALUES (?, ?, ?, ?)",
+                    (key, blob, len(blob), time.time()),
+                )
+                self._disk_bytes += len(blob) - (previous[0] if previous else 0)
+                self._evict()
+                self._db.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"Embedding cache write failed: {e}")
+        return list(rounded)
+
+    def _evict(self) -> None:
+        """Drops least recently used disk entries until the store is under 90% of its bound."""
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        target = int(self.max_disk_bytes * 0.9)
+        rows = self._db.execute("SELECT key, size FROM embeddings ORDER BY accessed").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._disk_bytes <= target:
+                break
+            evicted.append((key,))
+            self._disk_bytes -= size
+        self._db.executemany("DELETE FROM embeddings WHERE key = ?", evicted)
+        logging.info(f"Evicted {len(evicted)} entries from the embedding cache")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns hit and miss counters for both tiers.
+        """
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+@lru_cache(maxsize=None)
+def get_embedding_cache(path: str = CACHE_PATH) -> EmbeddingCache:
+    """
+    Returns the process-wide embedding cache for ``path``.
+    """
+    return EmbeddingCache(path=path)
@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+import pickle
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+VECTORS_SUFFIX = "_vectors.npy"
+RECORDS_SUFFIX = "_records.json"
+LEGACY_PICKLE_SUFFIX = ".pkl"
+
+
+def atomic_write(path: str, write) -> None:
+    """Writes a file through a temporary sibling and renames it into place."""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def store_paths(base: str) -> Tuple[str, str]:
+    """
+    Returns the vector and record file paths for an artifact base path.
+    """
+    return base + VECTORS_SUFFIX, base + RECORDS_SUFFIX
+
+
+def write_embedding_store(base: str, embedded_metadata: Dict[str, Any]) -> Tuple[List[str], np.ndarray]:
+    """
+    Writes embedded metadata as a float32 vector matrix plus a record file.
+
+    Row ``i`` of ``<base>_vectors.npy`` is the embedding of the ``i``-th table
+    with a vector in ``<base>_records.json``. The record file keeps every
+    table's metadata without its embedding, so loading metadata never
+    materialises vectors as Python objects.
+
+    Args:
+        base: Artifact base path, e.g. data/embeddings/table_embeddings
+        embedded_metadata: Table name mapped to metadata with an "embedding" key
+
+    Returns:
+        The table names that have vectors and the vector matrix, in row order
+    """
+    names = []
+    vectors = []
+    records = []
+    for table_name, table_data in embedded_metadata.items():
+        row = None
+        metadata = table_data
+        if isinstance(table_data, dict):
+            metadata = {key: value for key, value in table_data.items() if key != "embedding"}
+            embedding = table_data.get("embedding")
+            if embedding is not None and len(embedding) > 0:
+                row = len(vectors)
+                names.append(table_name)
+                vectors.append(embedding)
+        records.append({"table": table_name, "row": row, "metadata": metadata})
+
+    matrix = np.ascontiguousarray(np.array(vectors, dtype=np.float32))
+    if not vectors:
+        matrix = matrix.reshape(0, 0)
+    vectors_path, records_path = store_paths(base)
+
+    def dump_vectors(path):
+        with open(path, "wb") as f:
+            np.save(f, matrix)
+
+    def dump_records(path):
+        with open(path, "w") as f:
+            json.dump({"dimension": int(matrix.shape[1]), "tables": records}, f, separators=(",", ":"))
+
+    atomic_write(vectors_path, dump_vectors)
+    atomic_write(records_path, dump_records)
+    return names, matrix
+
+
+class EmbeddingStore:
+    """
+    Read-only view of a saved embedding store.
+
+    Vectors are memory-mapped, so only the pages of the rows actually
+    accessed are read from disk and resident memory stays flat as the
+    number of tables grows.
+    """
+
+    def __init__(self, base: str):
+        """
+        Opens the store.
+
+        Args:
+            base: Artifact base path, e.g. data/embeddings/table_embeddings
+
+        Raises:
+            FileNotFoundError: If the store has not been written yet
+        """
+        vectors_path, records_path = store_paths(base)
+        with open(records_path, "r") as f:
+            payload = json.load(f)
+        self.dimension: int = payload["dimension"]
+        self.records: Dict[str, Dict[str, Any]] = {record["table"]: record for record in payload["tables"]}
+        self.vectors: np.ndarray = np.load(vectors_path, mmap_mode="r")
+        self.tables: List[str] = [table for table, record in self.records.items() if record["row"] is not None]
+
+    def __contains__(self, table: str) -> bool:
+        return table in self.records
+
+    def metadata(self, table: str) -> Any:
+        """Returns a table's metadata without its embedding."""
+        return self.records[table]["metadata"]
+
+    def vector(self, table: str) -> Optional[np.ndarray]:
+        """Returns a table's embedding as a read-only float32 view, or None."""
+        row = self.records[table]["row"]
+        return None if row is None else self.vectors[row]
+
+    def embedded_table(self, table: str) -> Any:
+        """
+        Returns a table in the embed_data output shape, embedding included.
+        """
+        metadata = self.metadata(table)
+        vector = self.vector(table)
+        if vector is None or not isinstance(metadata, dict):
+            return metadata
+        embedded_table = dict(metadata)
+        embedded_table["embedding"] = vector.tolist()
+        return embedded_table
+
+
+def load_embedded_metadata(base: str) -> Dict[str, Any]:
+    """
+    Loads a previous run's embedded metadata for reuse.
+
+    Reads the columnar store, falling back to the legacy pickle written by
+    older versions.
+
+    Args:
+        base: Artifact base path, e.g. data/embeddings/table_embeddings
+
+    Returns:
+        Table name mapped to metadata with its "embedding", or {} if nothing was saved
+    """
+    try:
+        store = EmbeddingStore(base)
+        return {table: store.embedded_table(table) for table in store.records}
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.warning(f"Could not read embedding store {base}: {e}")
+        return {}
+
+    legacy_path = base + LEGACY_PICKLE_SUFFIX
+    if not os.path.exists(legacy_path):
+        return {}
+    try:
+        with open(legacy_path, 'rb') as f:
+            return pickle.load(f)
+    except Exception as e:
+        logging.warning(f"Could not load previous embeddings from {legacy_path}: {e}")
+        return {}
+
+
+def changed_tables(base: str, embedded_metadata: Dict[str, Any]) -> Optional[List[str]]:
+    """
+    Compares embedded metadata against the saved store.
+
+    Args:
+        base: Artifact base path, e.g. data/embeddings/table_embeddings
+        embedded_metadata: Table name mapped to metadata with an "embedding" key
+
+    Returns:
+        Tables whose vector is new or differs from the saved one, or None if
+        there is no readable saved store to compare with
+    """
+    try:
+        store = EmbeddingStore(base)
+    except Exception:
+        return None
+    changed = []
+    for table_name, table_data in embedded_metadata.items():
+        if not isinstance(table_data, dict) or table_data.get("embedding") is None:
+            continue
+        previous = store.vector(table_name) if table_name in store else None
+        embedding = np.asarray(table_data["embedding"], dtype=np.float32)
+        if previous is None or previous.shape != embedding.shape or not np.array_equal(previous, embedding):
+            changed.append(table_name)
+    return changed
@@ -0,0 +1,68 @@
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator, Optional
+
+import google.generativeai as genai
+
+
+class GeminiKeyLock:
+    """
+    Serializes switches of the process-global Gemini API key.
+
+    ``genai.configure`` changes the key for every thread, so a call holds
+    the key it was made with until it returns. Calls using the configured
+    key run concurrently; a call needing another key waits until those
+    calls have finished, then switches. Calls arriving while a switch is
+    pending wait behind it, so a failover is never starved.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._key: Optional[str] = None
+        self._users = 0
+        # Calls waiting to switch to another key
+        self._pending = 0
+
+    @contextmanager
+    def use(self, api_key: Optional[str]) -> Iterator[None]:
+        """
+        Holds ``api_key`` as the configured key for the duration of a call.
+
+        Args:
+            api_key: The key the call must run with
+        """
+        with self._condition:
+            while True:
+                if self._key == api_key:
+                    if not self._pending:
+                        break
+                elif not self._users:
+                    genai.configure(api_key=api_key)
+                    self._key = api_key
+                    self._condition.notify_all()
+                    break
+                else:
+                    self._pending += 1
+                    try:
+                        self._condition.wait()
+                    finally:
+                        self._pending -= 1
+                    continue
+                self._condition.wait()
+            self._users += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._users -= 1
+                if not self._users:
+                    self._condition.notify_all()
+
+
+@lru_cache(maxsize=None)
+def get_gemini_key_lock() -> GeminiKeyLock:
+    """
+    Returns the process-wide key lock shared by every Gemini caller.
+    """
+    return GeminiKeyLock()
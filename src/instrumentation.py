@@ -0,0 +1,367 @@
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.embedding_store import atomic_write
+
+METRICS_DIR = os.path.join("data", "metrics")
+METRIC_PREFIX = "sqlmaker"
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+def _label_key(labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Span:
+    """One timed operation; spans opened inside it become its children."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes", "counters", "start", "duration", "error", "_token")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = attributes
+        self.counters: Dict[str, float] = defaultdict(float)
+        self.start = time.time()
+        self.duration = 0.0
+        self.error: Optional[str] = None
+        self._token = None
+
+    def set(self, **attributes) -> None:
+        """Adds attributes, e.g. result sizes known only at the end."""
+        self.attributes.update(attributes)
+
+    def record(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": round(1000 * self.duration, 3),
+            "attributes": self.attributes,
+            "counters": dict(self.counters),
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Returned while instrumentation is disabled; every operation does nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+    def set(self, **attributes) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _ActiveSpan:
+    """Context manager opening a span as a child of the current one."""
+
+    __slots__ = ("_instrumentation", "_span", "_started")
+
+    def __init__(self, instrumentation: "Instrumentation", name: str, attributes: Dict[str, Any]):
+        self._instrumentation = instrumentation
+        self._span = Span(name, _current_span.get(), attributes)
+        self._started = 0.0
+
+    def __enter__(self) -> Span:
+        self._span._token = _current_span.set(self._span)
+        self._span.start = time.time()
+        self._started = time.perf_counter()
+        return self._span
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        span = self._span
+        span.duration = time.perf_counter() - self._started
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            span.error = exc_type.__name__
+        try:
+            _current_span.reset(span._token)
+        except ValueError:
+            # A span inside a generator that is closed from another context
+            pass
+        self._instrumentation._finish(span)
+        return False
+
+
+class Exporter:
+    """Receives finished spans and counter increments."""
+
+    def export_span(self, span: Span) -> None:
+        pass
+
+    def export_count(self, name: str, labels: Tuple[Tuple[str, str], ...], value: float) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+
+class JsonlExporter(Exporter):
+    """Appends every finished span, with its counters, as one JSON line."""
+
+    def __init__(self, path: str = os.path.join(METRICS_DIR, "spans.jsonl")):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export_span(self, span: Span) -> None:
+        line = json.dumps(span.record(), default=str)
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+class PrometheusExporter(Exporter):
+    """
+    Aggregates spans and counters in memory and renders them in the
+    Prometheus text format.
+
+    Span durations become a ``<prefix>_span_seconds`` summary (sum and
+    count per span name) and counters become ``<prefix>_<name>_total``.
+    With a ``path`` the text is rewritten atomically when a root span
+    finishes, at most every ``flush_interval`` seconds and once more at
+    exit, for node_exporter's textfile collector or any scraper that
+    reads files.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = os.path.join(METRICS_DIR, "metrics.prom"),
+        prefix: str = METRIC_PREFIX,
+        flush_interval: float = 1.0
+    ):
+        self.path = path
+        self.prefix = prefix
+        self.flush_interval = flush_interval
+        self._flushed_at = float("-inf")
+        self._lock = threading.Lock()
+        self._span_sum: Dict[str, float] = defaultdict(float)
+        self._span_count: Dict[str, int] = defaultdict(int)
+        self._span_errors: Dict[str, int] = defaultdict(int)
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = defaultdict(float)
+        if path:
+            # Spans finished after the last timed flush
+            atexit.register(self.flush)
+
+    def export_span(self, span: Span) -> None:
+        with self._lock:
+            self._span_sum[span.name] += span.duration
+            self._span_count[span.name] += 1
+            if span.error is not None:
+                self._span_errors[span.name] += 1
+        if span.parent_id is None and self.path and time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def export_count(self, name: str, labels: Tuple[Tuple[str, str], ...], value: float) -> None:
+        with self._lock:
+            self._counters[(name, labels)] += value
+
+    @staticmethod
+    def _labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+        if not labels:
+            return ""
+        escaped = ",".join(
+            f'{key}="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+            for key, value in labels
+        )
+        return "{" + escaped + "}"
+
+    def render(self) -> str:
+        """Returns all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            metric = f"{self.prefix}_span_seconds"
+            lines.append(f"# HELP {metric} Time spent in instrumented operations.")
+            lines.append(f"# TYPE {metric} summary")
+            for name in sorted(self._span_count):
+                labels = self._labels((("span", name),))
+                lines.append(f"{metric}_sum{labels} {self._span_sum[name]:.6f}")
+                lines.append(f"{metric}_count{labels} {self._span_count[name]}")
+            metric = f"{self.prefix}_span_errors_total"
+            lines.append(f"# TYPE {metric} counter")
+            for name in sorted(self._span_errors):
+                lines.append(f"{metric}{self._labels((('span', name),))} {self._span_errors[name]}")
+            declared = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                metric = f"{self.prefix}_{name}_total"
+                if metric not in declared:
+                    lines.append(f"# TYPE {metric} counter")
+                    declared.add(metric)
+                lines.append(f"{metric}{self._labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self) -> None:
+        if not self.path:
+            return
+        self._flushed_at = time.monotonic()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        text = self.render()
+
+        def write(tmp_path):
+            with open(tmp_path, "w") as f:
+                f.write(text)
+
+        atomic_write(self.path, write)
+
+
+class Instrumentation:
+    """
+    Structured spans and counters, sent to pluggable exporters.
+
+    Spans nest through a context variable, so a span opened inside another
+    (in the same thread or coroutine) records it as its parent; counters
+    are attributed to the innermost open span as well as exported. With no
+    exporters the instance is disabled: ``span`` returns a shared no-op
+    object and ``count`` returns immediately.
+    """
+
+    def __init__(self, exporters: Optional[List[Exporter]] = None):
+        """
+        Args:
+            exporters: Where spans and counters go; none disables instrumentation
+        """
+        self.exporters = list(exporters or [])
+        self.enabled = bool(self.exporters)
+
+    def span(self, name: str, **attributes):
+        """
+        Times a block as a child of the current span::
+
+            with instrumentation.span("faiss.search", top_k=3) as span:
+                ...
+                span.set(results=len(tables))
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _ActiveSpan(self, name, attributes)
+
+    def count(self, name: str, value: float = 1, **labels) -> None:
+        """
+        Adds to a counter, e.g. ``count("llm_tokens", 812, kind="prompt")``.
+        """
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        current = _current_span.get()
+        if current is not None:
+            suffix = ",".join(f"{k}={v}" for k, v in key)
+            current.counters[f"{name}{{{suffix}}}" if suffix else name] += value
+        for exporter in self.exporters:
+            try:
+                exporter.export_count(name, key, value)
+            except Exception as e:
+                logging.warning(f"Metrics exporter {type(exporter).__name__} failed: {e}")
+
+    def _finish(self, span: Span) -> None:
+        for exporter in self.exporters:
+            try:
+                exporter.export_span(span)
+            except Exception as e:
+                logging.warning(f"Metrics exporter {type(exporter).__name__} failed: {e}")
+
+    def flush(self) -> None:
+        for exporter in self.exporters:
+            exporter.flush()
+
+
+def exporters_from_env() -> List[Exporter]:
+    """
+    Builds the exporters named in the INSTRUMENTATION environment variable,
+    a comma-separated list of "jsonl" and "prometheus"; files go to
+    INSTRUMENTATION_DIR (default data/metrics).
+    """
+    directory = os.getenv("INSTRUMENTATION_DIR", METRICS_DIR)
+    exporters = []
+    for name in os.getenv("INSTRUMENTATION", "").lower().split(","):
+        name = name.strip()
+        if name == "jsonl":
+            exporters.append(JsonlExporter(os.path.join(directory, "spans.jsonl")))
+        elif name == "prometheus":
+            exporters.append(PrometheusExporter(os.path.join(directory, "metrics.prom")))
+        elif name:
+            logging.warning(f"Unknown instrumentation exporter: {name}")
+    return exporters
+
+
+@lru_cache(maxsize=None)
+def get_instrumentation() -> Instrumentation:
+    """
+    Returns the process-wide instrumentation, configured from the environment.
+    """
+    return Instrumentation(exporters_from_env())
+
+
+def span(name: str, **attributes):
+    """Opens a span on the process-wide instrumentation."""
+    return get_instrumentation().span(name, **attributes)
+
+
+def count(name: str, value: float = 1, **labels) -> None:
+    """Adds to a counter on the process-wide instrumentation."""
+    get_instrumentation().count(name, value, **labels)
+
+
+def record_llm_usage(response: Any, operation: str) -> None:
+    """
+    Counts the prompt and output tokens a Gemini response reports.
+
+    Args:
+        response: A response, or the last chunk of a streamed one
+        operation: What the call was for, e.g. "metadata" or "response"
+    """
+    instrumentation = get_instrumentation()
+    if not instrumentation.enabled:
+        return
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for kind, field in (("prompt", "prompt_token_count"), ("output", "candidates_token_count")):
+        tokens = getattr(usage, field, None)
+        if tokens:
+            instrumentation.count("llm_tokens", tokens, kind=kind, operation=operation)
+
+
+def traced(name: str) -> Callable:
+    """
+    Decorator running a function inside a span, for pipeline steps::
+
+        @step
+        @traced("step.embed_data")
+        def embed_data(...):
+    """
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            instrumentation = get_instrumentation()
+            if not instrumentation.enabled:
+                return function(*args, **kwargs)
+            with instrumentation.span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
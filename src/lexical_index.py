@@ -0,0 +1,301 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from src.embedding_store import atomic_write
+from src.metaDataGeneration import parse_table_metadata
+
+LEXICAL_INDEX_PATH = os.path.join("data", "embeddings", "lexical_index.json")
+
+# Field weights: naming a table matters more than naming a column, which
+# matters more than a word that only appears in a description.
+TABLE_NAME_WEIGHT = 3.0
+COLUMN_NAME_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it me my of on or "
+    "show that the their there these this to was what when where which who why "
+    "with write query sql all each per give get list find return based table tables".split()
+)
+
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into lowercase terms, breaking snake_case and camelCase identifiers.
+
+    A trailing plural "s" is dropped so "orders" matches "order".
+    """
+    terms = []
+    for word in _NON_WORD.split(_CAMEL_BOUNDARY.sub(" ", text).lower()):
+        if not word or word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def _name_keys(words: List[str]) -> List[str]:
+    """Lookup keys for a sequence of name parts, with and without a plural "s"."""
+    keys = []
+    for joined in ("_".join(words), "".join(words)):
+        keys.append(joined)
+        if len(joined) > 3 and joined.endswith("s"):
+            keys.append(joined[:-1])
+    return keys
+
+
+def _name_parts(text: str) -> List[str]:
+    return _NON_WORD.split(_CAMEL_BOUNDARY.sub(" ", text).lower())
+
+
+class LexicalResult(NamedTuple):
+    """Outcome of the lexical pre-routing stage."""
+    tables: List[str]
+    scores: List[float]
+    mentioned: List[str]
+    confident: bool
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over table names, column names and metadata descriptions.
+
+    Built at training time and used as a first, local retrieval stage: when
+    a question literally names tables (or one table clearly dominates the
+    BM25 ranking) the remote query embedding can be skipped entirely.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, float]] = {}
+        self.doc_lengths: Dict[str, float] = {}
+        self._names: Optional[Dict[str, List[str]]] = None
+        self._max_name_parts = 1
+        self._avg_doc_length: Optional[float] = None
+
+    @property
+    def avg_doc_length(self) -> float:
+        if self._avg_doc_length is None:
+            self._avg_doc_length = sum(self.doc_lengths.values()) / len(self.doc_lengths) if self.doc_lengths else 0.0
+        return self._avg_doc_length
+
+    def build(self, metadata: Dict[str, Any]) -> "LexicalIndex":
+        """
+        Indexes every table's metadata.
+
+        Args:
+            metadata: Table name mapped to generated metadata (JSON text or dict)
+
+        Returns:
+            The index itself
+        """
+        postings = defaultdict(dict)
+        doc_lengths = {}
+        for table, table_data in metadata.items():
+            parsed = parse_table_metadata(table, table_data)
+            weights = Counter()
+            for term in tokenize(table):
+                weights[term] += TABLE_NAME_WEIGHT
+            for column in parsed.get("columns", []) or []:
+                if isinstance(column, dict):
+                    for term in tokenize(str(column.get("name", ""))):
+                        weights[term] += COLUMN_NAME_WEIGHT
+                    for term in tokenize(str(column.get("description", ""))):
+                        weights[term] += DESCRIPTION_WEIGHT
+            for field in ("schema_description", "raw_text"):
+                for term in tokenize(str(parsed.get(field, ""))):
+                    weights[term] += DESCRIPTION_WEIGHT
+            for term, weight in weights.items():
+                postings[term][table] = weight
+            doc_lengths[table] = float(sum(weights.values()))
+        self.postings = dict(postings)
+        self.doc_lengths = doc_lengths
+        self._names = None
+        self._avg_doc_length = None
+        return self
+
+    def save(self, path: str = LEXICAL_INDEX_PATH) -> None:
+        """Atomically writes the index as JSON."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        def dump(tmp_path):
+            with open(tmp_path, "w") as f:
+                json.dump({"k1": self.k1, "b": self.b, "postings": self.postings, "doc_lengths": self.doc_lengths}, f, separators=(",", ":"))
+
+        atomic_write(path, dump)
+
+    @classmethod
+    def load(cls, path: str = LEXICAL_INDEX_PATH) -> "LexicalIndex":
+        """Reads an index written by ``save``."""
+        with open(path, "r") as f:
+            payload = json.load(f)
+        index = cls(k1=payload["k1"], b=payload["b"])
+        index.postings = payload["postings"]
+        index.doc_lengths = payload["doc_lengths"]
+        return index
+
+    def _name_lookup(self) -> Dict[str, List[str]]:
+        """Builds (once) a dict from normalized table-name spellings to tables."""
+        if self._names is None:
+            names = defaultdict(list)
+            for table in self.doc_lengths:
+                parts = [part for part in _name_parts(table) if part]
+                self._max_name_parts = max(self._max_name_parts, len(parts))
+                for key in set(_name_keys(parts)):
+                    names[key].append(table)
+            self._names = dict(names)
+        return self._names
+
+    def mentioned_tables(self, query: str) -> List[str]:
+        """
+        Returns the tables whose name appears literally in the query.
+
+        "order_items", "orderItems", "order items" and "order item" all name
+        the table order_items. Cost is linear in the query length, not in the
+        number of tables.
+        """
+        names = self._name_lookup()
+        words = [word for word in _name_parts(query) if word]
+        mentioned = []
+        for size in range(1, self._max_name_parts + 1):
+            for start in range(len(words) - size + 1):
+                for key in _name_keys(words[start:start + size]):
+                    for table in names.get(key, ()):
+                        if table not in mentioned:
+                            mentioned.append(table)
+        return mentioned
+
+    def search(self, query: str, top_k: int = 3) -> List[Tuple[str, float]]:
+        """
+        Ranks tables by BM25 score for the query.
+
+        Returns:
+            Up to ``top_k`` (table, score) pairs with a positive score, best first
+        """
+        n_docs = len(self.doc_lengths)
+        if not n_docs:
+            return []
+        avg_length = self.avg_doc_length or 1.0
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for table, tf in posting.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[table] / avg_length)
+                scores[table] += idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:top_k]
+
+    def route(
+        self,
+        query: str,
+        top_k: int = 3,
+        min_score: float = 4.0,
+        min_margin: float = 1.5,
+        selected: Optional[Iterable[str]] = None
+    ) -> LexicalResult:
+        """
+        Runs the lexical stage and decides whether it is confident enough to
+        skip vector retrieval.
+
+        The result is confident when the query names a table with a
+        multi-word name outright ("order items"), or when the best BM25 score
+        is at least ``min_score`` and ``min_margin`` times the runner-up.
+        Single-word names ("order", "user") are everyday words, so naming one
+        still ranks it first but only skips vector retrieval if BM25 agrees.
+        Tables the user already selected are part of the answer anyway, so
+        matching them never makes the result confident.
+
+        Args:
+            query: The user question
+            top_k: Number of tables to return
+            min_score: Minimum top BM25 score for a confident ranking
+            min_margin: Minimum ratio of the top score to the second score
+            selected: Tables the user selected
+
+        Returns:
+            LexicalResult with the mentioned tables first, then BM25 hits
+        """
+        mentioned = self.mentioned_tables(query)
+        ranked = self.search(query, top_k=max(top_k, len(mentioned)))
+        tables = list(mentioned)
+        scores = [float("inf")] * len(mentioned)
+        for table, score in ranked:
+            if table not in tables:
+                tables.append(table)
+                scores.append(score)
+        tables, scores = tables[:max(top_k, len(mentioned))], scores[:max(top_k, len(mentioned))]
+
+        selected = set(selected or ())
+        confident = any(
+            table not in selected and len([part for part in _name_parts(table) if part]) > 1
+            for table in mentioned
+        )
+        if not confident and ranked and ranked[0][0] not in selected:
+            top = ranked[0][1]
+            runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+            confident = top >= min_score and top >= min_margin * runner_up
+        return LexicalResult(tables=tables, scores=scores, mentioned=mentioned, confident=confident)
+
+
+def fuse_rankings(lexical: List[str], vector: List[str], top_k: int = 3, k: int = 60) -> List[str]:
+    """
+    Merges lexical and vector rankings with reciprocal rank fusion.
+
+    Args:
+        lexical: Tables ranked by the lexical stage
+        vector: Tables ranked by vector similarity
+        top_k: Number of tables to return
+        k: RRF damping constant
+
+    Returns:
+        The fused ranking
+    """
+    scores = defaultdict(float)
+    for ranking in (lexical, vector):
+        for rank, table in enumerate(ranking):
+            scores[table] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda table: scores[table], reverse=True)[:top_k]
+
+
+_cache_lock = threading.Lock()
+_cache: Dict[str, Tuple[int, LexicalIndex]] = {}
+
+
+def get_lexical_index(path: str = LEXICAL_INDEX_PATH) -> Optional[LexicalIndex]:
+    """
+    Returns the process-wide lexical index, reloading it when the file changes.
+
+    Returns:
+        The index, or None if training has not built one yet
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            index = LexicalIndex.load(path)
+        except Exception as e:
+            logging.error(f"Error loading lexical index {path}: {e}")
+            return cached[1] if cached else None
+        _cache[path] = (mtime, index)
+        return index
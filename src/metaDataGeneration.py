@@ -1,55 +1,66 @@
+import contextvars
 import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Optional
 
 from abc import ABC, abstractmethod
 import google.generativeai as genai
 from dotenv import load_dotenv
 import os
 import json
+
+from src.gemini_keys import get_gemini_key_lock
+from src.instrumentation import count, record_llm_usage, span
+from src.metadata_store import get_metadata_store
+from src.rate_limiter import RateLimiter, estimate_tokens
 load_dotenv('.env')
 
-class MetaDataGeneration(ABC):
+def load_table_metadata(table: str) -> Optional[str]:
     """
-    Abstract base class for generating metadata for tables and their schemas.
+    Loads previously generated metadata for a table.
+
+    Returns:
+        Optional[str]: The metadata text, or None if the table has none stored.
     """
-    @abstractmethod
-    def generate_metadata(self) -> dict:
-        """
-        Generates metadata for the tables and their schemas.
-        
-        Returns:
-            dict: A dictionary containing metadata information.
-        """
-        pass
+    try:
+        return get_metadata_store().get(table)
+    except sqlite3.Error as e:
+        logging.error(f"Could not read metadata for table {table}: {e}")
+        return None
 
-class GeminiMetaDataCreation(MetaDataGeneration):
+
+def parse_table_metadata(table: str, text) -> dict:
     """
-    Class for generating metadata using Gemini API.
+    Parses generated metadata into a dict, tolerating markdown code fences.
+
+    Args:
+        table (str): The table the metadata describes.
+        text: The metadata as generated (JSON text) or already parsed.
+
+    Returns:
+        dict: The parsed metadata, or {"table_name": table, "raw_text": text} if it is not JSON.
     """
+    if isinstance(text, dict):
+        return text
+    if not isinstance(text, str):
+        return {"table_name": table, "raw_text": str(text)}
+    stripped = text.strip()
+    if stripped.startswith("```"):
+        stripped = stripped.split("\n", 1)[1] if "\n" in stripped else ""
+        stripped = stripped.rsplit("```", 1)[0]
+    try:
+        parsed = json.loads(stripped)
+    except ValueError:
+        return {"table_name": table, "raw_text": text}
+    return parsed if isinstance(parsed, dict) else {"table_name": table, "raw_text": text}
 
-    def __init__(self, tables: list, schemas: dict):
-        """
-        Initializes the GeminiMetaDataCreation class.
-        
-        Args:
-            tables (list): List of table names.
-            schemas (dict): Dictionary containing table schemas.
-        """
-        self.tables = tables
-        self.schemas = schemas
 
-    def generate_metadata(self) -> dict:
-        """
-        Generates metadata for the tables and their schemas using Gemini API.
-        
-        Returns:
-            dict: A dictionary containing metadata information.
-        """
-        try:
-            # Initialize the Gemini API client
-            genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+def remove_table_metadata(table: str) -> None:
+    """Deletes a table's stored metadata if it exists."""
+    get_metadata_store().remove(table)
 
-            # Generate metadata for each table
-            output_format = """
+OUTPUT_FORMAT = """
                 {{
                 "table_name": "string",
                 "schema_description": "string",
@@ -63,7 +74,7 @@ class GeminiMetaDataCreation(MetaDataGeneration):
                 "embedding_text": "string"
                 }}
                 """
-            example = """
+EXAMPLE = """
                     {
                         "table_name": "users",
                         "schema_description": "A table to store user details including identity, name, contact, and creation timestamp.",
@@ -92,7 +103,7 @@ class GeminiMetaDataCreation(MetaDataGeneration):
                         "embedding_text": "The 'users' table contains user details including an ID, full name, optional email address, and a creation timestamp."
                         }
                 """
-            restrictions = """
+RESTRICTIONS = """
             1. "```json\n{\n  \"table_name\": \"employees\",\n  \"schema_description\": \"This table stores information about employees, including their ID, name, salary, and bonus.\",\n  \"columns\": [\n    {\n      \"name\": \"employee_id\",\n      \"type\": \"int\",\n      \"description\": \"Unique identifier for each employee.\"\n    },\n    {\n      \"name\": \"name\",\n      \"type\": \"varchar(100)\",\n      \"description\": \"Employee's name.\"\n    },\n    {\n      \"name\": \"salary\",\n      \"type\": \"decimal(10,2)\",\n      \"description\": \"Employee's salary.\"\n    },\n    {\n      \"name\": \"bonus\",\n      \"type\": \"decimal(10,2)\",\n      \"description\": \"Employee's bonus.\"\n    }\n  ],\n  \"embedding_text\": \"The 'employees' table stores employee data, including a unique employee ID, employee name, salary, and bonus amount.\"\n}\n```\n"
             2. "```json\n{\n  \"table_name\": \"products\",\n  \"schema_description\": \"This table contains product information, including product ID, name, price, and stock quantity.\",\n  \"columns\": [\n    {\n      \"name\": \"product_id\",\n      \"type\": \"int\",\n      \"description\": \"Unique identifier for each product.\"\n    },\n    {\n      \"name\": \"product_name\",\n      \"type\": \"varchar(100)\",\n      \"description\": \"Name of the product.\"\n    },\n    {\n      \"name\": \"price\",\n      \"type\": \"decimal(10,2)\",\n      \"description\": \"Price of the product.\"\n    },\n    {\n      \"name\": \"stock_quantity\",\n      \"type\": \"int\",\n      \"description\": \"Available stock quantity of the product.\"\n    }\n  ],\n  \"embedding_text\": \"The 'products' table contains product details, including a unique product ID, product name, price, and available stock quantity.\"\n}\n```\n" 
 
@@ -111,10 +122,59 @@ class GeminiMetaDataCreation(MetaDataGeneration):
                 "embedding_text": "string"
             }       
             """
-            metadata = {}
-            for table in self.tables:
-                schema = self.schemas.get(table, {})
-                prompt = f"""
+
+class MetaDataGeneration(ABC):
+    """
+    Abstract base class for generating metadata for tables and their schemas.
+    """
+    @abstractmethod
+    def generate_metadata(self) -> dict:
+        """
+        Generates metadata for the tables and their schemas.
+        
+        Returns:
+            dict: A dictionary containing metadata information.
+        """
+        pass
+
+class GeminiMetaDataCreation(MetaDataGeneration):
+    """
+    Class for generating metadata using Gemini API.
+    """
+
+    def __init__(
+        self,
+        tables: list,
+        schemas: dict,
+        max_workers: int = 1,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        on_table_complete: Optional[Callable[[str, str], None]] = None,
+    ):
+        """
+        Initializes the GeminiMetaDataCreation class.
+        
+        Args:
+            tables (list): List of table names.
+            schemas (dict): Dictionary containing table schemas.
+            max_workers (int): Number of tables generated concurrently. 1 keeps the sequential path.
+            requests_per_minute (Optional[int]): Gemini request quota, or None for no limit.
+            tokens_per_minute (Optional[int]): Gemini token quota, or None for no limit.
+            on_table_complete (Optional[Callable[[str, str], None]]): Called with the table
+                name and its metadata once the table's chunk has been saved.
+        """
+        self.tables = tables
+        self.schemas = schemas
+        self.max_workers = max(1, max_workers)
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.on_table_complete = on_table_complete
+
+    def _build_prompt(self, table: str) -> str:
+        """
+        Builds the metadata generation prompt for one table.
+        """
+        schema = self.schemas.get(table, {})
+        return f"""
                     [INSTRUCTION]
                     You are a database schema metadata generator. Based on the provided schema definition, generate a JSON object that includes structured metadata and a natural-language description of the table.
                     Please stick to the data format and structure provided in the example.
@@ -134,53 +194,114 @@ class GeminiMetaDataCreation(MetaDataGeneration):
 
 
                     [OUTPUT FORMAT]
-                    {output_format}
+                    {OUTPUT_FORMAT}
 
                     [RESTRICTIONS]
-                    {restrictions}
+                    {RESTRICTIONS}
 
                     [EXAMPLE]
-                    {example}
+                    {EXAMPLE}
 
                 """
-                try:
+
+    def _generate_content(self, prompt: str):
+        """
+        Calls Gemini, falling back to the backup API keys if the primary key fails.
+
+        Every call holds its key through the shared key lock, so a failover
+        never switches the process-global key under another worker's call.
+
+        Raises:
+            Exception: If every configured API key fails.
+        """
+        keys = get_gemini_key_lock()
+        # Reserve the prompt plus a completion of similar size against the quota.
+        with span("gemini.rate_limit"):
+            self.rate_limiter.acquire(tokens=2 * estimate_tokens(prompt))
+        try:
+            with keys.use(os.getenv('GEMINI_API_KEY')), span("gemini.generate", operation="metadata"):
+                llm = genai.GenerativeModel('gemini-1.5-flash')
+                response = llm.generate_content(prompt)
+            record_llm_usage(response, "metadata")
+            return response
+        except Exception as e:
+            logging.warning(f"API error occurred with primary key: {e}")
+
+        # Try backup API keys
+        for i in range(2, 6):  # Try API keys 2 through 5
+            try:
+                logging.info(f"Attempting to use backup API key {i}")
+                count("api_retries", provider="gemini", operation="metadata")
+                # Wait for quota before taking the key, never while holding it
+                self.rate_limiter.acquire(tokens=2 * estimate_tokens(prompt))
+                with keys.use(os.getenv(f'GEMINI_API_KEY{i}')), span("gemini.generate", operation="metadata", key=i):
                     llm = genai.GenerativeModel('gemini-1.5-flash')
                     response = llm.generate_content(prompt)
-                except Exception as e:
-                    logging.warning(f"API error occurred with primary key: {e}")
-                    
-                    # Try backup API keys
-                    success = False
-                    for i in range(2, 6):  # Try API keys 2 through 5
-                        try:
-                            # Reconfigure with next backup API key
-                            logging.info(f"Attempting to use backup API key {i}")
-                            genai.configure(api_key=os.getenv(f'GEMINI_API_KEY{i}'))
-                            llm = genai.GenerativeModel('gemini-1.5-flash')
-                            response = llm.generate_content(prompt)
-                            logging.info(f"Successfully used backup API key {i}")
-                            success = True
-                            break
-                        except Exception as backup_error:
-                            logging.warning(f"Failed with API key {i}: {backup_error}")
-                    
-                    if not success:
-                        logging.error("All API keys failed")
-                        raise Exception("All Gemini API keys failed")
-                    
-                metadata[table] = response.text
-
-                try:
-                    # Save the current cumulative metadata to a JSON file.
-                    # This file will be overwritten in each iteration.
-                    # Ensure the 'json' module is imported at the top of your Python file (import json).
-                    with open(f'data/chunk/{table}.json', 'w') as json_outfile:
-                        json.dump(response.text, json_outfile, indent=4)
-                    logging.info(f"Metadata for table {table} saved to {table}.json")
-                except IOError as file_io_error:
-                    logging.error(f"Failed to write metadata to metadata.json: {file_io_error}")
-
-            return metadata
+                record_llm_usage(response, "metadata")
+                logging.info(f"Successfully used backup API key {i}")
+                return response
+            except Exception as backup_error:
+                logging.warning(f"Failed with API key {i}: {backup_error}")
+
+        logging.error("All API keys failed")
+        raise Exception("All Gemini API keys failed")
+
+    def _generate_table(self, table: str) -> str:
+        """
+        Generates the metadata text for a single table.
+        """
+        with span("metadata.table", table=table):
+            response = self._generate_content(self._build_prompt(table))
+            return response.text
+
+    def _save_table(self, table: str, text: str) -> None:
+        """
+        Writes one table's metadata, with the schema it describes, to the metadata store.
+        """
+        try:
+            get_metadata_store().put(table, text, schema=self.schemas.get(table))
+            logging.info(f"Metadata for table {table} saved to the metadata store")
+        except sqlite3.Error as store_error:
+            logging.error(f"Failed to store metadata for {table}: {store_error}")
+            return
+        if self.on_table_complete is not None:
+            self.on_table_complete(table, text)
+
+    def generate_metadata(self) -> dict:
+        """
+        Generates metadata for the tables and their schemas using Gemini API.
+
+        With ``max_workers`` > 1 tables are generated concurrently and each
+        table is saved as soon as it completes; the returned dictionary is
+        ordered like ``self.tables`` in both modes.
+        
+        Returns:
+            dict: A dictionary containing metadata information.
+        """
+        try:
+            results = {}
+            if self.max_workers == 1:
+                for table in self.tables:
+                    results[table] = self._generate_table(table)
+                    self._save_table(table, results[table])
+            else:
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    # Each table runs in a copy of this context, so its spans nest under the caller's
+                    futures = {
+                        executor.submit(contextvars.copy_context().run, self._generate_table, table): table
+                        for table in self.tables
+                    }
+                    try:
+                        for future in as_completed(futures):
+                            table = futures[future]
+                            results[table] = future.result()
+                            self._save_table(table, results[table])
+                    except Exception:
+                        for future in futures:
+                            future.cancel()
+                        raise
+
+            return {table: results[table] for table in self.tables}
         except Exception as e:
             logging.error(f"Error generating metadata: {e}")
-            return {}
\ No newline at end of file
+            return {}
@@ -0,0 +1,200 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from src.instrumentation import count
+
+CHUNK_DIR = os.path.join('data', 'chunk')
+METADATA_STORE_PATH = os.path.join(CHUNK_DIR, 'metadata.sqlite')
+
+# SQLite limits the number of bound parameters per statement.
+_MAX_LOOKUP_BATCH = 500
+
+
+def legacy_chunk_path(table: str) -> str:
+    """Returns the path of a table's legacy data/chunk/<table>.json file."""
+    return os.path.join(CHUNK_DIR, f'{table}.json')
+
+
+def _load_legacy_chunk(table: str) -> Optional[str]:
+    try:
+        with open(legacy_chunk_path(table), 'r') as json_infile:
+            return json.load(json_infile)
+    except (IOError, ValueError):
+        return None
+
+
+class MetadataStore:
+    """
+    Single-file store for generated table metadata.
+
+    All tables live in one SQLite file keyed by table name, with an
+    in-memory LRU in front, so loading the context for a question costs one
+    indexed read instead of one file open per table. Writes from another
+    process (a training run) are picked up through SQLite's data_version,
+    which clears the LRU. Tables written by older versions as
+    data/chunk/<table>.json are still read as a fallback.
+    """
+
+    def __init__(self, path: str = METADATA_STORE_PATH, cache_entries: int = 1024):
+        """
+        Opens (or creates) the store.
+
+        Args:
+            path (str): SQLite file holding the metadata.
+            cache_entries (int): Maximum tables kept in the in-memory LRU.
+        """
+        self.path = path
+        self.cache_entries = cache_entries
+        self._cache: "OrderedDict[str, Tuple[str, Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS metadata ("
+            "table_name TEXT PRIMARY KEY, metadata TEXT NOT NULL, schema_json TEXT)"
+        )
+        self._db.commit()
+        self._data_version = self._read_data_version()
+
+    def _read_data_version(self) -> int:
+        return self._db.execute("PRAGMA data_version").fetchone()[0]
+
+    def _check_external_writes(self) -> None:
+        """Drops the LRU if another connection committed since the last check."""
+        data_version = self._read_data_version()
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self._cache.clear()
+
+    def _remember(self, table: str, record: Tuple[str, Optional[str]]) -> None:
+        self._cache[table] = record
+        self._cache.move_to_end(table)
+        while len(self._cache) > self.cache_entries:
+            self._cache.popitem(last=False)
+
+    def put(self, table: str, metadata: str, schema: Any = None) -> None:
+        """
+        Stores a table's metadata, replacing any previous version.
+
+        Args:
+            table (str): The table name.
+            metadata (str): The generated metadata text.
+            schema (Any): The table schema the metadata was generated from.
+        """
+        schema_json = json.dumps(schema, default=str) if schema is not None else None
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO metadata (table_name, metadata, schema_json) VALUES (?, ?, ?)",
+                (table, metadata, schema_json),
+            )
+            self._db.commit()
+            self._remember(table, (metadata, schema_json))
+
+    def _lookup(self, tables: List[str]) -> Dict[str, Tuple[str, Optional[str]]]:
+        """Returns (metadata, schema_json) per table, reading LRU misses in one query."""
+        found = {}
+        with self._lock:
+            self._check_external_writes()
+            missing = []
+            for table in dict.fromkeys(tables):
+                record = self._cache.get(table)
+                if record is not None:
+                    self._cache.move_to_end(table)
+                    found[table] = record
+                else:
+                    missing.append(table)
+            count("cache_requests", len(found), cache="metadata", result="hit")
+            count("cache_requests", len(missing), cache="metadata", result="miss")
+            for start in range(0, len(missing), _MAX_LOOKUP_BATCH):
+                batch = missing[start:start + _MAX_LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT table_name, metadata, schema_json FROM metadata WHERE table_name IN ({placeholders})", batch
+                ).fetchall()
+                for table, metadata, schema_json in rows:
+                    found[table] = (metadata, schema_json)
+                    self._remember(table, found[table])
+
+        for table in tables:
+            if table not in found:
+                metadata = _load_legacy_chunk(table)
+                if metadata is not None:
+                    found[table] = (metadata, None)
+        return {table: found[table] for table in tables if table in found}
+
+    def get_many(self, tables: List[str]) -> Dict[str, str]:
+        """
+        Loads the metadata of several tables.
+
+        Tables not in the LRU are read in a single indexed query.
+
+        Args:
+            tables (List[str]): Table names.
+
+        Returns:
+            Dict[str, str]: Metadata per table, in the order given; tables
+            without metadata are left out.
+        """
+        return {table: record[0] for table, record in self._lookup(tables).items()}
+
+    def get_records(self, tables: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Loads the metadata of several tables together with their schemas.
+
+        Args:
+            tables (List[str]): Table names.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: {"metadata": text, "schema": rows or None}
+            per table, in the order given; tables without metadata are left out.
+        """
+        return {
+            table: {"metadata": metadata, "schema": json.loads(schema_json) if schema_json else None}
+            for table, (metadata, schema_json) in self._lookup(tables).items()
+        }
+
+    def get(self, table: str) -> Optional[str]:
+        """
+        Loads one table's metadata.
+
+        Returns:
+            Optional[str]: The metadata text, or None if the table has none.
+        """
+        return self.get_many([table]).get(table)
+
+    def tables(self) -> Set[str]:
+        """
+        Returns every table that has metadata, including legacy chunk files.
+        """
+        with self._lock:
+            stored = {row[0] for row in self._db.execute("SELECT table_name FROM metadata")}
+        if os.path.isdir(CHUNK_DIR):
+            stored.update(name[:-len('.json')] for name in os.listdir(CHUNK_DIR) if name.endswith('.json'))
+        return stored
+
+    def remove(self, table: str) -> None:
+        """Deletes a table's metadata, including any legacy chunk file."""
+        with self._lock:
+            self._db.execute("DELETE FROM metadata WHERE table_name = ?", (table,))
+            self._db.commit()
+            self._cache.pop(table, None)
+        try:
+            os.remove(legacy_chunk_path(table))
+        except FileNotFoundError:
+            pass
+
+
+@lru_cache(maxsize=None)
+def get_metadata_store(path: str = METADATA_STORE_PATH) -> MetadataStore:
+    """
+    Returns the process-wide metadata store for ``path``.
+    """
+    return MetadataStore(path=path)
@@ -0,0 +1,240 @@
+import logging
+import os
+from functools import lru_cache
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from src.answer_cache import SemanticAnswerCache
+from src.data_embedding import DataEmbedding, get_query_embedder
+from src.context_builder import ContextBuilder
+from src.data_response import GeminiResponse, Response, log_response
+from src.instrumentation import count, span
+from src.lexical_index import fuse_rankings, get_lexical_index
+from src.training_manifest import current_schema_version
+from src.vector_index import embeddings_dir, get_resident_index
+
+
+class QueryEngine:
+    """
+    Answers questions in-process, without the ZenML orchestrator.
+
+    Runs the same stages as test_database_pipeline (lexical routing, query
+    embedding, vector search and response generation) with the same
+    components, but as plain function calls. No pipeline run is registered
+    and no step artifacts are written, so a question costs only the work
+    it actually needs. The pipeline remains available for audited runs.
+    """
+
+    def __init__(
+        self,
+        embedder: Optional[DataEmbedding] = None,
+        responder: Optional[Response] = None,
+        base: Optional[str] = None,
+        top_k: int = 3,
+        nprobe: int = 16,
+        ef_search: int = 64,
+        rerank: int = 0,
+        log_responses: bool = False,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+        context_builder: Optional[ContextBuilder] = None
+    ):
+        """
+        Args:
+            embedder: Query embedding strategy; defaults to the shared cached embedder
+            responder: Response strategy; defaults to GeminiResponse
+            base: Artifact base path of the table index; defaults to
+                data/embeddings/table_embeddings
+            top_k: Number of tables retrieved per question
+            nprobe: IVF lists probed per query
+            ef_search: HNSW candidate list size per query
+            rerank: Candidates per result re-ranked exactly; 0 disables re-ranking
+            log_responses: Also record every answer in the per-session response log
+            answer_cache: Cache serving answers to repeated and paraphrased
+                questions; None generates every answer
+            context_builder: Renders the prompt context within a token budget;
+                defaults to ContextBuilder()
+        """
+        self.embedder = embedder or get_query_embedder()
+        self.responder = responder or GeminiResponse()
+        self.base = base or os.path.join(embeddings_dir(), "table_embeddings")
+        self.top_k = top_k
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.rerank = rerank
+        self.log_responses = log_responses
+        self.answer_cache = answer_cache
+        self.context_builder = context_builder or ContextBuilder()
+
+    def retrieve(self, query: str, include_tables: Optional[List[str]] = None) -> List[str]:
+        """
+        Finds the tables relevant to a question.
+
+        A confident lexical match is used as-is; otherwise the query is
+        embedded and the vector results are fused with the lexical ones.
+
+        Args:
+            query: The user question
+            include_tables: Tables the user selected; matching only these
+                never skips vector retrieval
+
+        Returns:
+            Table names, most relevant first
+        """
+        return self._retrieve(query, include_tables)[0]
+
+    def _retrieve(self, query: str, include_tables: Optional[List[str]] = None) -> Tuple[List[str], Optional[List[float]]]:
+        """Returns the relevant tables and the query embedding, if one was needed."""
+        with span("query.retrieve", top_k=self.top_k) as current:
+            lexical_tables = []
+            lexical_index = get_lexical_index()
+            if lexical_index is not None:
+                with span("query.lexical"):
+                    result = lexical_index.route(query, top_k=self.top_k, selected=include_tables)
+                if result.confident:
+                    logging.info(f"Using lexical tables without vector search: {result.tables}")
+                    current.set(route="lexical")
+                    return result.tables[:self.top_k], None
+                lexical_tables = result.tables
+
+            query_embedding = self.embedder.embed_query(query)
+            resident_index = get_resident_index(self.base, self.nprobe, self.ef_search, self.rerank)
+            similar_tables = resident_index.search(query_embedding, self.top_k, model=self.embedder.vector_space)
+            if lexical_tables:
+                similar_tables = fuse_rankings(lexical_tables, similar_tables, self.top_k)
+            logging.info(f"Found similar tables: {similar_tables}")
+            current.set(route="hybrid" if lexical_tables else "vector")
+            return similar_tables, query_embedding
+
+    def answer(self, query: str, include_tables: Optional[List[str]] = None, session_id: Optional[str] = None) -> str:
+        """
+        Answers a question about the trained database.
+
+        The answer is returned to the caller directly; nothing is shared
+        between requests on disk.
+
+        Args:
+            query: The user question
+            include_tables: Tables the user selected, added to the retrieved ones
+            session_id: The asking session, used to key the optional response log
+
+        Returns:
+            The model's response text
+        """
+        with span("query.answer"):
+            question = self._prepare(query, include_tables)
+            if question.cached_answer is not None:
+                resp = question.cached_answer
+            else:
+                content_chunks = self._context(question)
+                resp = self.responder.get_response(matching_chunks=content_chunks, query=query)
+                self._remember(query, question, resp)
+            if self.log_responses:
+                log_response(query, resp, session_id=session_id)
+            return resp
+
+    def stream_answer(self, query: str, include_tables: Optional[List[str]] = None, session_id: Optional[str] = None) -> Iterator[str]:
+        """
+        Answers a question, yielding the response text as it is generated.
+
+        Retrieval runs before this returns, so retrieval errors are raised
+        here; only generation is deferred to the returned iterator. A cached
+        answer is yielded in one piece.
+
+        Args:
+            query: The user question
+            include_tables: Tables the user selected, added to the retrieved ones
+            session_id: The asking session, used to key the optional response log
+
+        Returns:
+            Iterator over pieces of the response text
+        """
+        with span("query.prepare"):
+            question = self._prepare(query, include_tables)
+        return self._stream(query, question, session_id)
+
+    def _prepare(self, query: str, include_tables: Optional[List[str]]) -> "PreparedQuestion":
+        """
+        Retrieves the tables for a question and looks it up in the answer cache.
+
+        After a confident lexical match the question is not embedded up front:
+        an identical cached question hits on its text alone, and the
+        embedding is computed only when a cached answer for the same tables
+        could match it semantically. Answers to questions that were never
+        embedded are cached for textual matches only.
+        """
+        matching_tables, query_embedding = self._retrieve(query, include_tables)
+        selected = list(dict.fromkeys(include_tables or []))
+        retrieved = [table for table in matching_tables if table not in selected]
+        if self.answer_cache is None:
+            return PreparedQuestion(retrieved, selected, query_embedding, None, None)
+
+        tables = retrieved + selected
+        schema_version = current_schema_version(tables)
+        if query_embedding is None:
+            # Confident lexical route: only embed when a cached answer could match semantically
+            computed = []
+
+            def embed():
+                computed.append(self.embedder.embed_query(query))
+                return computed[0]
+
+            cached_answer = self.answer_cache.lookup(query, tables, schema_version, embed)
+            query_embedding = computed[0] if computed else None
+        else:
+            cached_answer = self.answer_cache.lookup(query, tables, schema_version, query_embedding)
+        count("cache_requests", cache="answer", result="miss" if cached_answer is None else "hit")
+        logging.info(f"Answer cache {'hit' if cached_answer is not None else 'miss'}: {self.answer_cache.stats()}")
+        return PreparedQuestion(retrieved, selected, query_embedding, schema_version, cached_answer)
+
+    def _context(self, question: "PreparedQuestion") -> List[str]:
+        """Renders the prompt context; selected tables take priority over retrieved ones."""
+        return self.context_builder.build(question.retrieved, required=question.selected).chunks
+
+    def _remember(self, query: str, question: "PreparedQuestion", resp: str) -> None:
+        if self.answer_cache is not None and resp:
+            self.answer_cache.store(query, question.tables, question.schema_version, resp, question.embedding)
+
+    def _stream(self, query: str, question: "PreparedQuestion", session_id: Optional[str]) -> Iterator[str]:
+        if question.cached_answer is not None:
+            pieces = [question.cached_answer]
+            yield question.cached_answer
+        else:
+            content_chunks = self._context(question)
+            pieces = []
+            for piece in self.responder.stream_response(matching_chunks=content_chunks, query=query):
+                pieces.append(piece)
+                yield piece
+            # Only a completely streamed answer is cached
+            self._remember(query, question, "".join(pieces))
+        if self.log_responses:
+            log_response(query, "".join(pieces), session_id=session_id)
+
+
+class PreparedQuestion(NamedTuple):
+    """A question after retrieval, ready for generation."""
+    retrieved: List[str]
+    selected: List[str]
+    embedding: Optional[List[float]]
+    schema_version: Optional[str]
+    cached_answer: Optional[str]
+
+    @property
+    def tables(self) -> List[str]:
+        """Every table the answer is generated from."""
+        return self.retrieved + self.selected
+
+
+@lru_cache(maxsize=1)
+def get_query_engine() -> QueryEngine:
+    """
+    Returns the process-wide query engine.
+
+    Set LOG_RESPONSES=1 in the environment to keep a per-session log of
+    answers, and ANSWER_CACHE=0 to generate every answer afresh.
+    """
+    answer_cache = None
+    if os.getenv("ANSWER_CACHE", "1").lower() not in ("0", "false", "no"):
+        answer_cache = SemanticAnswerCache()
+    return QueryEngine(
+        log_responses=os.getenv("LOG_RESPONSES", "").lower() in ("1", "true", "yes"),
+        answer_cache=answer_cache
+    )
@@ -0,0 +1,350 @@
+import logging
+import re
+import threading
+import time
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple
+
+import pymysql
+
+from src.connection_pool import ConnectionPool
+
+# Statements MySQL can EXPLAIN.
+EXPLAINABLE = {"SELECT", "WITH", "TABLE", "UPDATE", "DELETE", "INSERT", "REPLACE"}
+
+_LEADING_COMMENTS = re.compile(r"^\s*(?:(?:--[^\n]*\n|#[^\n]*\n|/\*(?!\+).*?\*/)\s*)*", re.DOTALL)
+_WORD = re.compile(r"[A-Za-z_]+")
+
+
+class QueryCancelled(Exception):
+    """Raised when a running query is cancelled by its user."""
+
+
+class GuardDecision(NamedTuple):
+    """Outcome of checking one generated statement before it runs."""
+    sql: str
+    allowed: bool
+    reason: Optional[str]
+    warnings: List[str]
+    estimated_rows: Optional[int]
+    full_scans: List[Tuple[str, int]]
+
+
+class _Word(NamedTuple):
+    """A keyword or identifier of a statement and where it appears."""
+    text: str
+    depth: int
+    start: int
+    end: int
+
+
+# Keywords that start the main statement after a WITH clause.
+_MAIN_KEYWORDS = {"SELECT", "TABLE", "VALUES", "UPDATE", "DELETE", "INSERT", "REPLACE"}
+
+
+def statement_type(sql: str) -> str:
+    """
+    Returns the statement's leading keyword in upper case, skipping comments
+    and the opening parentheses of a parenthesized query.
+    """
+    stripped = _LEADING_COMMENTS.sub("", sql, count=1)
+    while stripped.startswith("("):
+        stripped = _LEADING_COMMENTS.sub("", stripped[1:], count=1)
+    match = _WORD.match(stripped)
+    return match.group(0).upper() if match else ""
+
+
+def _scan(sql: str) -> Tuple[List[_Word], int]:
+    """
+    Splits a statement into its upper-cased words outside string literals,
+    quoted identifiers and comments.
+
+    Returns:
+        Tuple[List[_Word], int]: The words with their parenthesis depth and
+        position, and the end of the statement's code before any trailing
+        comments, whitespace and semicolons
+    """
+    words = []
+    depth = 0
+    code_end = 0
+    i = 0
+    n = len(sql)
+    while i < n:
+        char = sql[i]
+        if char in "'\"`":
+            # Skip the quoted literal; a doubled quote or a backslash escapes
+            i += 1
+            while i < n:
+                if sql[i] == "\\" and char != "`":
+                    i += 2
+                    continue
+                if sql[i] == char:
+                    if i + 1 < n and sql[i + 1] == char:
+                        i += 2
+                        continue
+                    break
+                i += 1
+            code_end = min(i + 1, n)
+        elif sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = n if end == -1 else end + 1
+        elif sql.startswith("--", i) or char == "#":
+            end = sql.find("\n", i)
+            i = n if end == -1 else end
+        elif char.isspace() or char == ";":
+            pass
+        elif char.isalpha() or char == "_":
+            match = _WORD.match(sql, i)
+            words.append(_Word(match.group(0).upper(), depth, i, match.end()))
+            i = code_end = match.end()
+            continue
+        else:
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+            code_end = i + 1
+        i += 1
+    return words, code_end
+
+
+def top_level_words(sql: str) -> List[str]:
+    """
+    Returns the upper-cased words of a statement outside parentheses,
+    string literals, quoted identifiers and comments.
+    """
+    return [word.text for word in _scan(sql)[0] if word.depth == 0]
+
+
+def _main_select(words: List[_Word]) -> Optional[_Word]:
+    """
+    Returns the SELECT that starts a query's main query block: the leading
+    one, the first one of a parenthesized query, or the one following a WITH
+    clause. None for statements that are not queries.
+    """
+    if not words:
+        return None
+    if words[0].text == "SELECT":
+        return words[0]
+    if words[0].text == "WITH":
+        main = next((word for word in words[1:] if word.depth == 0 and word.text in _MAIN_KEYWORDS), None)
+        return main if main is not None and main.text == "SELECT" else None
+    return None
+
+
+class QueryGuard:
+    """
+    Pre-execution checks for generated SQL.
+
+    Every explainable statement is run through EXPLAIN first to estimate the
+    rows it will scan. Full scans of tables at or above ``warn_scan_rows``
+    produce a warning; at or above ``max_scan_rows`` the statement is
+    rejected (or only warned about when ``reject_full_scans`` is False).
+    Unbounded queries get a LIMIT, and queries carry a MAX_EXECUTION_TIME
+    optimizer hint so the server aborts them after ``max_execution_ms``.
+    """
+
+    def __init__(
+        self,
+        warn_scan_rows: int = 100_000,
+        max_scan_rows: int = 5_000_000,
+        reject_full_scans: bool = True,
+        max_execution_ms: int = 30_000
+    ):
+        """
+        Args:
+            warn_scan_rows: Estimated full-scan size that triggers a warning
+            max_scan_rows: Estimated full-scan (or total) size that is rejected
+            reject_full_scans: Reject oversized scans instead of warning
+            max_execution_ms: Server-side time limit for SELECTs, 0 for none
+        """
+        self.warn_scan_rows = warn_scan_rows
+        self.max_scan_rows = max_scan_rows
+        self.reject_full_scans = reject_full_scans
+        self.max_execution_ms = max_execution_ms
+
+    def explain(self, connection: pymysql.connections.Connection, sql: str) -> List[dict]:
+        """Returns the EXPLAIN plan rows of a statement."""
+        with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+            cursor.execute(f"EXPLAIN {sql}")
+            return list(cursor.fetchall())
+
+    def add_limit(self, sql: str, row_limit: int) -> str:
+        """
+        Appends a LIMIT to a query that has none at the top level.
+
+        Trailing comments are dropped so the LIMIT is not commented out.
+        Statements ending in a locking clause or an INTO target are left
+        unchanged.
+        """
+        words, code_end = _scan(sql)
+        if _main_select(words) is None:
+            return sql
+        top_level = [word.text for word in words if word.depth == 0]
+        if "LIMIT" in top_level or "INTO" in top_level or "FOR" in top_level or "LOCK" in top_level:
+            return sql
+        return f"{sql[:code_end]} LIMIT {int(row_limit)}"
+
+    def add_time_limit(self, sql: str) -> str:
+        """Adds a MAX_EXECUTION_TIME optimizer hint after the main query's SELECT."""
+        if not self.max_execution_ms:
+            return sql
+        select = _main_select(_scan(sql)[0])
+        if select is None:
+            return sql
+        hint = f"MAX_EXECUTION_TIME({int(self.max_execution_ms)})"
+        rest = sql[select.end:].lstrip()
+        if rest.startswith("/*+"):
+            # Only the first hint comment counts, so join the existing one
+            return f"{sql[:select.end]} /*+ {hint} {rest[3:].lstrip()}"
+        return f"{sql[:select.end]} /*+ {hint} */ {rest}"
+
+    def check(self, connection: pymysql.connections.Connection, sql: str, row_limit: Optional[int] = None) -> GuardDecision:
+        """
+        Checks a statement and returns the version that should run.
+
+        Args:
+            connection: Connection used for EXPLAIN
+            sql: The generated statement
+            row_limit: LIMIT for unbounded SELECTs, None to leave them unbounded
+
+        Returns:
+            GuardDecision: The possibly rewritten statement, whether it may
+            run, and the warnings and scan estimates behind the decision
+        """
+        kind = statement_type(sql)
+        warnings = []
+        full_scans = []
+        estimated_rows = None
+
+        if kind in EXPLAINABLE:
+            try:
+                plan = self.explain(connection, sql)
+            except pymysql.MySQLError as e:
+                return GuardDecision(sql, False, f"EXPLAIN failed: {e}", warnings, None, full_scans)
+
+            # Nested-loop estimate: rows examined multiply across joined tables
+            estimated_rows = 1
+            for row in plan:
+                rows = row.get("rows")
+                if rows is None:
+                    continue
+                estimated_rows = min(estimated_rows * max(1, int(rows)), 10 ** 18)
+                if str(row.get("type") or "").upper() == "ALL" and int(rows) >= self.warn_scan_rows:
+                    full_scans.append((str(row.get("table")), int(rows)))
+
+            oversized = [(table, rows) for table, rows in full_scans if rows >= self.max_scan_rows]
+            for table, rows in full_scans:
+                warnings.append(f"Full scan of {table} (~{rows:,} rows)")
+            if estimated_rows >= self.max_scan_rows:
+                warnings.append(f"Estimated {estimated_rows:,} rows examined")
+            if oversized and self.reject_full_scans:
+                tables = ", ".join(table for table, _ in oversized)
+                return GuardDecision(
+                    sql, False,
+                    f"Full scan of large table(s) {tables}; add a selective WHERE clause on an indexed column",
+                    warnings, estimated_rows, full_scans
+                )
+
+        guarded = sql
+        if kind in ("SELECT", "WITH"):
+            if row_limit is not None:
+                guarded = self.add_limit(guarded, row_limit)
+            guarded = self.add_time_limit(guarded)
+        if guarded != sql:
+            logging.info(f"Guarded statement: {guarded}")
+        return GuardDecision(guarded, True, None, warnings, estimated_rows, full_scans)
+
+
+class RunningQuery:
+    """
+    A statement running on a pooled connection in a background thread.
+
+    The caller polls ``wait`` and can ``cancel`` at any time; cancelling
+    issues KILL QUERY for the statement's connection from a separate side
+    connection, so the server stops the work instead of the client merely
+    abandoning it.
+    """
+
+    def __init__(self, pool: ConnectionPool, run: Callable[[pymysql.connections.Connection], Any], owner: Optional[str] = None):
+        """
+        Args:
+            pool: Pool the statement's connection is checked out from
+            run: Called with the connection; runs the statement and returns its result
+            owner: The session running the statement
+        """
+        self.pool = pool
+        self.owner = owner
+        self._run = run
+        self._lock = threading.Lock()
+        self._thread_id: Optional[int] = None
+        self._cancelled = False
+        self._done = threading.Event()
+        self._result: Any = None
+        self._error: Optional[BaseException] = None
+        self.started: Optional[float] = None
+        self._thread = threading.Thread(target=self._target, daemon=True)
+
+    def start(self) -> "RunningQuery":
+        """Starts the statement in the background."""
+        self.started = time.monotonic()
+        self._thread.start()
+        return self
+
+    def _target(self) -> None:
+        try:
+            with self.pool.connection(owner=self.owner) as connection:
+                with self._lock:
+                    if self._cancelled:
+                        raise QueryCancelled("Query cancelled before it started")
+                    self._thread_id = connection.thread_id()
+                try:
+                    self._result = self._run(connection)
+                finally:
+                    # The connection goes back to the pool only after this, so
+                    # a concurrent cancel can never KILL someone else's query.
+                    with self._lock:
+                        self._thread_id = None
+        except BaseException as e:
+            if self._cancelled and not isinstance(e, QueryCancelled):
+                e = QueryCancelled(f"Query cancelled: {e}")
+            self._error = e
+        finally:
+            self._done.set()
+
+    def cancel(self) -> None:
+        """Stops the statement with KILL QUERY, issued on a side connection."""
+        with self._lock:
+            self._cancelled = True
+            if self._thread_id is None:
+                return
+            side = self.pool.open_connection()
+            try:
+                with side.cursor() as cursor:
+                    cursor.execute(f"KILL QUERY {int(self._thread_id)}")
+                logging.info(f"Cancelled query on connection {self._thread_id}")
+            finally:
+                side.close()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Waits up to ``timeout`` seconds; returns True once the statement has finished."""
+        return self._done.wait(timeout)
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def elapsed(self) -> float:
+        """Seconds since the statement started."""
+        return 0.0 if self.started is None else time.monotonic() - self.started
+
+    def result(self) -> Any:
+        """
+        Returns the statement's result.
+
+        Raises:
+            QueryCancelled: If the statement was cancelled.
+            Exception: Whatever the statement raised.
+        """
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
@@ -0,0 +1,90 @@
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that refills continuously at ``rate`` tokens per second.
+    """
+
+    def __init__(self, capacity: float, rate: float):
+        """
+        Initializes the bucket full.
+
+        Args:
+            capacity (float): Maximum number of tokens the bucket can hold.
+            rate (float): Tokens added per second.
+        """
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """
+        Returns how long to wait until ``amount`` tokens are available (0 if they are now).
+        """
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """
+    Limits calls to a requests-per-minute and a tokens-per-minute quota.
+
+    Either quota can be left as None to disable it.
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        """
+        Initializes the limiter.
+
+        Args:
+            requests_per_minute (Optional[int]): Maximum requests per minute.
+            tokens_per_minute (Optional[int]): Maximum prompt and completion tokens per minute.
+        """
+        self._lock = threading.Lock()
+        self._requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0) if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0) if tokens_per_minute else None
+
+    def acquire(self, tokens: int = 0) -> None:
+        """
+        Blocks until one request carrying ``tokens`` tokens fits in both quotas.
+
+        Args:
+            tokens (int): Estimated number of tokens the request will use.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = 0.0
+                if self._requests is not None:
+                    wait = max(wait, self._requests.wait_time(1, now))
+                if self._tokens is not None:
+                    wait = max(wait, self._tokens.wait_time(tokens, now))
+                if wait <= 0:
+                    if self._requests is not None:
+                        self._requests.consume(1)
+                    if self._tokens is not None:
+                        self._tokens.consume(tokens)
+                    return
+            time.sleep(wait)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for quota accounting (about four characters per token).
+    """
+    return max(1, len(text) // 4)
@@ -0,0 +1,367 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, List, NamedTuple, Optional, Set, Tuple
+
+import pymysql
+
+from src.instrumentation import count
+from src.query_guard import statement_type, top_level_words
+from src.sql_execution import QueryResult
+
+# Statements whose result only depends on table contents.
+CACHEABLE_STATEMENTS = {"SELECT", "WITH", "TABLE"}
+
+# Functions and variables whose value changes between executions.
+_NONDETERMINISTIC = re.compile(
+    r"\b(?:NOW|RAND|UUID|UUID_SHORT|SYSDATE|CURDATE|CURTIME|CURRENT_DATE|CURRENT_TIME|CURRENT_TIMESTAMP|"
+    r"CURRENT_USER|LOCALTIME|LOCALTIMESTAMP|UNIX_TIMESTAMP|UTC_DATE|UTC_TIME|UTC_TIMESTAMP|CONNECTION_ID|"
+    r"LAST_INSERT_ID|FOUND_ROWS|ROW_COUNT|SLEEP|USER|DATABASE|GET_LOCK)\b|@",
+    re.IGNORECASE,
+)
+_TOKEN = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"|`(?:[^`]|``)*`|[^\s'\"`]+")
+_IDENTIFIER = re.compile(r"[A-Za-z0-9_$]+")
+
+# Rough per-entry bookkeeping cost on top of the result itself.
+_ENTRY_OVERHEAD_BYTES = 512
+
+
+def _code_tokens(sql: str) -> List[str]:
+    """Splits a statement into string literals and whitespace-separated code."""
+    return _TOKEN.findall(sql.strip().rstrip(";"))
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Normalizes a statement for use as a cache key.
+
+    Code and string literals are re-joined with single spaces, so layout
+    differences outside literals disappear, and a trailing semicolon is
+    dropped; literals and identifiers keep their case.
+    """
+    return " ".join(_code_tokens(sql)).rstrip(";").rstrip()
+
+
+def referenced_names(sql: str) -> Set[str]:
+    """
+    Returns every identifier-like word of a statement, lower-cased, outside
+    string literals. Intersecting it with a database's tables gives the
+    tables the statement reads.
+    """
+    names = set()
+    for token in _code_tokens(sql):
+        if token[0] in "'\"":
+            continue
+        if token[0] == "`":
+            names.add(token[1:-1].replace("``", "`").lower())
+            continue
+        names.update(word.lower() for word in _IDENTIFIER.findall(token))
+    return names
+
+
+def is_cacheable(sql: str) -> bool:
+    """
+    True for read-only statements whose result only depends on table
+    contents: no locking reads, INTO targets, variables or time/random functions.
+    """
+    if statement_type(sql) not in CACHEABLE_STATEMENTS:
+        return False
+    words = top_level_words(sql)
+    if "INTO" in words or "FOR" in words or "LOCK" in words:
+        return False
+    code = " ".join(token for token in _code_tokens(sql) if token[0] not in "'\"")
+    return _NONDETERMINISTIC.search(code) is None
+
+
+def result_size(result: QueryResult) -> int:
+    """Returns the approximate memory held by a cached result, in bytes."""
+    size = _ENTRY_OVERHEAD_BYTES
+    if result.dataframe is not None:
+        size += int(result.dataframe.memory_usage(index=True, deep=True).sum())
+    return size
+
+
+class TableVersions(NamedTuple):
+    """Change markers of a database's tables and the server time they were read at."""
+    markers: Dict[str, Any]
+    read_at: Any
+
+
+def table_versions(connection: pymysql.connections.Connection, database: str) -> TableVersions:
+    """
+    Reads the change marker (UPDATE_TIME) of every table in a database with
+    one information_schema query, along with the server's current time.
+
+    UPDATE_TIME is NULL for tables that have not changed since the server
+    started; those tables are only covered by the cache's TTL.
+    """
+    with connection.cursor() as cursor:
+        try:
+            # MySQL 8 caches information_schema statistics for a day by default
+            cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+        except pymysql.MySQLError:
+            pass
+        cursor.execute(
+            "SELECT TABLE_NAME, UPDATE_TIME FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s",
+            (database,),
+        )
+        markers = {str(name).lower(): update_time for name, update_time in cursor.fetchall()}
+        cursor.execute("SELECT NOW()")
+        return TableVersions(markers, cursor.fetchone()[0])
+
+
+def _settled(marker: Any, read_at: Any) -> bool:
+    """
+    True if any write after ``read_at`` is certain to change a table's marker.
+
+    UPDATE_TIME has one-second resolution, so a write within the marker's
+    own second leaves it unchanged; a result read during that second may
+    already be stale without the marker ever showing it.
+    """
+    if marker is None:
+        return True
+    if read_at is None:
+        return False
+    return read_at.replace(microsecond=0) > marker
+
+
+class CachedResult(NamedTuple):
+    result: QueryResult
+    warnings: List[str]
+    tables: FrozenSet[str]
+    versions: Tuple[Tuple[str, Any], ...]
+    stored_at: float
+    size: int
+
+
+class _Scope:
+    """Table versions of one database, as of the last probe."""
+
+    def __init__(self):
+        self.versions = TableVersions({}, None)
+        self.probed_at = float("-inf")
+
+
+class ResultCache:
+    """
+    Shared, byte-bounded cache of executed SELECT results.
+
+    Entries are keyed on the database scope, the normalized SQL and the row
+    cap, so sessions asking the same question share one result. Each entry
+    remembers the UPDATE_TIME of the tables it reads. A database's change
+    markers are probed with one information_schema query at most every
+    ``probe_interval`` seconds; lookups in between are answered from memory
+    without contacting MySQL. An entry is dropped when one of its tables
+    changed or disappeared, when it is older than ``ttl_seconds`` (the
+    fallback for engines that report no UPDATE_TIME), or when the app
+    itself writes to one of its tables. Results are stored against the
+    versions read before the statement ran, and not at all while one of
+    its tables changed within the second of the probe.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: float = 300.0,
+        probe_interval: float = 5.0,
+        max_entry_fraction: float = 0.25
+    ):
+        """
+        Args:
+            max_bytes: Memory budget for all cached results
+            ttl_seconds: Maximum age of an entry
+            probe_interval: Minimum seconds between change-marker probes of a database
+            max_entry_fraction: Results larger than this share of the budget are not cached
+        """
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.probe_interval = probe_interval
+        self.max_entry_bytes = int(max_bytes * max_entry_fraction)
+        self._entries: "OrderedDict[Tuple[str, str, int], CachedResult]" = OrderedDict()
+        self._scopes: Dict[str, _Scope] = defaultdict(_Scope)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = defaultdict(int)
+
+    def _drop(self, key: Tuple[str, str, int]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def versions(self, scope: str, probe: Callable[[], TableVersions]) -> TableVersions:
+        """
+        Returns a database's table versions, probing them if the last probe
+        is older than ``probe_interval``. Read them before running a
+        statement whose result will be stored.
+        """
+        with self._lock:
+            state = self._scopes[scope]
+            if time.monotonic() - state.probed_at < self.probe_interval:
+                return state.versions
+        versions = probe()
+        with self._lock:
+            state.versions = versions
+            state.probed_at = time.monotonic()
+            self.counters["probes"] += 1
+        return versions
+
+    def _valid(self, entry: CachedResult, versions: Dict[str, Any]) -> bool:
+        if time.monotonic() - entry.stored_at > self.ttl_seconds:
+            return False
+        markers = versions.markers
+        return all(table in markers and markers[table] == version for table, version in entry.versions)
+
+    def lookup(self, scope: str, sql: str, max_rows: int, probe: Callable[[], TableVersions]) -> Optional[CachedResult]:
+        """
+        Returns the cached result of a statement if it is still current.
+
+        Args:
+            scope: The database the statement runs against, e.g. "user@host:port/db"
+            sql: The statement as generated
+            max_rows: The row cap the result was fetched with
+            probe: Returns the database's table versions; only called when
+                the last probe is older than ``probe_interval``
+
+        Returns:
+            Optional[CachedResult]: The entry, or None on a miss
+        """
+        key = (scope, normalize_sql(sql), int(max_rows))
+        with self._lock:
+            if key not in self._entries:
+                self.counters["misses"] += 1
+                count("cache_requests", cache="result", result="miss")
+                return None
+        versions = self.versions(scope, probe)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not self._valid(entry, versions):
+                self._drop(key)
+                self.counters["misses"] += 1
+                if entry is not None:
+                    self.counters["stale"] += 1
+                count("cache_requests", cache="result", result="miss" if entry is None else "stale")
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            count("cache_requests", cache="result", result="hit")
+            return entry
+
+    def store(
+        self,
+        scope: str,
+        sql: str,
+        max_rows: int,
+        result: QueryResult,
+        versions: TableVersions,
+        warnings: Optional[List[str]] = None
+    ) -> bool:
+        """
+        Caches a statement's result.
+
+        Statements that are not cacheable, that read no known table of the
+        database, or whose result exceeds the per-entry limit are skipped,
+        as are results read while one of their tables had just changed.
+
+        Args:
+            scope: The database the statement ran against
+            sql: The statement as generated
+            max_rows: The row cap the result was fetched with
+            result: The statement's result
+            versions: Table versions read before the statement started
+            warnings: Guard warnings shown with the result
+
+        Returns:
+            bool: Whether the result was cached
+        """
+        if not result.is_select or not is_cacheable(sql):
+            return False
+        size = result_size(result)
+        if size > self.max_entry_bytes:
+            logging.info(f"Result of {size:,} bytes is too large to cache")
+            return False
+        tables = frozenset(referenced_names(sql) & set(versions.markers))
+        if not tables:
+            return False
+        if not all(_settled(versions.markers[table], versions.read_at) for table in tables):
+            # A later write in the same second would not move the marker
+            with self._lock:
+                self.counters["unsettled"] += 1
+            return False
+
+        key = (scope, normalize_sql(sql), int(max_rows))
+        entry = CachedResult(
+            result=result,
+            warnings=list(warnings or []),
+            tables=tables,
+            versions=tuple((table, versions.markers[table]) for table in sorted(tables)),
+            stored_at=time.monotonic(),
+            size=size,
+        )
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                self.counters["evictions"] += 1
+        return True
+
+    def invalidate(self, scope: str, sql: Optional[str] = None) -> int:
+        """
+        Drops entries after the app itself wrote to a database.
+
+        Args:
+            scope: The database written to
+            sql: The write statement; entries reading any table it names
+                are dropped, or every entry of the database when None
+
+        Returns:
+            int: The number of entries dropped
+        """
+        names = referenced_names(sql) if sql is not None else None
+        with self._lock:
+            keys = [
+                key for key, entry in self._entries.items()
+                if key[0] == scope and (names is None or entry.tables & names)
+            ]
+            for key in keys:
+                self._drop(key)
+            # The write's new UPDATE_TIME should be seen by the next lookup
+            self._scopes[scope].probed_at = float("-inf")
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns size and hit/miss counters.
+        """
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.counters["hits"],
+                "misses": self.counters["misses"],
+                "stale": self.counters["stale"],
+                "evictions": self.counters["evictions"],
+                "unsettled": self.counters["unsettled"],
+                "probes": self.counters["probes"],
+                "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+            }
+
+
+@lru_cache(maxsize=None)
+def get_result_cache() -> ResultCache:
+    """
+    Returns the process-wide result cache shared by all sessions.
+    """
+    return ResultCache()
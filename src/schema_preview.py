@@ -0,0 +1,184 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import AbstractContextManager
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+import pymysql
+
+from src.databaseConnection import fetch_all_table_schemas
+
+DESCRIBE_COLUMNS = ["Field", "Type", "Null", "Key", "Default", "Extra"]
+
+# One row per table: a digest of its column definitions (the schema
+# version) and its last data change (for the row preview).
+SCHEMA_VERSION_QUERY = """
+    SELECT
+        c.TABLE_NAME,
+        MD5(GROUP_CONCAT(
+            CONCAT_WS(':', c.COLUMN_NAME, c.COLUMN_TYPE, c.IS_NULLABLE, c.COLUMN_KEY, IFNULL(c.COLUMN_DEFAULT, ''), c.EXTRA)
+            ORDER BY c.ORDINAL_POSITION SEPARATOR '|'
+        )),
+        t.UPDATE_TIME
+    FROM information_schema.COLUMNS c
+    JOIN information_schema.TABLES t ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME
+    WHERE c.TABLE_SCHEMA = %s AND c.TABLE_NAME IN ({placeholders})
+    GROUP BY c.TABLE_NAME, t.UPDATE_TIME
+"""
+
+
+class TablePreview(NamedTuple):
+    """Schema and first rows of one table, as shown in the UI."""
+    schema: pd.DataFrame
+    data: Optional[pd.DataFrame]
+    version: Tuple[str, Any]
+
+
+def schema_versions(connection: pymysql.connections.Connection, database: str, tables: List[str]) -> Dict[str, Tuple[str, Any]]:
+    """
+    Reads (schema digest, UPDATE_TIME) for several tables in one query.
+
+    Tables that no longer exist are left out.
+    """
+    if not tables:
+        return {}
+    with connection.cursor() as cursor:
+        for setting in ("group_concat_max_len = 1048576", "information_schema_stats_expiry = 0"):
+            try:
+                cursor.execute(f"SET SESSION {setting}")
+            except pymysql.MySQLError:
+                # information_schema_stats_expiry only exists on MySQL 8
+                pass
+        cursor.execute(SCHEMA_VERSION_QUERY.format(placeholders=", ".join(["%s"] * len(tables))), [database] + list(tables))
+        return {name: (digest, update_time) for name, digest, update_time in cursor.fetchall()}
+
+
+class SchemaPreviewCache:
+    """
+    Process-wide cache of the schema and data previews shown for selected tables.
+
+    Each table's preview is stored with its version: a digest of its column
+    definitions plus its UPDATE_TIME. Versions of the selected tables are
+    re-read with one information_schema query at most every
+    ``probe_interval`` seconds, so reruns in between cost no queries at all.
+    Only tables whose version changed, or that were not previewed before,
+    are fetched again: their columns in one information_schema query and
+    their first rows with one small SELECT each.
+    """
+
+    def __init__(self, probe_interval: float = 5.0, max_tables: int = 2048, preview_rows: int = 5):
+        """
+        Args:
+            probe_interval: Minimum seconds between version probes of a table
+            max_tables: Maximum previews (and table versions) kept, across databases
+            preview_rows: Rows shown in each data preview
+        """
+        self.probe_interval = probe_interval
+        self.max_tables = max_tables
+        self.preview_rows = preview_rows
+        self._previews: "OrderedDict[Tuple[str, str], TablePreview]" = OrderedDict()
+        self._versions: "OrderedDict[Tuple[str, str], Tuple[float, Optional[Tuple[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prune(self) -> None:
+        """Drops the least recently used previews and versions beyond ``max_tables``."""
+        while len(self._previews) > self.max_tables:
+            key, _ = self._previews.popitem(last=False)
+            self._versions.pop(key, None)
+        while len(self._versions) > self.max_tables:
+            self._versions.popitem(last=False)
+
+    def _fetch(self, connection: pymysql.connections.Connection, database: str, tables: List[str], versions: Dict[str, Tuple[str, Any]]) -> Dict[str, TablePreview]:
+        """Builds the previews of tables whose cached version is out of date."""
+        schemas = fetch_all_table_schemas(connection, database, tables) or {}
+        previews = {}
+        for table in tables:
+            schema = pd.DataFrame(schemas.get(table, []), columns=DESCRIBE_COLUMNS)
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT * FROM `{table.replace('`', '``')}` LIMIT {int(self.preview_rows)}")
+                rows = cursor.fetchall()
+                data = pd.DataFrame(list(rows), columns=[desc[0] for desc in cursor.description]) if rows else None
+            previews[table] = TablePreview(schema=schema, data=data, version=versions[table])
+        return previews
+
+    def previews(
+        self,
+        scope: str,
+        database: str,
+        tables: List[str],
+        connection: Callable[[], AbstractContextManager]
+    ) -> Dict[str, Optional[TablePreview]]:
+        """
+        Returns the previews of the selected tables.
+
+        Args:
+            scope: Identifies the database and the account reading it
+            database: The database name
+            tables: The selected tables
+            connection: Returns a context manager yielding a connection; only
+                called when something has to be read from MySQL
+
+        Returns:
+            Dict[str, Optional[TablePreview]]: Preview per table, None for
+            tables that no longer exist
+        """
+        now = time.monotonic()
+        versions = {}
+        due = []
+        with self._lock:
+            for table in tables:
+                probed_at, version = self._versions.get((scope, table), (float("-inf"), None))
+                if now - probed_at >= self.probe_interval:
+                    due.append(table)
+                else:
+                    versions[table] = version
+                    self._versions.move_to_end((scope, table))
+        if due:
+            with connection() as conn:
+                probed = schema_versions(conn, database, due)
+            with self._lock:
+                for table in due:
+                    versions[table] = probed.get(table)
+                    self._versions[(scope, table)] = (now, versions[table])
+                self._prune()
+
+        with self._lock:
+            stale = [
+                table for table in tables
+                if versions[table] is not None
+                and (self._previews.get((scope, table)) is None or self._previews[(scope, table)].version != versions[table])
+            ]
+
+        if stale:
+            logging.info(f"Refreshing schema previews of {len(stale)} of {len(tables)} tables")
+            with connection() as conn:
+                fetched = self._fetch(conn, database, stale, versions)
+            with self._lock:
+                for table, preview in fetched.items():
+                    self._previews[(scope, table)] = preview
+                self._prune()
+
+        result = {}
+        with self._lock:
+            for table in tables:
+                preview = self._previews.get((scope, table)) if versions[table] is not None else None
+                if preview is not None:
+                    self._previews.move_to_end((scope, table))
+                result[table] = preview
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._previews.clear()
+            self._versions.clear()
+
+
+@lru_cache(maxsize=None)
+def get_schema_preview_cache() -> SchemaPreviewCache:
+    """
+    Returns the process-wide schema preview cache shared by all sessions.
+    """
+    return SchemaPreviewCache()
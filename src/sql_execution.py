@@ -0,0 +1,121 @@
+import logging
+from typing import Any, List, NamedTuple, Optional, Sequence
+
+import pandas as pd
+import pymysql
+from pymysql.constants import FIELD_TYPE
+
+DISPLAY_ROW_LIMIT = 1000
+FETCH_CHUNK_ROWS = 500
+
+_INTEGER_TYPES = {FIELD_TYPE.TINY, FIELD_TYPE.SHORT, FIELD_TYPE.LONG, FIELD_TYPE.LONGLONG, FIELD_TYPE.INT24, FIELD_TYPE.YEAR}
+_FLOAT_TYPES = {FIELD_TYPE.FLOAT, FIELD_TYPE.DOUBLE}
+_DATETIME_TYPES = {FIELD_TYPE.DATETIME, FIELD_TYPE.TIMESTAMP}
+
+
+class QueryResult(NamedTuple):
+    """Outcome of running one SQL statement."""
+    is_select: bool
+    dataframe: Optional[pd.DataFrame]
+    row_count: int
+    has_more: bool
+    col_names: List[str]
+
+
+def _column_series(name: str, type_code: int, values: List[Any]) -> pd.Series:
+    """Builds one result column with a dtype chosen from the MySQL column type."""
+    if type_code in _INTEGER_TYPES:
+        # BIGINT UNSIGNED values above 2**63-1 only fit UInt64
+        for dtype in ("Int64", "UInt64"):
+            try:
+                return pd.Series(values, name=name, dtype=dtype)
+            except (OverflowError, TypeError, ValueError):
+                pass
+        return pd.Series(values, name=name, dtype="object")
+    if type_code in _FLOAT_TYPES:
+        return pd.Series(values, name=name, dtype="float64")
+    if type_code in _DATETIME_TYPES:
+        return pd.Series(pd.to_datetime(values, errors="coerce"), name=name)
+    # DECIMAL keeps exact Decimal values; strings, dates, blobs and JSON stay objects
+    return pd.Series(values, name=name, dtype="object")
+
+
+def frame_from_columns(description: Sequence[tuple], columns: List[List[Any]]) -> pd.DataFrame:
+    """
+    Builds a DataFrame column by column from cursor.description.
+
+    Args:
+        description: The cursor description, one 7-tuple per column
+        columns: The fetched values, one list per column
+
+    Returns:
+        pd.DataFrame: The result with per-column dtypes
+    """
+    names = [desc[0] for desc in description]
+    data = {}
+    for index, (desc, values) in enumerate(zip(description, columns)):
+        # Duplicate column names (e.g. a.id, b.id) would overwrite each other in a dict
+        data[index] = _column_series(desc[0], desc[1], values)
+    frame = pd.DataFrame(data)
+    frame.columns = names
+    return frame
+
+
+def run_query(
+    connection: pymysql.connections.Connection,
+    sql: str,
+    max_rows: int = DISPLAY_ROW_LIMIT,
+    chunk_size: int = FETCH_CHUNK_ROWS
+) -> QueryResult:
+    """
+    Runs a statement with an unbuffered server-side cursor.
+
+    Rows are fetched ``chunk_size`` at a time and fetching stops at
+    ``max_rows``, so memory is bounded by the display cap rather than by
+    the size of the result. One extra row is read to report whether more
+    rows exist. In that case the rest of the result is still pending on
+    the connection; draining it could mean reading millions of rows, so
+    the connection is closed instead and must not be reused (a pool
+    discards it on checkin).
+
+    Statements without a result set are not committed here; the caller
+    decides.
+
+    Args:
+        connection: An open MySQL connection
+        sql: The statement to run
+        max_rows: Maximum rows fetched
+        chunk_size: Rows per fetch round trip
+
+    Returns:
+        QueryResult: The result frame, or the affected row count
+    """
+    cursor = connection.cursor(pymysql.cursors.SSCursor)
+    cursor.execute(sql)
+    if cursor.description is None:
+        row_count = cursor.rowcount
+        cursor.close()
+        return QueryResult(is_select=False, dataframe=None, row_count=row_count, has_more=False, col_names=[])
+
+    description = cursor.description
+    col_names = [desc[0] for desc in description]
+    columns: List[List[Any]] = [[] for _ in description]
+    fetched = 0
+    while fetched < max_rows:
+        rows = cursor.fetchmany(min(chunk_size, max_rows - fetched))
+        if not rows:
+            break
+        for row in rows:
+            for values, value in zip(columns, row):
+                values.append(value)
+        fetched += len(rows)
+
+    has_more = fetched >= max_rows and cursor.fetchone() is not None
+    if has_more:
+        logging.info(f"Result has more than {max_rows} rows, closing the connection instead of draining it")
+        connection.close()
+    else:
+        cursor.close()
+
+    dataframe = frame_from_columns(description, columns) if fetched else None
+    return QueryResult(is_select=True, dataframe=dataframe, row_count=fetched, has_more=has_more, col_names=col_names)
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+MANIFEST_PATH = os.path.join("data", "manifest.json")
+
+
+def schema_fingerprint(schema: Any) -> str:
+    """
+    Computes a content hash of a table's schema rows.
+
+    Args:
+        schema: The rows returned by schema introspection for one table.
+
+    Returns:
+        str: Hex SHA-256 digest that changes whenever the DDL changes.
+    """
+    payload = json.dumps(schema, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TrainingManifest:
+    """
+    Persistent record of which tables have been trained and for which schema.
+
+    For every table the manifest stores the schema fingerprint its chunk
+    metadata was generated from and the fingerprint its embedding was built
+    from. A training run only regenerates tables whose fingerprint changed,
+    and progress is appended to a journal after every table so a failed run
+    resumes where it stopped without rewriting the whole manifest each time.
+    """
+
+    def __init__(self, path: str = MANIFEST_PATH):
+        """
+        Loads the manifest from disk, starting empty if it does not exist.
+
+        Args:
+            path (str): Location of the manifest JSON file.
+        """
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self._lock = threading.Lock()
+        self.tables: Dict[str, Dict[str, str]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self.tables = json.load(f).get("tables", {})
+            except (IOError, ValueError) as e:
+                logging.warning(f"Could not read training manifest {path}, starting fresh: {e}")
+        self._replay_journal()
+
+    def _replay_journal(self) -> None:
+        """Applies per-table progress recorded since the last full save."""
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A crash can leave a torn last line; everything before it is valid.
+                    break
+                self.tables.setdefault(entry["table"], {})["metadata"] = entry["metadata"]
+
+    def save(self) -> None:
+        """
+        Atomically writes the manifest to disk and clears the journal.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"tables": self.tables}, f, indent=4, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def pending_metadata(self, fingerprints: Dict[str, str], chunk_exists) -> List[str]:
+        """
+        Returns the tables whose metadata must be (re)generated.
+
+        Args:
+            fingerprints: Current schema fingerprint per table.
+            chunk_exists: Callable telling whether a table's chunk is stored.
+
+        Returns:
+            List[str]: New or altered tables, plus tables whose chunk went missing.
+        """
+        return [
+            table for table, fingerprint in fingerprints.items()
+            if self.tables.get(table, {}).get("metadata") != fingerprint or not chunk_exists(table)
+        ]
+
+    def needs_embedding(self, table: str) -> bool:
+        """
+        Returns True if the table's embedding is missing or older than its metadata.
+        """
+        record = self.tables.get(table, {})
+        return "metadata" not in record or record.get("embedding") != record["metadata"]
+
+    def mark_metadata(self, table: str, fingerprint: str) -> None:
+        """
+        Records that the table's metadata was generated from ``fingerprint``.
+
+        The record is appended and flushed to the journal immediately.
+        """
+        with self._lock:
+            record = self.tables.setdefault(table, {})
+            record["metadata"] = fingerprint
+            directory = os.path.dirname(self.journal_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.journal_path, "a") as f:
+                f.write(json.dumps({"table": table, "metadata": fingerprint}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def mark_embedded(self, tables: Iterable[str]) -> None:
+        """
+        Records that the tables' embeddings match their current metadata and saves.
+        """
+        with self._lock:
+            for table in tables:
+                record = self.tables.get(table)
+                if record and "metadata" in record:
+                    record["embedding"] = record["metadata"]
+            self.save()
+
+    def schema_version(self, tables: Iterable[str]) -> str:
+        """
+        Returns a digest of the metadata fingerprints of ``tables``.
+
+        The version changes whenever training regenerates the metadata of any
+        of the tables, and is unaffected by changes to other tables.
+        """
+        payload = json.dumps([[table, self.tables.get(table, {}).get("metadata")] for table in sorted(set(tables))])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def drop_missing(self, tables: Iterable[str]) -> List[str]:
+        """
+        Forgets every table that is no longer in the database and saves.
+
+        Args:
+            tables: Tables currently present in the database.
+
+        Returns:
+            List[str]: The dropped table names.
+        """
+        current = set(tables)
+        with self._lock:
+            dropped = [table for table in self.tables if table not in current]
+            for table in dropped:
+                del self.tables[table]
+            if dropped:
+                self.save()
+        return dropped
+
+
+_cache_lock = threading.Lock()
+_cache: Dict[str, Tuple[tuple, TrainingManifest]] = {}
+
+
+def _file_state(path: str) -> Optional[tuple]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def current_schema_version(tables: Iterable[str], path: str = MANIFEST_PATH) -> str:
+    """
+    Returns the schema version of ``tables`` as recorded by the latest training run.
+
+    The manifest is re-read only when it or its journal changes on disk, so
+    this is cheap enough to call for every question.
+    """
+    state = (_file_state(path), _file_state(f"{path}.journal"))
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is None or cached[0] != state:
+            cached = (state, TrainingManifest(path))
+            _cache[path] = cached
+    return cached[1].schema_version(tables)
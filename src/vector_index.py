@@ -0,0 +1,514 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from src.embedding_store import EmbeddingStore, atomic_write
+from src.instrumentation import span
+
+INDEX_SUFFIX = "_faiss.index"
+MAPPING_SUFFIX = "_mapping.json"
+VERSION_SUFFIX = "_version"
+
+
+def embeddings_dir() -> str:
+    """Returns the directory holding the embedding artifacts."""
+    return os.path.join(os.getcwd(), "data", "embeddings")
+
+
+def artifact_paths(base: str) -> Tuple[str, str, str]:
+    """
+    Returns the index, mapping and version file paths for an artifact base path.
+
+    Args:
+        base: Path without suffix, e.g. data/embeddings/table_embeddings
+    """
+    return base + INDEX_SUFFIX, base + MAPPING_SUFFIX, base + VERSION_SUFFIX
+
+
+def write_index(base: str, index: Any, mapping: Any) -> None:
+    """
+    Atomically publishes a FAISS index and its mapping.
+
+    Both files are swapped in with renames and the version file is bumped
+    last, so a reader that sees the new version also sees both new files.
+
+    Args:
+        base: Artifact base path
+        index: The FAISS index
+        mapping: JSON-serialisable mapping from index ids to table names
+    """
+    index_path, mapping_path, version_path = artifact_paths(base)
+
+    def dump_mapping(path):
+        with open(path, "w") as f:
+            json.dump(mapping, f)
+
+    def dump_version(path):
+        with open(path, "w") as f:
+            f.write(uuid.uuid4().hex)
+
+    atomic_write(index_path, lambda path: faiss.write_index(index, path))
+    atomic_write(mapping_path, dump_mapping)
+    atomic_write(version_path, dump_version)
+
+
+def read_mapping(path: str) -> Dict[int, str]:
+    """
+    Reads an index mapping as a dict of FAISS id to table name.
+
+    Accepts both the id-keyed format written by ``update_index`` and the
+    legacy list format, where a table's id is its position.
+    """
+    return _read_mapping_payload(path)[0]
+
+
+def _read_mapping_payload(path: str) -> Tuple[Dict[int, str], Optional[str]]:
+    """Reads an index mapping and the embedding space its vectors belong to, if recorded."""
+    with open(path, "r") as f:
+        payload = json.load(f)
+    if isinstance(payload, list):
+        return dict(enumerate(payload)), None
+    return {int(table_id): table for table_id, table in payload["tables"].items()}, payload.get("model")
+
+
+INDEX_TYPES = ("auto", "flat", "ivf", "hnsw")
+# Below this many vectors an exact scan is both fast enough and exact.
+FLAT_MAX_VECTORS = 10_000
+HNSW_NEIGHBORS = 32
+
+
+def resolve_index_type(index_type: str, n_vectors: int) -> str:
+    """
+    Resolves "auto" to a concrete index type for a given number of vectors.
+
+    "auto" keeps exact flat search for small catalogs and switches to IVF,
+    which still supports in-place removal, for large ones. HNSW has the best
+    latency but cannot remove vectors, so it is rebuilt on every change and
+    only used when asked for explicitly.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+    if index_type != "auto":
+        return index_type
+    return "flat" if n_vectors < FLAT_MAX_VECTORS else "ivf"
+
+
+def ivf_lists(n_vectors: int) -> int:
+    """Number of IVF lists for a training set, keeping ~39+ points per centroid."""
+    return max(1, min(int(4 * np.sqrt(n_vectors)), n_vectors // 39))
+
+
+COMPRESSIONS = ("none", "sq8", "fp16", "pq")
+# Storage whose encoder is trained on the vectors it is built from.
+TRAINED_COMPRESSIONS = ("sq8", "pq")
+
+
+def pq_code(dimension: int, n_vectors: int) -> str:
+    """
+    Picks a product quantizer for the dimension and training set size.
+
+    Uses roughly one sub-quantizer per 8 dimensions and 8-bit codes, fewer
+    bits when there are too few vectors to train 256 centroids per
+    sub-quantizer.
+    """
+    target = max(1, dimension // 8)
+    sub_quantizers = max(m for m in range(1, target + 1) if dimension % m == 0)
+    bits = int(np.clip(np.floor(np.log2(max(n_vectors, 2) / 39)), 1, 8))
+    return f"PQ{sub_quantizers}x{bits}"
+
+
+def index_factory_string(index_type: str, n_vectors: int, dimension: int = 0, compression: str = "none") -> str:
+    """
+    Returns the faiss.index_factory description for a concrete index type.
+
+    Args:
+        index_type: "flat", "ivf" or "hnsw"
+        n_vectors: Number of vectors the index is trained on
+        dimension: Vector dimension, needed for product quantization
+        compression: Vector storage: "none" (float32), "sq8" (8-bit scalar),
+            "fp16" (half precision) or "pq" (product quantization)
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression {compression!r}, expected one of {COMPRESSIONS}")
+    storage = {
+        "none": "Flat",
+        "sq8": "SQ8",
+        "fp16": "SQfp16",
+        "pq": pq_code(dimension, n_vectors) if compression == "pq" else "",
+    }[compression]
+    if index_type == "flat":
+        return f"IDMap2,{storage}"
+    if index_type == "ivf":
+        return f"IVF{ivf_lists(n_vectors)},{storage}"
+    if index_type == "hnsw":
+        if compression == "none":
+            return f"IDMap2,HNSW{HNSW_NEIGHBORS}"
+        return f"IDMap2,HNSW{HNSW_NEIGHBORS}_{storage}"
+    raise ValueError(f"Unknown index type {index_type!r}")
+
+
+def build_index(index_type: str, vectors: np.ndarray, ids: np.ndarray, compression: str = "none") -> Any:
+    """
+    Builds and fills an id-mapped FAISS index of the given concrete type.
+
+    Args:
+        index_type: "flat", "ivf" or "hnsw"
+        vectors: float32 matrix, one row per table
+        ids: int64 id per row
+        compression: Vector storage, see ``index_factory_string``
+
+    Returns:
+        The trained and populated index
+    """
+    dimension = vectors.shape[1]
+    description = index_factory_string(index_type, len(vectors), dimension, compression)
+    index = faiss.index_factory(dimension, description, faiss.METRIC_L2)
+    if not index.is_trained:
+        index.train(vectors)
+    if len(vectors):
+        index.add_with_ids(vectors, ids)
+    return index
+
+
+def configure_search(index: Any, nprobe: int = 16, ef_search: int = 64) -> None:
+    """
+    Sets query-time accuracy knobs on IVF and HNSW indexes (no-op for flat).
+
+    Args:
+        index: The loaded index
+        nprobe: IVF lists scanned per query
+        ef_search: HNSW candidate list size per query
+    """
+    try:
+        faiss.extract_index_ivf(index).nprobe = nprobe
+        return
+    except (RuntimeError, TypeError):
+        pass
+    inner = faiss.downcast_index(index.index) if hasattr(index, "id_map") else index
+    if hasattr(inner, "hnsw"):
+        inner.hnsw.efSearch = ef_search
+
+
+def _read_id_index(base: str, dimension: int, index_type: str, n_vectors: int, compression: str) -> Optional[Tuple[Any, Dict[str, int], int, int]]:
+    """
+    Loads the published index for in-place updates.
+
+    Returns:
+        The index, table name to id, the next free id and the number of
+        vectors the index was trained on; or None if there is no compatible
+        id-mapped index of ``index_type`` and ``compression`` to update
+    """
+    index_path, mapping_path, _ = artifact_paths(base)
+    if not (os.path.exists(index_path) and os.path.exists(mapping_path)):
+        return None
+    with open(mapping_path, "r") as f:
+        payload = json.load(f)
+    if not isinstance(payload, dict) or payload.get("index_type", "flat") != index_type:
+        return None
+    if payload.get("compression", "none") != compression:
+        return None
+    trained_on = payload.get("trained_on", len(payload["tables"]))
+    if index_type == "ivf" or compression in TRAINED_COMPRESSIONS:
+        # Centroids, codebooks and scalar ranges trained on a very different
+        # number of vectors no longer fit the data, so retrain instead of patching.
+        if not trained_on / 2 <= n_vectors <= trained_on * 2:
+            return None
+    if compression == "pq" and pq_code(dimension, n_vectors) != pq_code(dimension, trained_on):
+        # The catalog has grown enough to train codes with more bits
+        return None
+    index = faiss.read_index(index_path)
+    if index.d != dimension or index.ntotal != len(payload["tables"]):
+        return None
+    table_ids = {table: int(table_id) for table_id, table in payload["tables"].items()}
+    return index, table_ids, payload["next_id"], trained_on
+
+
+def update_index(
+    base: str,
+    names: List[str],
+    vectors: np.ndarray,
+    updated_tables: Optional[Iterable[str]] = None,
+    index_type: str = "auto",
+    compression: str = "none",
+    model: Optional[str] = None
+) -> Any:
+    """
+    Brings the published index in line with the given vectors, in place.
+
+    Every table keeps a stable int64 id across runs. Dropped tables are
+    removed by id, new tables are added with a fresh id and altered tables
+    are replaced under their existing id, so the work done is proportional
+    to the change rather than to the number of tables. The index is rebuilt
+    from scratch when no compatible index exists yet, when the resolved
+    index type changes, when the catalog size left the 0.5x-2x range its
+    IVF lists or SQ8/PQ encoder were trained on, or when the index cannot
+    remove vectors (HNSW).
+
+    Args:
+        base: Artifact base path
+        names: Table names, one per row of ``vectors``
+        vectors: float32 matrix of the current embeddings
+        updated_tables: Tables whose vectors changed; None treats every table as changed
+        index_type: "auto", "flat", "ivf" or "hnsw"
+        compression: Vector storage, see ``index_factory_string``
+        model: Embedding space of the vectors, recorded so searches can
+            reject query vectors from another space
+
+    Returns:
+        The published index
+    """
+    dimension = vectors.shape[1]
+    resolved = resolve_index_type(index_type, len(names))
+    existing = _read_id_index(base, dimension, resolved, len(names), compression)
+    trained_on = len(names)
+    index = None
+    if existing is not None:
+        index, table_ids, next_id, trained_on = existing
+        current = set(names)
+        updated = set(names) if updated_tables is None else set(updated_tables)
+        dropped = [table for table in table_ids if table not in current]
+        changed_rows = [row for row, table in enumerate(names) if table not in table_ids or table in updated]
+
+        try:
+            stale_ids = [table_ids[table] for table in dropped]
+            stale_ids += [table_ids[names[row]] for row in changed_rows if names[row] in table_ids]
+            if stale_ids:
+                index.remove_ids(np.array(stale_ids, dtype=np.int64))
+        except RuntimeError as e:
+            logging.info(f"{resolved} index does not support removal ({e}), rebuilding")
+            index = None
+
+        if index is not None:
+            for table in dropped:
+                del table_ids[table]
+            new_ids = []
+            for row in changed_rows:
+                table = names[row]
+                if table not in table_ids:
+                    table_ids[table] = next_id
+                    next_id += 1
+                new_ids.append(table_ids[table])
+            if changed_rows:
+                index.add_with_ids(vectors[changed_rows], np.array(new_ids, dtype=np.int64))
+            logging.info(f"Updated {resolved} FAISS index in place: {len(changed_rows)} added or replaced, {len(dropped)} removed")
+
+    if index is None:
+        trained_on = len(names)
+        if existing is not None:
+            # Keep ids stable across a rebuild.
+            _, table_ids, next_id, _ = existing
+        else:
+            table_ids, next_id = {}, 0
+        for table in names:
+            if table not in table_ids:
+                table_ids[table] = next_id
+                next_id += 1
+        table_ids = {table: table_ids[table] for table in names}
+        index = build_index(resolved, vectors, np.array([table_ids[table] for table in names], dtype=np.int64), compression)
+        logging.info(f"Built a new {resolved} FAISS index ({compression} storage) with {len(names)} vectors")
+
+    mapping = {
+        "index_type": resolved,
+        "compression": compression,
+        "trained_on": trained_on,
+        "next_id": next_id,
+        "model": model,
+        "tables": {str(table_id): table for table, table_id in table_ids.items()},
+    }
+    write_index(base, index, mapping)
+    return index
+
+
+def clear_index(base: str) -> bool:
+    """
+    Publishes an empty index in place of an existing one.
+
+    Used when no table has a vector any more, so running servers stop
+    returning dropped tables. Table ids keep counting from where they were.
+
+    Returns:
+        True if an index existed and was emptied
+    """
+    index_path, mapping_path, _ = artifact_paths(base)
+    if not os.path.exists(index_path):
+        return False
+    dimension = faiss.read_index(index_path).d
+    next_id = 0
+    try:
+        with open(mapping_path, "r") as f:
+            payload = json.load(f)
+        if isinstance(payload, dict):
+            next_id = payload.get("next_id", 0)
+    except (FileNotFoundError, ValueError):
+        pass
+    mapping = {"index_type": "flat", "compression": "none", "trained_on": 0, "next_id": next_id, "model": None, "tables": {}}
+    write_index(base, faiss.IndexIDMap(faiss.IndexFlatL2(dimension)), mapping)
+    return True
+
+
+class IndexSnapshot(NamedTuple):
+    """An immutable, consistent view of the index and its mapping."""
+    index: Any
+    mapping: Dict[int, str]
+    version: Any
+    store: Optional[EmbeddingStore] = None
+    model: Optional[str] = None
+
+
+class ResidentIndex:
+    """
+    Long-lived, in-memory holder for the table FAISS index.
+
+    The index and mapping are loaded once and shared by every query. Each
+    lookup checks (at most every ``check_interval`` seconds) whether the
+    version file or the files' mtimes changed and, if so, loads the new
+    artifacts off to the side and swaps them in with a single reference
+    assignment. Searches keep using the snapshot they started with, so
+    concurrent sessions are never exposed to a half-loaded index.
+
+    With ``rerank`` set, a compressed index only proposes candidates and the
+    final order comes from exact distances against the memory-mapped float32
+    vectors of the embedding store, reading just the candidates' rows.
+    """
+
+    def __init__(self, base: str, check_interval: float = 1.0, nprobe: int = 16, ef_search: int = 64, rerank: int = 0):
+        """
+        Args:
+            base: Artifact base path, e.g. data/embeddings/table_embeddings
+            check_interval: Minimum seconds between file change checks
+            nprobe: IVF lists scanned per query
+            ef_search: HNSW candidate list size per query
+            rerank: Candidates fetched per requested result for exact
+                re-ranking; 0 disables re-ranking
+        """
+        self.base = base
+        self.index_path, self.mapping_path, self.version_path = artifact_paths(base)
+        self.check_interval = check_interval
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.rerank = rerank
+        self._snapshot: Optional[IndexSnapshot] = None
+        self._checked_at = 0.0
+        self._reload_lock = threading.Lock()
+
+    def _current_version(self) -> Optional[tuple]:
+        """Returns a token that changes whenever the artifacts on disk change."""
+        try:
+            stats = [os.stat(path) for path in (self.index_path, self.mapping_path)]
+        except FileNotFoundError:
+            return None
+        version = tuple((stat.st_mtime_ns, stat.st_size) for stat in stats)
+        try:
+            with open(self.version_path, "r") as f:
+                version += (f.read(),)
+        except FileNotFoundError:
+            pass
+        return version
+
+    def _load(self, version: tuple) -> Optional[IndexSnapshot]:
+        with span("faiss.load") as current:
+            index = faiss.read_index(self.index_path)
+            mapping, model = _read_mapping_payload(self.mapping_path)
+            current.set(vectors=index.ntotal)
+        if self._current_version() != version or index.ntotal != len(mapping):
+            # A writer replaced files while we were reading; retry on the next check.
+            logging.info("Index files changed during load, keeping the current snapshot")
+            return None
+        # Set before publishing the snapshot; searches never mutate the index.
+        configure_search(index, self.nprobe, self.ef_search)
+        store = None
+        if self.rerank > 0:
+            try:
+                store = EmbeddingStore(self.base)
+            except Exception as e:
+                logging.warning(f"Exact re-ranking disabled, embedding store unavailable: {e}")
+        return IndexSnapshot(index=index, mapping=mapping, version=version, store=store, model=model)
+
+    def snapshot(self) -> Optional[IndexSnapshot]:
+        """
+        Returns the current snapshot, reloading it first if the files changed.
+
+        Returns:
+            The snapshot, or None if no index has been built yet
+        """
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._checked_at < self.check_interval:
+            return self._snapshot
+
+        with self._reload_lock:
+            snapshot = self._snapshot
+            if snapshot is not None and now - self._checked_at < self.check_interval:
+                return snapshot
+            version = self._current_version()
+            self._checked_at = now
+            if version is None:
+                if snapshot is None:
+                    logging.error(f"Index or mapping file not found at {self.index_path} or {self.mapping_path}")
+                return snapshot
+            if snapshot is None or snapshot.version != version:
+                try:
+                    loaded = self._load(version)
+                except Exception as e:
+                    logging.error(f"Error loading FAISS index: {e}")
+                    loaded = None
+                if loaded is not None:
+                    logging.info(f"Loaded FAISS index with {loaded.index.ntotal} vectors")
+                    self._snapshot = snapshot = loaded
+            return snapshot
+
+    def search(self, query_embedding: List[float], top_k: int = 3, model: Optional[str] = None) -> List[str]:
+        """
+        Finds the tables closest to a query embedding.
+
+        Args:
+            query_embedding: The query vector
+            top_k: Number of tables to return
+            model: Embedding space of the query vector; nothing is returned
+                when the index was built in another space. None skips the check
+
+        Returns:
+            Table names ordered by similarity
+        """
+        snapshot = self.snapshot()
+        if snapshot is None or not snapshot.mapping:
+            return []
+        if model is not None and snapshot.model is not None and snapshot.model != model:
+            # Distances between vectors of different models are meaningless
+            logging.error(
+                f"FAISS index at {self.base} holds {snapshot.model} vectors but the query was embedded "
+                f"with {model}; skipping vector search until the tables are re-embedded"
+            )
+            return []
+        with span("faiss.search", top_k=top_k, rerank=snapshot.store is not None):
+            return self._search(snapshot, query_embedding, top_k)
+
+    def _search(self, snapshot: IndexSnapshot, query_embedding: List[float], top_k: int) -> List[str]:
+        query_vector = np.array([query_embedding], dtype=np.float32)
+        if snapshot.store is None:
+            distances, ids = snapshot.index.search(query_vector, min(top_k, len(snapshot.mapping)))
+            return [snapshot.mapping[int(table_id)] for table_id in ids[0] if int(table_id) in snapshot.mapping]
+
+        distances, ids = snapshot.index.search(query_vector, min(top_k * self.rerank, len(snapshot.mapping)))
+        candidates = [snapshot.mapping[int(table_id)] for table_id in ids[0] if int(table_id) in snapshot.mapping]
+        candidates = [table for table in candidates if table in snapshot.store and snapshot.store.vector(table) is not None]
+        if not candidates:
+            return []
+        rows = [snapshot.store.records[table]["row"] for table in candidates]
+        exact = np.sum((np.asarray(snapshot.store.vectors[rows]) - query_vector) ** 2, axis=1)
+        return [candidates[i] for i in np.argsort(exact, kind="stable")[:top_k]]
+
+
+@lru_cache(maxsize=None)
+def get_resident_index(base: str, nprobe: int = 16, ef_search: int = 64, rerank: int = 0) -> ResidentIndex:
+    """
+    Returns the process-wide resident index for an artifact base path and search settings.
+    """
+    return ResidentIndex(base, nprobe=nprobe, ef_search=ef_search, rerank=rerank)
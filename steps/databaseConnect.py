@@ -3,13 +3,18 @@ from typing import Dict, List, Any
 
 from zenml import step
 from src.databaseConnection import IngestData
+from src.instrumentation import traced
 
-@step
+# Never cached: the step's inputs are connection parameters, so a cache hit
+# would hide schema changes from the incremental training in process_data.
+@step(enable_cache=False)
+@traced("step.connectTheDatabase")
 def connectTheDatabase(
     password: str,
     database_name: str,
     host: str,
-    user: str
+    user: str,
+    bulk_introspection: bool = True
 ) -> Dict[str, Any]:
     """Connects to the database and fetches all necessary data.
     
@@ -18,6 +23,8 @@ def connectTheDatabase(
         database_name: Database name
         host: Database host
         user: Database username
+        bulk_introspection: Read every schema from information_schema in one
+            pass instead of issuing a DESCRIBE per table
         
     Returns:
         Dict containing tables and their schemas
@@ -39,7 +46,17 @@ def connectTheDatabase(
             
         # Get schemas
         table_schemas = {}
+        if bulk_introspection:
+            logging.info("Fetching table schemas from information_schema...")
+            bulk_schemas = db_connection.fetch_all_table_schemas(connection, database_name)
+            if bulk_schemas is None:
+                logging.warning("Bulk introspection failed, falling back to DESCRIBE per table.")
+            else:
+                table_schemas = {table: bulk_schemas[table] for table in tables if table in bulk_schemas}
+
         for table in tables:
+            if table in table_schemas:
+                continue
             schema = db_connection.fetch_table_schemas(connection, table)
             if schema is None:
                 logging.error(f"Failed to fetch schema for table: {table}")
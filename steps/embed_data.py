@@ -1,26 +1,63 @@
 import logging
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from zenml import step
-from src.data_embedding import GoogleEmbedding
+from src.data_embedding import create_embedder, get_query_embedder
+from src.embedding_store import load_embedded_metadata
+from src.training_manifest import TrainingManifest
+from src.instrumentation import traced
 
 @step
+@traced("step.embed_data")
 def embed_data(data: Dict[str, Any]) -> Dict[str, Any]:
-    """Embed the processed data and save to file."""
+    """Embed the processed data and save to file.
+
+    Tables whose metadata has not changed since they were last embedded reuse
+    their previous vector; only new and altered tables are sent to the model.
+    The backend comes from EMBEDDING_BACKEND, and vectors from another
+    backend are never reused.
+    """
     try:
         logging.info("Embedding data...")
         
-        # Initialize the embedding class
-        embedder = GoogleEmbedding()
-        
-        # Embed the metadata
-        embedded_data = embedder.embed_data(data)
-        
-        # Save to pkl file
         output_dir = os.path.join(os.getcwd(), "data", "embeddings")
         os.makedirs(output_dir, exist_ok=True)
-        output_file = os.path.join(output_dir, "table_embeddings.pkl")
-        embedder.save_embeddings(embedded_data, output_file)
+        output_base = os.path.join(output_dir, "table_embeddings")
+
+        # Initialize the configured embedding strategy
+        embedder = create_embedder()
+
+        manifest = TrainingManifest()
+        previous = load_embedded_metadata(output_base)
+        reused = {}
+        to_embed = {}
+        for table_name, table_data in data.items():
+            previous_table = previous.get(table_name)
+            if (
+                not manifest.needs_embedding(table_name)
+                and isinstance(previous_table, dict)
+                and "embedding" in previous_table
+                # Vectors saved before models were recorded are never reused:
+                # their space (and task type) is unknown
+                and previous_table.get("embedding_model") == embedder.model_id
+            ):
+                reused[table_name] = previous_table
+            else:
+                to_embed[table_name] = table_data
+        logging.info(f"Reusing {len(reused)} embeddings, embedding {len(to_embed)} tables")
+
+        # Embed the metadata
+        embedded_new = embedder.embed_data(to_embed) if to_embed else {}
+        embedded_data = {}
+        for table_name in data:
+            embedded_data[table_name] = reused[table_name] if table_name in reused else embedded_new.get(table_name, data[table_name])
+        
+        # Save vectors, metadata records and the FAISS index
+        if embedder.save_embeddings(embedded_data, output_base, updated_tables=list(to_embed)):
+            manifest.mark_embedded(
+                table_name for table_name, table_data in embedded_data.items()
+                if isinstance(table_data, dict) and "embedding" in table_data
+            )
         
         logging.info(f"Successfully embedded data for {len(embedded_data)} tables")
         return embedded_data
@@ -29,26 +66,34 @@ def embed_data(data: Dict[str, Any]) -> Dict[str, Any]:
         raise e
     
 @step
-def embedding_query(query: str) -> List[float]:
+@traced("step.embedding_query")
+def embedding_query(query: str, lexical: Optional[Dict[str, Any]] = None) -> List[float]:
     """
-    Embeds the query using the Google embedding strategy.
+    Embeds the query using the configured embedding strategy.
     
     Args:
         query (str): The query to be embedded.
+        lexical (Optional[Dict[str, Any]]): Output of lexical_search; when it is
+            confident the remote embedding call is skipped.
         
     Returns:
-        List[float]: The embedding vector for the query
+        List[float]: The embedding vector for the query, empty if skipped
     """
     try:
+        if lexical and lexical.get("confident"):
+            logging.info("Lexical match is confident, skipping query embedding.")
+            return []
+
         logging.info("Embedding query...")
         
-        # Initialize the embedding class
-        embedder = GoogleEmbedding()
+        # Reuse the shared embedder so its cache persists across queries
+        embedder = get_query_embedder()
         
         # Embed the query
         embedding = embedder.embed_query(query)
         
-        logging.info("Query embedding complete.")
+        if getattr(embedder, "cache", None) is not None:
+            logging.info(f"Query embedding complete. Cache: {embedder.cache.stats()}")
         return embedding
     except Exception as e:
         logging.error(f"Error embedding query: {e}")
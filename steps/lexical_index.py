@@ -0,0 +1,27 @@
+import logging
+from typing import Dict, Any
+from zenml import step
+
+from src.lexical_index import LexicalIndex
+from src.instrumentation import traced
+
+@step
+@traced("step.build_lexical_index")
+def build_lexical_index(data: Dict[str, Any]) -> int:
+    """Build the BM25 index over table names, columns and descriptions.
+
+    Args:
+        data: Table name mapped to generated metadata
+
+    Returns:
+        Number of tables indexed
+    """
+    try:
+        logging.info("Building lexical index...")
+        index = LexicalIndex().build(data)
+        index.save()
+        logging.info(f"Lexical index built with {len(index.doc_lengths)} tables and {len(index.postings)} terms")
+        return len(index.doc_lengths)
+    except Exception as e:
+        logging.error(f"Error building lexical index: {e}")
+        raise e
@@ -1,8 +1,14 @@
 import logging
-from typing import Dict, Any, List, NamedTuple
+from typing import Dict, Any, List, NamedTuple, Optional
 from zenml import step
 
-from src.metaDataGeneration import GeminiMetaDataCreation
+from src.metaDataGeneration import (
+    GeminiMetaDataCreation,
+    remove_table_metadata,
+)
+from src.metadata_store import get_metadata_store
+from src.training_manifest import TrainingManifest, schema_fingerprint
+from src.instrumentation import traced
 
 class ProcessOutput(NamedTuple):
     """Output type for process_data step."""
@@ -10,11 +16,20 @@ class ProcessOutput(NamedTuple):
     schemas: Dict[str, Any]
 
 @step
-def process_data(data: Dict[str, Any]) -> dict:
+@traced("step.process_data")
+def process_data(
+    data: Dict[str, Any],
+    max_workers: int = 1,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None
+) -> dict:
     """Process the data retrieved from the database.
     
     Args:
         data: Dictionary containing tables and schemas
+        max_workers: Number of tables to generate metadata for concurrently
+        requests_per_minute: Gemini request quota, None for no limit
+        tokens_per_minute: Gemini token quota, None for no limit
         
     Returns:
         ProcessOutput: A named tuple containing tables and their schemas
@@ -26,10 +41,37 @@ def process_data(data: Dict[str, Any]) -> dict:
         # debugging step  
         logging.info(f"Tables found: {tables}")
         # logging.info(f"Table schemas: {table_schemas}")
-                
+
+        # Only tables whose DDL changed since the last completed run are regenerated
+        manifest = TrainingManifest()
+        fingerprints = {table: schema_fingerprint(table_schemas.get(table, {})) for table in tables}
+        for table in manifest.drop_missing(tables):
+            logging.info(f"Table {table} was dropped, removing its metadata")
+            remove_table_metadata(table)
+        stored = get_metadata_store().tables()
+        pending = manifest.pending_metadata(fingerprints, lambda table: table in stored)
+        logging.info(f"{len(pending)} of {len(tables)} tables are new or altered")
+
         # Generate metadata using Gemini API
-        metadata_generator = GeminiMetaDataCreation(tables=tables, schemas=table_schemas)
-        metadata = metadata_generator.generate_metadata()
+        metadata_generator = GeminiMetaDataCreation(
+            tables=pending,
+            schemas=table_schemas,
+            max_workers=max_workers,
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+            on_table_complete=lambda table, _: manifest.mark_metadata(table, fingerprints[table])
+        )
+        generated = metadata_generator.generate_metadata() if pending else {}
+
+        if any(table not in generated for table in pending):
+            # Completed tables are already recorded in the manifest, so the
+            # next run resumes with only the remaining ones.
+            raise RuntimeError("Metadata generation failed; rerun the pipeline to resume from the last completed table")
+        manifest.save()
+
+        metadata = get_metadata_store().get_many([table for table in tables if table not in generated])
+        metadata.update(generated)
+        metadata = {table: metadata.get(table) for table in tables}
 
         return metadata
     except Exception as e:
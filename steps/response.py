@@ -1,47 +1,31 @@
 import logging
-import os
 from typing import List
 from zenml import step
 
-from src.data_response import Response, GeminiResponse
+from src.context_builder import ContextBuilder
+from src.data_response import Response, GeminiResponse, log_response
+from src.instrumentation import traced
 
 @step
-def response(matching_chunks: List[str], include_tables:List[str], query: str) -> str:
+@traced("step.response")
+def response(matching_chunks: List[str], include_tables:List[str], query: str, log_responses: bool = False, context_tokens: int = 4000) -> str:
     try:
         logging.info("Preparing response...")
         
-        # Check if the directory exists and create it if needed
-        chunk_dir = os.path.join(os.getcwd(), "data", "chunk")
-        if not os.path.exists(chunk_dir):
-            os.makedirs(chunk_dir)
-        
-        # Debug: log which files we're looking for
+        # Debug: log which tables we're using
         final_chunk = matching_chunks + include_tables
         logging.info(f"Final chunks to process: {final_chunk}")
-        for table_name in final_chunk:
-            logging.info(f"Looking for table JSON: {table_name}.json")
         
-        # Load the actual table metadata from files
-        content_chunks = []
-        for table_name in final_chunk:
-            try:
-                # Load the JSON file for this table
-                json_path = os.path.join(os.getcwd(), "data", "chunk", f"{table_name}.json")
-                if os.path.exists(json_path):
-                    with open(json_path, 'r') as f:
-                        content_chunks.append(f.read())
-            except Exception as e:
-                logging.error(f"Could not load metadata for table {table_name}: {e}")
+        # Render the table metadata compactly within the token budget,
+        # user-selected tables first
+        content_chunks = ContextBuilder(max_tokens=context_tokens).build(matching_chunks, required=include_tables).chunks
         
         agent1 = GeminiResponse()
         resp = agent1.get_response(matching_chunks=content_chunks, query=query)
         logging.info(f"Response: {type(resp)}")
         logging.info(f"Response: {resp}")
-        response_file_path = os.path.join(chunk_dir, "response.txt")
-        
-        # After generating the response
-        with open(response_file_path, "w") as f:
-            f.write(resp)
+        if log_responses:
+            log_response(query, resp)
         
         return resp
     except Exception as e:
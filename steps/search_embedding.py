@@ -1,52 +1,83 @@
-import faiss
 import logging
-import numpy as np
-import json
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from zenml import step
 
+from src.data_embedding import get_query_embedder
+from src.lexical_index import fuse_rankings, get_lexical_index
+from src.vector_index import embeddings_dir, get_resident_index
+from src.instrumentation import traced
+
+@step
+@traced("step.lexical_search")
+def lexical_search(query: str, top_k: int = 3, include_tables: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Local first-stage retrieval over table names, columns and descriptions.
+
+    Args:
+        query: The user question
+        top_k: Number of tables to return
+        include_tables: Tables the user selected; matching only these is never confident
+
+    Returns:
+        Dict with the ranked "tables" and whether the stage is "confident"
+        enough for the remote embedding call to be skipped
+    """
+    try:
+        index = get_lexical_index()
+        if index is None:
+            logging.warning("No lexical index found, relying on vector search")
+            return {"tables": [], "confident": False}
+        result = index.route(query, top_k=top_k, selected=include_tables)
+        logging.info(f"Lexical tables: {result.tables} (confident: {result.confident})")
+        return {"tables": result.tables, "confident": result.confident}
+    except Exception as e:
+        logging.error(f"Error in lexical search: {e}")
+        return {"tables": [], "confident": False}
+
 @step
-def search_embedding(query_embedding: List[float], top_k: int = 3) -> List[str]:
+@traced("step.search_embedding")
+def search_embedding(
+    query_embedding: List[float],
+    top_k: int = 3,
+    nprobe: int = 16,
+    ef_search: int = 64,
+    rerank: int = 0,
+    lexical: Optional[Dict[str, Any]] = None
+) -> List[str]:
     """
     Find tables similar to a query embedding using the FAISS index.
+
+    The index and mapping are held in memory by a process-wide resident
+    index and only re-read from disk when training publishes new files.
+    The index type (flat, IVF or HNSW) is whatever training built.
     
     Args:
         query_embedding: Embedding vector to find similar tables for
         top_k: Number of top results to return
+        nprobe: IVF lists scanned per query, ignored for other index types
+        ef_search: HNSW candidate list size per query, ignored for other index types
+        rerank: Candidates per result re-ranked exactly against the float32
+            vector store, for compressed indexes; 0 disables re-ranking
+        lexical: Output of lexical_search; confident lexical hits are returned
+            as-is, otherwise they are fused with the vector results
         
     Returns:
         List of table names most similar to the query
     """
     try:
-        # Define paths
-        base_dir = os.path.join(os.getcwd(), "data", "embeddings")
-        index_path = os.path.join(base_dir, "table_embeddings_faiss.index")
-        mapping_path = os.path.join(base_dir, "table_embeddings_mapping.json")
-        
-        # Check if files exist
-        if not os.path.exists(index_path) or not os.path.exists(mapping_path):
-            logging.error(f"Index or mapping file not found at {index_path} or {mapping_path}")
-            return []
-        
-        # Convert to numpy array - no need to embed again
-        query_vector = np.array([query_embedding], dtype=np.float32)
-        
-        # Load the FAISS index
-        index = faiss.read_index(index_path)
-        
-        # Load the mapping
-        with open(mapping_path, 'r') as f:
-            table_mapping = json.load(f)
-            
-        # Search the index
-        distances, indices = index.search(query_vector, min(top_k, len(table_mapping)))
-        
-        # Get the table names
-        similar_tables = [table_mapping[int(idx)] for idx in indices[0] if idx >= 0 and idx < len(table_mapping)]
+        lexical_tables = lexical["tables"] if lexical else []
+        if lexical and lexical["confident"] or not query_embedding:
+            logging.info(f"Using lexical tables without vector search: {lexical_tables}")
+            return lexical_tables[:top_k]
+
+        resident_index = get_resident_index(os.path.join(embeddings_dir(), "table_embeddings"), nprobe, ef_search, rerank)
+        similar_tables = resident_index.search(query_embedding, top_k, model=get_query_embedder().vector_space)
+        if lexical_tables:
+            similar_tables = fuse_rankings(lexical_tables, similar_tables, top_k)
         
         logging.info(f"Found similar tables: {similar_tables}")
         return similar_tables
     except Exception as e:
         logging.error(f"Error finding similar tables: {e}")
-        return []
\ No newline at end of file
+        return []
@@ -0,0 +1,171 @@
+"""Embedding backend comparison: throughput and retrieval quality per backend.
+
+Every backend embeds the same synthetic schema's metadata (generated by the
+offline metadata stub) and the same questions, each with a known target
+table, so the numbers are directly comparable:
+
+    vectors/s      tables embedded per second by embed_data, fitting included
+    query p50      latency of one embed_query call
+    recall@1/@k    share of questions whose table is ranked first / in the top k
+    MRR@k          mean reciprocal rank of the target table within the top k
+
+Ranking is exact inner product over the normalized vectors, so the index
+type plays no part. Backends:
+
+    local          LocalEmbedding on the CPU
+    google         GoogleEmbedding against the real API (needs GEMINI_API_KEY)
+    google-stub    GoogleEmbedding over the hashed-word stand-in from stubs.py,
+                   with --embed-latency simulating the API round trip
+
+    python test/benchmark/compare_embeddings.py --tables 1000 10000
+    python test/benchmark/compare_embeddings.py --backends local google --tables 500 --queries 100
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, REPO_ROOT)
+
+from src.data_embedding import GoogleEmbedding, LocalEmbedding
+from src.metadata_store import get_metadata_store
+from run_benchmark import git_commit
+from stubs import StubEmbedding, StubMetaDataGeneration
+from synthetic_schema import generate_questions, generate_schema
+
+
+def make_embedder(backend, args):
+    if backend == "local":
+        return LocalEmbedding(dimension=args.dim, idf_path=None)
+    if backend == "google":
+        return GoogleEmbedding()
+    return StubEmbedding(args.dim, request_latency=args.embed_latency)
+
+
+def synthetic_metadata(tables):
+    """Generates metadata for the synthetic tables with the offline stub."""
+    schemas = {
+        table.name: [{"Field": name, "Type": sql_type, "Key": key} for name, sql_type, key in table.columns]
+        for table in tables
+    }
+    return StubMetaDataGeneration([table.name for table in tables], schemas).generate_metadata()
+
+
+def evaluate(embedder, metadata, questions, top_k):
+    """Embeds the metadata and questions; returns throughput and retrieval quality."""
+    start = time.perf_counter()
+    embedded = embedder.embed_data(metadata)
+    embed_seconds = time.perf_counter() - start
+    names = [name for name, data in embedded.items() if isinstance(data, dict) and "embedding" in data]
+    vectors = np.array([embedded[name]["embedding"] for name in names], dtype=np.float32)
+    faiss.normalize_L2(vectors)
+
+    latencies, query_vectors = [], []
+    for question, _ in questions:
+        start = time.perf_counter()
+        query_vectors.append(embedder.embed_query(question))
+        latencies.append(time.perf_counter() - start)
+    query_vectors = np.array(query_vectors, dtype=np.float32)
+    faiss.normalize_L2(query_vectors)
+
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+    _, ids = index.search(query_vectors, min(top_k, len(names)))
+    ranks = []
+    for (_, target), row in zip(questions, ids):
+        ranked = [names[i] for i in row if i >= 0]
+        ranks.append(ranked.index(target) + 1 if target in ranked else None)
+
+    latencies = np.asarray(latencies) * 1000
+    return {
+        "embedded": len(names),
+        "dimension": int(vectors.shape[1]),
+        "embed_seconds": embed_seconds,
+        "vectors_per_second": len(names) / embed_seconds if embed_seconds else float("inf"),
+        "query_p50_ms": float(np.percentile(latencies, 50)),
+        "query_p95_ms": float(np.percentile(latencies, 95)),
+        "recall_at_1": float(np.mean([rank == 1 for rank in ranks])),
+        f"recall_at_{top_k}": float(np.mean([rank is not None for rank in ranks])),
+        f"mrr_at_{top_k}": float(np.mean([1 / rank if rank else 0.0 for rank in ranks])),
+    }
+
+
+def run_size(args, n_tables):
+    tables = generate_schema(n_tables, seed=args.seed)
+    questions = generate_questions(tables, args.queries, seed=args.seed)
+    workdir = tempfile.mkdtemp(prefix=f"embed_bench_{n_tables}_")
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    # Stores resolve their paths relative to the working directory
+    get_metadata_store.cache_clear()
+    try:
+        metadata = synthetic_metadata(tables)
+        backends = {}
+        for backend in args.backends:
+            print(f"  {backend}...", flush=True)
+            backends[backend] = evaluate(make_embedder(backend, args), metadata, questions, args.top_k)
+    finally:
+        os.chdir(previous_dir)
+        get_metadata_store.cache_clear()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {"tables": n_tables, "backends": backends}
+
+
+def print_results(results, top_k):
+    print(f"{'tables':>8} {'backend':<12} {'vectors/s':>11} {'query p50':>11} {'recall@1':>9} {f'recall@{top_k}':>9} {f'MRR@{top_k}':>8}")
+    for result in results:
+        for backend, stats in result["backends"].items():
+            print(
+                f"{result['tables']:>8} {backend:<12} {stats['vectors_per_second']:>11.0f} {stats['query_p50_ms']:>9.2f}ms "
+                f"{stats['recall_at_1']:>9.3f} {stats[f'recall_at_{top_k}']:>9.3f} {stats[f'mrr_at_{top_k}']:>8.3f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tables", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--backends", nargs="+", choices=["local", "google", "google-stub"], default=["local", "google-stub"])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embed-latency", type=float, default=0.2, help="simulated seconds per google-stub request")
+    parser.add_argument("--output", help="results file; defaults to test/benchmark/results/embeddings-<time>-<commit>.json")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    results = []
+    for n_tables in args.tables:
+        print(f"Comparing embedding backends on {n_tables} tables...", flush=True)
+        results.append(run_size(args, n_tables))
+
+    commit, dirty = git_commit()
+    output = args.output or os.path.join(
+        REPO_ROOT, "test", "benchmark", "results",
+        f"embeddings-{datetime.datetime.now():%Y%m%d-%H%M%S}-{commit[:10]}{'-dirty' if dirty else ''}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "commit": commit,
+            "dirty": dirty,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "config": {key: value for key, value in vars(args).items() if key != "output"},
+            "results": results,
+        }, f, indent=2)
+
+    print_results(results, args.top_k)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
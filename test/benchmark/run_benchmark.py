@@ -0,0 +1,259 @@
+"""Offline scale benchmark: per-stage training and query latency vs schema size.
+
+For every schema size a synthetic database is created (SQLite by default,
+or a scratch MySQL database), then trained and queried in a scratch
+directory with the offline stubs from stubs.py in place of Gemini:
+
+    introspection  read tables and schemas back from the database
+    metadata       generate and store table metadata
+    embedding      embed the metadata
+    indexing       write the vector store, FAISS index and lexical index
+    retrieval      route and search each question (QueryEngine.retrieve)
+    context        render the prompt context (ContextBuilder)
+    response       generate the answer
+
+Timings are written as JSON, tagged with the current commit, so runs on
+two commits can be compared with --baseline.
+
+    python test/benchmark/run_benchmark.py --tables 10 100 1000 10000
+    python test/benchmark/run_benchmark.py --tables 50000 --queries 200
+    python test/benchmark/run_benchmark.py --target mysql --host localhost --user root --password secret
+    python test/benchmark/run_benchmark.py --baseline test/benchmark/results/<earlier run>.json
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, REPO_ROOT)
+
+from src.databaseConnection import IngestData
+from src.lexical_index import LexicalIndex
+from src.metadata_store import get_metadata_store
+from src.query_engine import QueryEngine
+from stubs import StubEmbedding, StubMetaDataGeneration, StubResponse
+from synthetic_schema import create_mysql, create_sqlite, drop_mysql, generate_questions, generate_schema, introspect_sqlite
+
+TRAINING_STAGES = ["introspection", "metadata", "embedding", "indexing"]
+QUERY_STAGES = ["retrieval", "context", "response"]
+
+
+def git_commit():
+    """Returns (commit, dirty) of the repository, or ("unknown", False) outside git."""
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True, stderr=subprocess.DEVNULL).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT, text=True).strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+def query_stats(latencies):
+    latencies = np.asarray(latencies) * 1000
+    return {
+        "seconds": float(latencies.sum() / 1000),
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }
+
+
+def introspect(args, tables):
+    """Creates the synthetic schema and times reading it back."""
+    if args.target == "sqlite":
+        # Generated schemas are built once and reused by later runs
+        path = os.path.join(args.schema_cache, f"schema-{len(tables)}-{args.seed}")
+        if not os.path.isdir(path):
+            shutil.rmtree(path + ".tmp", ignore_errors=True)
+            create_sqlite(path + ".tmp", tables)
+            os.replace(path + ".tmp", path)
+        start = time.perf_counter()
+        names, schemas = introspect_sqlite(path)
+        return names, schemas, time.perf_counter() - start
+
+    import pymysql
+    admin = pymysql.connect(host=args.host, user=args.user, password=args.password)
+    database = f"{args.database}_{len(tables)}"
+    create_mysql(admin, database, tables)
+    try:
+        ingest = IngestData(args.password, database, args.host, args.user)
+        connection = ingest.connect_to_database()
+        start = time.perf_counter()
+        names = ingest.fetch_tables(connection, database)
+        schemas = ingest.fetch_all_table_schemas(connection, database)
+        elapsed = time.perf_counter() - start
+        connection.close()
+        return names, schemas, elapsed
+    finally:
+        if not args.keep:
+            drop_mysql(admin, database)
+        admin.close()
+
+
+def run_size(args, n_tables):
+    """Trains and queries one synthetic schema size; returns its timings."""
+    tables = generate_schema(n_tables, seed=args.seed)
+    questions = generate_questions(tables, args.queries, seed=args.seed)
+    stages = {}
+
+    workdir = tempfile.mkdtemp(prefix=f"bench_{n_tables}_")
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    # Stores resolve their paths relative to the working directory
+    get_metadata_store.cache_clear()
+    try:
+        names, schemas, elapsed = introspect(args, tables)
+        stages["introspection"] = {"seconds": elapsed}
+
+        start = time.perf_counter()
+        metadata = StubMetaDataGeneration(
+            names, schemas, latency=args.metadata_latency, max_workers=args.metadata_workers
+        ).generate_metadata()
+        stages["metadata"] = {"seconds": time.perf_counter() - start}
+
+        embedder = StubEmbedding(args.dim, request_latency=args.embed_latency, index_type=args.index_type)
+        start = time.perf_counter()
+        embedded = embedder.embed_data(metadata)
+        stages["embedding"] = {"seconds": time.perf_counter() - start}
+
+        start = time.perf_counter()
+        embedder.save_embeddings(embedded, os.path.join(workdir, "data", "embeddings", "table_embeddings"))
+        LexicalIndex().build(metadata).save()
+        stages["indexing"] = {"seconds": time.perf_counter() - start}
+
+        engine = QueryEngine(embedder=embedder, responder=StubResponse(args.response_latency))
+        timings = {stage: [] for stage in QUERY_STAGES}
+        hits = 0
+        cold_start = time.perf_counter()
+        engine.retrieve(questions[0][0])
+        cold_ms = 1000 * (time.perf_counter() - cold_start)
+        for question, target in questions:
+            start = time.perf_counter()
+            retrieved = engine.retrieve(question)
+            timings["retrieval"].append(time.perf_counter() - start)
+            hits += target in retrieved
+
+            start = time.perf_counter()
+            chunks = engine.context_builder.build(retrieved).chunks
+            timings["context"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            engine.responder.get_response(matching_chunks=chunks, query=question)
+            timings["response"].append(time.perf_counter() - start)
+
+        for stage in QUERY_STAGES:
+            stages[stage] = query_stats(timings[stage])
+        stages["retrieval"]["cold_ms"] = cold_ms
+        stages["retrieval"]["hit_rate"] = hits / len(questions)
+    finally:
+        os.chdir(previous_dir)
+        get_metadata_store.cache_clear()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {"tables": n_tables, "tables_introspected": len(names), "stages": stages}
+
+
+def print_results(results):
+    print(f"{'tables':>8} " + " ".join(f"{stage:>13}" for stage in TRAINING_STAGES + QUERY_STAGES) + f" {'hit rate':>9}")
+    for result in results:
+        stages = result["stages"]
+        cells = [f"{stages[stage]['seconds']:>12.2f}s" for stage in TRAINING_STAGES]
+        cells += [f"{stages[stage]['p50_ms']:>10.2f}ms" for stage in QUERY_STAGES]
+        print(f"{result['tables']:>8} " + " ".join(cells) + f" {stages['retrieval']['hit_rate']:>9.2f}")
+    print("(training stages: total seconds; query stages: p50 per question)")
+
+
+def compare(results, baseline_path, threshold, min_delta_ms):
+    """
+    Prints each stage's change against a baseline run.
+
+    Returns:
+        bool: True if any stage got slower by more than ``threshold`` and
+        by more than ``min_delta_ms``, so timer noise on tiny stages is ignored
+    """
+    with open(baseline_path) as f:
+        baseline = {result["tables"]: result for result in json.load(f)["results"]}
+    regressed = False
+    print(f"\nAgainst {baseline_path} (flagged above {threshold:.0%} slower):")
+    for result in results:
+        previous = baseline.get(result["tables"])
+        if previous is None:
+            continue
+        for stage in TRAINING_STAGES + QUERY_STAGES:
+            metric = "seconds" if stage in TRAINING_STAGES else "p50_ms"
+            old, new = previous["stages"][stage][metric], result["stages"][stage][metric]
+            change = (new - old) / old if old else 0.0
+            delta_ms = (new - old) * (1000 if metric == "seconds" else 1)
+            flag = "  REGRESSION" if change > threshold and delta_ms > min_delta_ms else ""
+            regressed |= bool(flag)
+            print(f"{result['tables']:>8} {stage:<14} {old:>10.3f} -> {new:>10.3f} {metric:<8} {change:>+8.1%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tables", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--index-type", default="auto")
+    parser.add_argument("--metadata-latency", type=float, default=0.0, help="simulated seconds per metadata generation call")
+    parser.add_argument("--metadata-workers", type=int, default=8)
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="simulated seconds per embedding request")
+    parser.add_argument("--response-latency", type=float, default=0.0, help="simulated seconds per answer")
+    parser.add_argument("--target", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", default="sqlmaker_bench", help="prefix of the scratch MySQL databases")
+    parser.add_argument("--schema-cache", default=os.path.join(REPO_ROOT, "test", "benchmark", ".cache"),
+                        help="directory of the generated SQLite schemas")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directories and databases")
+    parser.add_argument("--output", help="results file; defaults to test/benchmark/results/<time>-<commit>.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown flagged as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="smaller absolute slowdowns are never flagged")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    results = []
+    for n_tables in args.tables:
+        print(f"Benchmarking {n_tables} tables...", flush=True)
+        results.append(run_size(args, n_tables))
+
+    commit, dirty = git_commit()
+    run = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {key: value for key, value in vars(args).items() if key not in ("password", "output", "baseline", "schema_cache")},
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        REPO_ROOT, "test", "benchmark", "results",
+        f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{commit[:10]}{'-dirty' if dirty else ''}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(run, f, indent=2)
+
+    print_results(results)
+    print(f"Results written to {output}")
+    if args.baseline and compare(results, args.baseline, args.threshold, args.min_delta_ms):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Deterministic offline stand-ins for the Gemini-backed strategies.
+
+Each stub subclasses the production strategy and replaces only the remote
+call, so batching, concurrency, rate limiting and storage run exactly as in
+production while the provider is simulated with a configurable latency.
+Outputs depend only on their inputs, so runs are repeatable.
+"""
+import json
+import time
+import zlib
+from typing import Iterator, List
+
+import numpy as np
+
+from src.data_embedding import GoogleEmbedding
+from src.data_response import Response
+from src.metaDataGeneration import GeminiMetaDataCreation
+from src.rate_limiter import estimate_tokens
+
+
+class StubMetaDataGeneration(GeminiMetaDataCreation):
+    """
+    Generates table metadata from the schema alone, after ``latency`` seconds.
+
+    Goes through GeminiMetaDataCreation's worker pool, rate limiter and
+    metadata store writes; only the model call is replaced.
+    """
+
+    def __init__(self, tables: list, schemas: dict, latency: float = 0.0, **kwargs):
+        super().__init__(tables, schemas, **kwargs)
+        self.latency = latency
+
+    def _generate_table(self, table: str) -> str:
+        # Same quota accounting as the Gemini call
+        self.rate_limiter.acquire(tokens=2 * estimate_tokens(self._build_prompt(table)))
+        if self.latency:
+            time.sleep(self.latency)
+        words = table.split("_")
+        subject = " ".join(words[1:3]) if len(words) >= 3 else table.replace("_", " ")
+        region = words[0]
+        columns = [
+            {
+                "name": row["Field"],
+                "type": row["Type"],
+                "description": f"The {row['Field'].replace('_', ' ')} of the {subject} record.",
+            }
+            for row in self.schemas.get(table, [])
+        ]
+        description = f"Stores {subject} records for the {region} region."
+        return json.dumps({
+            "table_name": table,
+            "schema_description": description,
+            "columns": columns,
+            "embedding_text": f"{description} Columns: {', '.join(column['name'] for column in columns)}.",
+        })
+
+
+class HashedEmbeddings:
+    """
+    Stand-in for GoogleGenerativeAIEmbeddings: a sum of per-word random
+    vectors, seeded by the word, so texts sharing words are close.
+    """
+
+    def __init__(self, dimension: int = 768, request_latency: float = 0.0, per_item_latency: float = 0.0):
+        self.dimension = dimension
+        self.request_latency = request_latency
+        self.per_item_latency = per_item_latency
+        self._words = {}
+
+    def _word(self, word: str) -> np.ndarray:
+        vector = self._words.get(word)
+        if vector is None:
+            rng = np.random.default_rng(zlib.crc32(word.encode("utf-8")))
+            vector = self._words[word] = rng.standard_normal(self.dimension).astype(np.float32)
+        return vector
+
+    def _vector(self, text: str) -> List[float]:
+        words = [word for word in "".join(c if c.isalnum() else " " for c in text.lower()).split() if len(word) > 2]
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in words:
+            vector += self._word(word)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.request_latency + self.per_item_latency)
+        return self._vector(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.request_latency + self.per_item_latency * len(texts))
+        return [self._vector(text) for text in texts]
+
+
+class StubEmbedding(GoogleEmbedding):
+    """GoogleEmbedding over HashedEmbeddings: real batching and index writes, no network."""
+
+    def __init__(self, dimension: int = 768, request_latency: float = 0.0, per_item_latency: float = 0.0, **kwargs):
+        super().__init__(model=HashedEmbeddings(dimension, request_latency, per_item_latency), **kwargs)
+
+
+class StubResponse(Response):
+    """
+    Answers with a SQL statement over the first table of the context,
+    streamed in ``chunks`` pieces over ``latency`` seconds.
+    """
+
+    def __init__(self, latency: float = 0.0, chunks: int = 8):
+        self.latency = latency
+        self.chunks = max(1, chunks)
+
+    def _answer(self, matching_chunks, query) -> str:
+        # Context chunks are rendered as "table(col type, ...) -- description"
+        table = str(matching_chunks[0]).split("(", 1)[0].strip() if matching_chunks else "unknown"
+        return f"```sql\nSELECT * FROM {table} LIMIT 10;\n```\nBased on {len(matching_chunks)} tables of context."
+
+    def get_response(self, matching_chunks, query) -> str:
+        time.sleep(self.latency)
+        return self._answer(matching_chunks, query)
+
+    def stream_response(self, matching_chunks, query) -> Iterator[str]:
+        text = self._answer(matching_chunks, query)
+        size = -(-len(text) // self.chunks)
+        for start in range(0, len(text), size):
+            time.sleep(self.latency / self.chunks)
+            yield text[start:start + size]
@@ -0,0 +1,175 @@
+"""Synthetic database schemas for the scale benchmarks.
+
+Generates a deterministic schema of any size (10 to 50,000 tables and
+beyond) from a small business vocabulary, creates it in SQLite or MySQL,
+and reads it back as the DESCRIBE-style rows the training pipeline works
+with. Questions with a known target table are generated alongside, so
+retrieval quality can be checked at every size.
+"""
+import os
+import random
+import sqlite3
+from typing import Dict, List, NamedTuple, Tuple
+
+DOMAINS = [
+    "customer", "order", "invoice", "product", "shipment", "employee", "supplier", "payment",
+    "warehouse", "campaign", "ticket", "contract", "account", "vehicle", "patient", "course",
+]
+KINDS = ["events", "history", "items", "audit", "summary", "details", "snapshots", "notes"]
+REGIONS = [
+    "north", "south", "east", "west", "central", "coastal", "alpine", "metro",
+    "rural", "harbor", "valley", "desert", "island", "border", "capital", "frontier",
+]
+ATTRIBUTES = [
+    ("status", "varchar(20)"), ("amount", "decimal(12,2)"), ("quantity", "int"), ("created_at", "datetime"),
+    ("updated_at", "datetime"), ("name", "varchar(100)"), ("email", "varchar(255)"), ("score", "double"),
+    ("priority", "tinyint"), ("notes", "text"), ("currency", "char(3)"), ("due_date", "date"),
+    ("discount", "decimal(5,2)"), ("channel", "varchar(30)"), ("rating", "smallint"), ("is_active", "tinyint(1)"),
+]
+
+
+class SyntheticTable(NamedTuple):
+    name: str
+    domain: str
+    kind: str
+    region: str
+    # (column name, MySQL type, DESCRIBE key flag)
+    columns: List[Tuple[str, str, str]]
+
+
+def generate_schema(n_tables: int, seed: int = 0) -> List[SyntheticTable]:
+    """
+    Generates ``n_tables`` tables with 4-12 columns each.
+
+    Tables are named ``<region>_<domain>_<kind>`` with a numeric suffix once
+    the vocabulary runs out, and most tables reference the key of an
+    earlier table, so the schema has realistic join paths.
+    """
+    rng = random.Random(seed)
+    tables = []
+    for i in range(n_tables):
+        domain = DOMAINS[i % len(DOMAINS)]
+        kind = KINDS[(i // len(DOMAINS)) % len(KINDS)]
+        region = REGIONS[(i // (len(DOMAINS) * len(KINDS))) % len(REGIONS)]
+        round_ = i // (len(DOMAINS) * len(KINDS) * len(REGIONS))
+        name = f"{region}_{domain}_{kind}" + (f"_{round_}" if round_ else "")
+
+        columns = [("id", "bigint", "PRI")]
+        if tables and rng.random() < 0.8:
+            parent = tables[rng.randrange(len(tables))]
+            columns.append((f"{parent.domain}_id", "bigint", "MUL"))
+        for attribute, sql_type in rng.sample(ATTRIBUTES, rng.randint(3, 10)):
+            columns.append((attribute, sql_type, ""))
+        tables.append(SyntheticTable(name, domain, kind, region, columns))
+    return tables
+
+
+def create_table_sql(table: SyntheticTable) -> str:
+    """CREATE TABLE statement valid in both MySQL and SQLite."""
+    columns = []
+    for name, sql_type, key in table.columns:
+        column = f"{name} {sql_type}"
+        if key == "PRI":
+            column += " PRIMARY KEY"
+        columns.append(column)
+    return f"CREATE TABLE {table.name} ({', '.join(columns)})"
+
+
+def create_sqlite(directory: str, tables: List[SyntheticTable], tables_per_file: int = 2000) -> None:
+    """
+    Creates the schema as SQLite files, the offline MySQL stand-in.
+
+    SQLite's DDL gets slower with every table already in the file, so large
+    schemas are split over several files of ``tables_per_file`` tables.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for part, first in enumerate(range(0, len(tables), tables_per_file)):
+        statements = []
+        for table in tables[first:first + tables_per_file]:
+            statements.append(create_table_sql(table))
+            statements.extend(
+                f"CREATE INDEX idx_{table.name}_{name} ON {table.name} ({name})"
+                for name, _, key in table.columns if key == "MUL"
+            )
+        path = os.path.join(directory, f"part-{part:04d}.sqlite")
+        if os.path.exists(path):
+            os.remove(path)
+        connection = sqlite3.connect(path)
+        # One transaction per file
+        connection.executescript("BEGIN;\n" + ";\n".join(statements) + ";\nCOMMIT;")
+        connection.close()
+
+
+def introspect_sqlite(directory: str) -> Tuple[List[str], Dict[str, List[Dict[str, str]]]]:
+    """
+    Reads the tables and DESCRIBE-style schemas back from the SQLite files.
+
+    SQLite has no information_schema, so this is one catalog query plus a
+    PRAGMA per table; its timing stands in for, but is not comparable to,
+    the MySQL bulk introspection.
+    """
+    tables = []
+    schemas = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".sqlite"):
+            continue
+        connection = sqlite3.connect(os.path.join(directory, name))
+        try:
+            part = [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+            for table in part:
+                indexed = set()
+                for index in connection.execute(f"PRAGMA index_list({table})"):
+                    indexed.update(row[2] for row in connection.execute(f"PRAGMA index_info({index[1]})"))
+                schemas[table] = [
+                    {
+                        "Field": column,
+                        "Type": sql_type,
+                        "Null": "NO" if pk or notnull else "YES",
+                        "Key": "PRI" if pk else ("MUL" if column in indexed else ""),
+                        "Default": default,
+                        "Extra": "",
+                    }
+                    for _, column, sql_type, notnull, default, pk in connection.execute(f"PRAGMA table_info({table})")
+                ]
+            tables.extend(part)
+        finally:
+            connection.close()
+    return sorted(tables), schemas
+
+
+def create_mysql(connection, database: str, tables: List[SyntheticTable]) -> None:
+    """Creates the schema in a fresh MySQL database, dropping any previous one."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+        cursor.execute(f"CREATE DATABASE `{database}`")
+        cursor.execute(f"USE `{database}`")
+        for table in tables:
+            keys = [f", KEY ({name})" for name, _, key in table.columns if key == "MUL"]
+            cursor.execute(create_table_sql(table)[:-1] + "".join(keys) + ")")
+    connection.commit()
+
+
+def drop_mysql(connection, database: str) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+    connection.commit()
+
+
+def generate_questions(tables: List[SyntheticTable], n: int, seed: int = 0) -> List[Tuple[str, str]]:
+    """
+    Generates (question, target table) pairs.
+
+    Half the questions name their table literally, as users often do; the
+    others paraphrase it by region, domain and kind.
+    """
+    rng = random.Random(seed)
+    questions = []
+    for i in range(n):
+        table = tables[rng.randrange(len(tables))]
+        attribute = table.columns[-1][0].replace("_", " ")
+        if i % 2 == 0:
+            question = f"What is the average {attribute} in {table.name} for the last month?"
+        else:
+            question = f"Show the {attribute} of {table.domain} {table.kind} in the {table.region} region"
+        questions.append((question, table.name))
+    return questions
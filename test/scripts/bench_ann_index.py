@@ -0,0 +1,96 @@
+"""Recall/latency/memory benchmark for the table index types.
+
+Builds every index type and vector compression the training pipeline can
+produce on synthetic, clustered vectors and reports build time, serialized
+index size, recall@k against exact flat search (with and without exact
+re-ranking of compressed candidates) and p50/p99 single-query latency.
+
+    python test/scripts/bench_ann_index.py --vectors 50000 --dim 768
+    python test/scripts/bench_ann_index.py --compression none sq8 pq --rerank 4
+"""
+import argparse
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.vector_index import COMPRESSIONS, build_index, configure_search
+
+
+def synthetic_vectors(n, dim, n_clusters, rng):
+    """Gaussian clusters, a rough stand-in for topic-grouped table embeddings."""
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    assignment = rng.integers(0, n_clusters, size=n)
+    noise = 0.3 * rng.standard_normal((n, dim)).astype(np.float32)
+    return np.ascontiguousarray(centers[assignment] + noise)
+
+
+def recall_at_k(found, truth):
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--index-types", nargs="+", default=["flat", "ivf", "hnsw"])
+    parser.add_argument("--compression", nargs="+", default=list(COMPRESSIONS), choices=COMPRESSIONS)
+    parser.add_argument("--rerank", type=int, default=4, help="candidates per result for exact re-ranking")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = synthetic_vectors(args.vectors, args.dim, max(8, args.vectors // 200), rng)
+    ids = np.arange(args.vectors, dtype=np.int64)
+    queries = vectors[rng.integers(0, args.vectors, size=args.queries)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    # Exact ground truth from brute-force search on the raw vectors.
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+    raw_bytes = vectors.nbytes
+
+    print(f"{args.vectors} vectors, dim {args.dim}, {args.queries} queries, k={args.k}, raw float32 {raw_bytes / 2**20:.1f} MiB")
+    print(f"{'index':<6} {'storage':<7} {'build s':>8} {'MiB':>8} {'recall':>7} {'rerank':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for index_type in args.index_types:
+        for compression in args.compression:
+            start = time.perf_counter()
+            index = build_index(index_type, vectors, ids, compression)
+            build_time = time.perf_counter() - start
+            configure_search(index, args.nprobe, args.ef_search)
+            size = len(faiss.serialize_index(index))
+
+            latencies = []
+            found = []
+            reranked = []
+            for query in queries:
+                query = query.reshape(1, -1)
+                start = time.perf_counter()
+                _, labels = index.search(query, args.k)
+                latencies.append((time.perf_counter() - start) * 1000)
+                found.append(labels[0])
+
+                _, candidates = index.search(query, args.k * args.rerank)
+                candidates = candidates[0][candidates[0] >= 0]
+                distances = np.sum((vectors[candidates] - query) ** 2, axis=1)
+                reranked.append(candidates[np.argsort(distances)[:args.k]])
+
+            p50, p99 = np.percentile(latencies, [50, 99])
+            print(
+                f"{index_type:<6} {compression:<7} {build_time:>8.2f} {size / 2**20:>8.1f} "
+                f"{recall_at_k(found, truth):>7.3f} {recall_at_k(reranked, truth):>7.3f} {p50:>8.3f} {p99:>8.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
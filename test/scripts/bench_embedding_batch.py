@@ -0,0 +1,85 @@
+"""Throughput comparison of per-table vs batched table embedding.
+
+Runs GoogleEmbedding.embed_data both ways against a simulated embedding
+model with a fixed per-request latency, so the numbers reflect request
+count and parallelism rather than network noise. Pass --live to use the
+real Google model instead (needs GEMINI_API_KEY).
+
+    python test/scripts/bench_embedding_batch.py --tables 500
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.data_embedding import GoogleEmbedding
+
+
+class SimulatedEmbeddings:
+    """Stand-in for GoogleGenerativeAIEmbeddings with request latency."""
+
+    def __init__(self, request_latency: float, per_item_latency: float, dimension: int = 768):
+        self.request_latency = request_latency
+        self.per_item_latency = per_item_latency
+        self.dimension = dimension
+
+    def _vector(self, text):
+        seed = sum(map(ord, text)) % 997
+        return [((seed + i) % 13) / 13.0 for i in range(self.dimension)]
+
+    def embed_query(self, text):
+        time.sleep(self.request_latency + self.per_item_latency)
+        return self._vector(text)
+
+    def embed_documents(self, texts):
+        time.sleep(self.request_latency + self.per_item_latency * len(texts))
+        return [self._vector(text) for text in texts]
+
+
+def synthetic_metadata(n_tables):
+    return {
+        f"table_{i}": {
+            "table_name": f"table_{i}",
+            "embedding_text": f"The 'table_{i}' table stores records of kind {i % 17} with an id and a timestamp.",
+        }
+        for i in range(n_tables)
+    }
+
+
+def run(embedder, metadata):
+    start = time.perf_counter()
+    embedded = embedder.embed_data(metadata)
+    elapsed = time.perf_counter() - start
+    ok = sum(1 for table in embedded.values() if "embedding" in table)
+    return elapsed, ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tables", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--request-latency", type=float, default=0.08)
+    parser.add_argument("--per-item-latency", type=float, default=0.001)
+    parser.add_argument("--live", action="store_true")
+    args = parser.parse_args()
+
+    model = None if args.live else SimulatedEmbeddings(args.request_latency, args.per_item_latency)
+    metadata = synthetic_metadata(args.tables)
+
+    per_item = GoogleEmbedding(batched=False, model=model)
+    batched = GoogleEmbedding(batch_size=args.batch_size, max_workers=args.workers, model=model)
+
+    per_item_time, per_item_ok = run(per_item, metadata)
+    batched_time, batched_ok = run(batched, metadata)
+
+    print(f"tables:    {args.tables}")
+    print(f"per-item:  {per_item_time:8.2f}s  {per_item_ok / per_item_time:10.1f} tables/s")
+    print(f"batched:   {batched_time:8.2f}s  {batched_ok / batched_time:10.1f} tables/s")
+    print(f"speedup:   {per_item_time / batched_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
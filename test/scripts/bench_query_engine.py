@@ -0,0 +1,137 @@
+"""Per-question latency of the ZenML test pipeline vs the in-process QueryEngine.
+
+Both paths run the same retrieval and response components. By default the
+embedding model and the LLM are replaced with fixed-latency stand-ins and
+the run happens in a scratch directory with a synthetic trained database,
+so the difference between the two columns is orchestration overhead (run
+registration, artifact serialization, metadata-store writes). Pass --live
+to use the real models and the artifacts trained in the current directory
+(needs GEMINI_API_KEY).
+
+    python test/scripts/bench_query_engine.py --queries 20
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.data_response import Response
+from src.embedding_store import write_embedding_store
+from src.lexical_index import LexicalIndex
+from src.metadata_store import get_metadata_store
+from src.query_engine import QueryEngine
+from src.vector_index import update_index
+
+
+class SimulatedEmbedder:
+    """Stand-in for the query embedder with request latency."""
+
+    def __init__(self, latency: float, dimension: int = 768):
+        self.latency = latency
+        self.dimension = dimension
+
+    def embed_query(self, query):
+        time.sleep(self.latency)
+        rng = np.random.default_rng(sum(map(ord, query)))
+        return rng.standard_normal(self.dimension).astype(np.float32).tolist()
+
+
+class SimulatedResponse(Response):
+    """Stand-in for GeminiResponse with generation latency."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def get_response(self, matching_chunks, query) -> str:
+        time.sleep(self.latency)
+        return f"```sql\nSELECT 1;\n```\n{len(matching_chunks)} tables of context"
+
+
+def write_synthetic_database(n_tables, dimension):
+    """Writes table metadata, embedding artifacts and a lexical index under ./data."""
+    rng = np.random.default_rng(0)
+    store = get_metadata_store()
+    metadata = {}
+    for i in range(n_tables):
+        table = f"table_{i}"
+        text = json.dumps({
+            "table_name": table,
+            "schema_description": f"Stores records of kind {i % 17} with an id and a timestamp.",
+            "columns": [{"name": "id", "description": "Primary key"}],
+        })
+        store.put(table, text)
+        metadata[table] = {"table_name": table, "embedding": rng.standard_normal(dimension).tolist()}
+    base = os.path.join(os.getcwd(), "data", "embeddings", "table_embeddings")
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    names, vectors = write_embedding_store(base, metadata)
+    update_index(base, names, vectors)
+    LexicalIndex().build({table: data["table_name"] for table, data in metadata.items()}).save()
+
+
+def summarize(label, latencies):
+    latencies = np.asarray(latencies) * 1000
+    p50, p95 = np.percentile(latencies, [50, 95])
+    print(f"{label:<10} {latencies.mean():>10.1f} {p50:>10.1f} {p95:>10.1f}")
+    return latencies.mean()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--tables", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="simulated query embedding seconds")
+    parser.add_argument("--response-latency", type=float, default=0.5, help="simulated generation seconds")
+    parser.add_argument("--live", action="store_true", help="use the real models and trained artifacts")
+    args = parser.parse_args()
+
+    if not args.live:
+        os.chdir(tempfile.mkdtemp(prefix="bench_query_engine_"))
+        write_synthetic_database(args.tables, args.dim)
+
+    # Imported after the chdir so the pipeline and steps resolve paths in the scratch directory.
+    import steps.embed_data
+    import steps.response
+    from pipelines.testing_pipeline import test_database_pipeline
+
+    if args.live:
+        engine = QueryEngine()
+    else:
+        embedder = SimulatedEmbedder(args.embed_latency, args.dim)
+        responder = SimulatedResponse(args.response_latency)
+        steps.embed_data.get_query_embedder = lambda: embedder
+        steps.response.GeminiResponse = lambda: responder
+        engine = QueryEngine(embedder=embedder, responder=responder)
+
+    # Distinct questions so neither ZenML step caching nor the embedding cache hides work.
+    questions = [f"How many records of kind {i % 17} were created in week {i}?" for i in range(args.queries)]
+
+    engine.answer(questions[0] + " (warm-up)", include_tables=[])
+    engine_latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        engine.answer(question, include_tables=[])
+        engine_latencies.append(time.perf_counter() - start)
+
+    test_database_pipeline(query=questions[0] + " (warm-up)", include_tables=[])
+    pipeline_latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        test_database_pipeline(query=question + " ", include_tables=[])
+        pipeline_latencies.append(time.perf_counter() - start)
+
+    print(f"{args.queries} questions{'' if args.live else f', simulated embed {args.embed_latency}s / response {args.response_latency}s'}")
+    print(f"{'path':<10} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    engine_mean = summarize("engine", engine_latencies)
+    pipeline_mean = summarize("pipeline", pipeline_latencies)
+    print(f"orchestration overhead per question: {pipeline_mean - engine_mean:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()